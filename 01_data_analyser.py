@@ -1,13 +1,27 @@
 # 01_data_analyser.py
 
 ### IMPORT ###
+import argparse
+import json
+import multiprocessing
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
 ### LOCAL IMPORT ###
 from config import config_reader
-from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, list_files_by_type, get_values_from_dict_list, df_read_csv, df_print_details, script_info
+from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, list_files_by_type, get_values_from_dict_list, df_read_csv, df_read_csv_chunks, csv_read_header, csv_columns_kept, df_print_details, list_files_by_size, run_tasks_in_pool, script_info
+from utility_manager.derived_columns import derived_columns_compile, derived_columns_sources, df_add_derived_columns
+from utility_manager.dtype_optimiser import df_memory_bytes, df_optimise_dtypes, dtype_merge_files
+from utility_manager.stats_stream import stats_kinds_update, stats_kinds_dtypes, stats_state_init, stats_state_update, stats_state_to_summary_dict, stats_state_to_distinct_df, series_value_counts_arrays, frequencies_long_df
+from utility_manager.duplicates import HASH_VERSION as DUP_HASH_VERSION, dup_counter_init, df_duplicated_count
+from utility_manager.stats_writer import STATS_RUN_XLSX, stats_writer_init, stats_writer_submit, stats_writer_wait, stats_writer_close, stats_writer_timings
+from utility_manager.stats_duckdb import STATS_ENGINES, duckdb_connect, duckdb_table_from_csv, duckdb_missing_counts, duckdb_summary_dict, duckdb_distinct_df, duckdb_cube_df
+from utility_manager.stats_cube import cubes_compile, cubes_columns, cube_df_from_df, cube_state_init, cube_state_update, cube_state_to_dfs, cube_path, cube_write
+from utility_manager.stats_incremental import stats_conf_hash, state_path, state_load, state_save, state_delta_offset
+from utility_manager.pipeline import run_tasks_prefetched
+from utility_manager.catalogue_manifest import manifest_load, manifest_save, manifest_check, manifest_update
+from utility_manager.run_profiler import PROFILE_MODES, file_profile_init, profile_stage, file_profile_end, run_report_write, profile_capture
 
 ### GLOBALS ###
 yaml_config = config_reader.config_read_yaml("config.yml", "config")
@@ -15,23 +29,212 @@ yaml_config = config_reader.config_read_yaml("config.yml", "config")
 od_anac_dir = str(yaml_config["OD_ANAC_DIR"])
 od_file_type = str(yaml_config["OD_FILE_TYPE"])
 csv_sep = str(yaml_config["CSV_FILE_SEP"])
+csv_read_engine = str(yaml_config["CSV_READ_ENGINE"]) # auto, pyarrow or c
 conf_file_cols_exc = str(yaml_config["CONF_COLS_EXCL_FILE"]) # JSON with columns to be excluded from reading
 conf_file_cols_type = str(yaml_config["CONF_COLS_TYPE_FILE"]) # JSON with column types  
 conf_file_stats_inc = str(yaml_config["CONF_COLS_STATS_FILE"]) # JSON with columns to be included in stats
-stats_dir = str(yaml_config["STATS_DIR"])
-tender_main_file = str(yaml_config["TENDER_MAIN_TABLE"])
+conf_file_primary_keys = str(yaml_config["CONF_PRIMARY_KEYS_FILE"]) # JSON with primary keys (duplicated keys stats)
+stats_dir = str(yaml_config["OD_STATS_DIR"])
+dic_derived_cols = dict(yaml_config["DERIVED_COLUMNS"]) # derived columns for each file
+stats_chunk_size = int(yaml_config["STATS_CHUNK_SIZE"]) # rows for each chunk (0 = whole file in memory)
+cache_dir = str(yaml_config["CACHE_DIR"]) if bool(yaml_config["CACHE_ENABLED"]) else None # cache of parsed files (None = disabled)
+cache_max_size_mb = int(yaml_config["CACHE_MAX_SIZE_MB"])
+stats_distinct_top_k = int(yaml_config["STATS_DISTINCT_TOP_K"]) # most frequent values kept for each column (0 = all)
+stats_distinct_only = bool(yaml_config["STATS_DISTINCT_ONLY"]) # if True, only the distinct values stats are created (only the stats columns are read)
+dic_stats_cubes = dict(yaml_config["STATS_CUBES"] or {}) # cubes (dimensions and measures) of each file
+dtype_optimise = bool(yaml_config["DTYPE_OPTIMISE"]) # if True, the columns are converted to compact types after the reading
+dtype_category_ratio = float(yaml_config["DTYPE_CATEGORY_RATIO"]) # text columns with distinct values / rows under this ratio become 'category'
+conf_file_cols_type_gen = str(yaml_config["CONF_COLS_TYPE_GEN_FILE"]) # JSON with the column types inferred (output)
+stats_incremental = bool(yaml_config["STATS_INCREMENTAL"]) # if True, the stats state of each file is saved and only the new rows are read
+stats_state_dir = str(yaml_config["STATS_STATE_DIR"]) # directory of the saved stats states
+dup_mode = str(yaml_config["DUP_MODE"]) # duplicated rows counter: exact, spill or hll
+dup_spill_dir = str(yaml_config["DUP_SPILL_DIR"]) # directory of the partition files (spill mode)
+dup_spill_partitions = int(yaml_config["DUP_SPILL_PARTITIONS"])
+dup_memory_max_rows = int(yaml_config["DUP_MEMORY_MAX_ROWS"]) # row fingerprints kept in memory before compacting or writing to disk
+dup_hll_precision = int(yaml_config["DUP_HLL_PRECISION"])
+stats_output_formats = list(yaml_config["STATS_OUTPUT_FORMATS"]) # formats of the stats files: csv, parquet, xlsx, xlsx_run
+stats_output_background = bool(yaml_config["STATS_OUTPUT_BACKGROUND"]) # if True, the stats files are written by a background thread
+stats_output_max_pending = int(yaml_config["STATS_OUTPUT_MAX_PENDING"]) # stats dataframes waiting for the background thread (0 = no limit)
+stats_prefetch_files = int(yaml_config["STATS_PREFETCH_FILES"]) # files parsed ahead by a reader thread (0 = no prefetch)
+manifest_dir = str(yaml_config["MANIFEST_DIR"]) # manifests of the files processed
+manifest_skip_unchanged = bool(yaml_config["MANIFEST_SKIP_UNCHANGED"]) # if True, the files with up to date stats are skipped
+manifest_hash_mode = str(yaml_config["MANIFEST_HASH_MODE"]) # content hash: sample or full
+stats_engine = str(yaml_config["STATS_ENGINE"]) # engine of the stats: pandas or duckdb
+stats_duckdb_threads = int(yaml_config["STATS_DUCKDB_THREADS"]) # threads of the duckdb engine (0 = all the cores)
+stats_duckdb_memory_limit = str(yaml_config["STATS_DUCKDB_MEMORY_LIMIT"] or "") # memory limit of the duckdb engine (empty = DuckDB default)
+stats_duckdb_temp_dir = str(yaml_config["STATS_DUCKDB_TEMP_DIR"]) # directory of the data spilled by the duckdb engine
+
+STATS_INCREMENTAL_CHUNK_SIZE = 1_000_000 # rows for each chunk in incremental mode when 'stats_chunk_size' is 0
+STATS_SUFFIXES = ["_stats_missing", "_stats_distinct"]
+
+stats_writer = None # writer of the stats files of this process (see stats_writer_get)
 
 script_path, script_name = script_info(__file__)
 
 ### FUNCTIONS ###
 
-def summarize_dataframe_to_dict(df: pd.DataFrame, file_name: str) -> dict:
+def dup_counter_new(file_od: str, counter_name: str) -> dict:
     """
-    Creates a dictionary summarizing the input DataFrame with the file name, and the count of missing (empty) values for each column.
+    Creates a duplicates counter with the configuration (the partition files of 'spill' mode are in a directory for each file and counter).
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        counter_name (str): The name of the counter (e.g. 'rows' or 'pk').
+
+    Returns:
+        dict: the empty counter.
+    """
+    spill_dir = Path(dup_spill_dir) / Path(file_od).stem / counter_name
+    return dup_counter_init(dup_mode, spill_dir, dup_spill_partitions, dup_memory_max_rows, dup_hll_precision)
+
+def stats_stream_file(file_od: str, list_col_exc: list, list_col_type_dic: dict, list_col_stats_inc: list, list_derived: list, list_col_read: list = None, list_col_pk: list = None, chunk_size: int = 0, state: dict = None, offset: int = 0, list_cubes: list = None) -> dict:
+    """
+    Reads a file in chunks and computes the missing values and distinct values stats (and the cubes) one chunk at a time, so that the memory used depends on the chunk size and not on the file size.
+    The columns without a configured type are read a first time as raw strings to find the type of the whole column, then every chunk is read with that type, so the row fingerprints (duplicates) compare the same values as on the whole file (e.g. '1' and '01' in a numeric column). If the rows appended to a file change the type of a column, the file is read from the start.
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc (list): columns to be excluded.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_inc (list): columns to be included in the distinct values stats.
+        list_derived (list): the compiled derived columns of the file.
+        list_col_read (list, optional): columns to be read (if None, all the columns not excluded).
+        list_col_pk (list, optional): primary key columns (duplicated keys stats).
+        chunk_size (int, optional): rows for each chunk (if 0, 'stats_chunk_size').
+        state (dict, optional): the state to be updated (e.g. loaded from disk); if None, a new state is created.
+        offset (int, optional): byte offset of the first row to be read (the rows before are already in the state).
+        list_cubes (list, optional): the compiled cubes of the file (see cubes_compile).
+
+    Returns:
+        dict: the state updated with the rows read (see stats_state_to_summary_dict, stats_state_to_distinct_df and cube_state_to_dfs).
+    """
+    if state is not None and 'col_kinds' not in state:
+        # State saved without the types of the columns, its fingerprints are not comparable
+        state = None
+        offset = 0
+    # Kind of values of the columns without a configured type, on the rows already in the state and the rows read now
+    dic_kinds_old = state['col_kinds'] if state is not None else {}
+    dic_kinds = dict(dic_kinds_old)
+    list_col_raw = [col for col in csv_columns_kept(csv_read_header(Path(od_anac_dir) / file_od, csv_sep), list_col_exc, list_col_read) if col not in list_col_type_dic]
+    if len(list_col_raw) > 0:
+        for df_chunk in df_read_csv_chunks(od_anac_dir, file_od, list_col_exc, list_col_type_dic, chunk_size or stats_chunk_size, csv_sep, list_col_raw, offset):
+            stats_kinds_update(dic_kinds, df_chunk)
+    dic_col_type_read = {**list_col_type_dic, **stats_kinds_dtypes(dic_kinds)}
+    if offset > 0 and stats_kinds_dtypes(dic_kinds) != stats_kinds_dtypes(dic_kinds_old):
+        print("Column types changed by the rows appended, file read from the start")
+        state = None
+        offset = 0
+    if state is None:
+        state = stats_state_init(file_od, list_col_stats_inc, list_col_type_dic, dup_counter_new(file_od, "rows"), list_col_pk, dup_counter_new(file_od, "pk"))
+    state['col_kinds'] = dic_kinds
+    if 'cubes' not in state:
+        state['cubes'] = cube_state_init(list_cubes or [])
+    rows_before = state['rows_num']
+    chunk_num = 0
+    for df_chunk in df_read_csv_chunks(od_anac_dir, file_od, list_col_exc, dic_col_type_read, chunk_size or stats_chunk_size, csv_sep, list_col_read, offset):
+        if chunk_num == 0:
+            df_print_details(df_chunk, f"File '{file_od}' (first chunk)")
+        df_chunk = df_add_derived_columns(df_chunk, list_derived)
+        stats_state_update(state, df_chunk)
+        cube_state_update(state['cubes'], df_chunk)
+        chunk_num += 1
+    print(f"Chunks read: {chunk_num} (rows: {state['rows_num'] - rows_before})")
+    print()
+    return state
+
+def stats_incremental_file(file_od: str, list_col_exc: list, list_col_type_dic: dict, list_col_stats_inc: list, list_derived: list, list_col_read: list = None, list_col_pk: list = None, list_cubes: list = None) -> dict:
+    """
+    Updates the saved state of a file with the rows added since the previous run: an unchanged file is not read, a file with rows appended is read from the end of the previous reading, a new or modified file (or a file analysed with a different configuration) is read from the start.
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc (list): columns to be excluded.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_inc (list): columns to be included in the distinct values stats.
+        list_derived (list): the compiled derived columns of the file.
+        list_col_read (list, optional): columns to be read (if None, all the columns not excluded).
+        list_col_pk (list, optional): primary key columns (duplicated keys stats).
+        list_cubes (list, optional): the compiled cubes of the file (see cubes_compile).
+
+    Returns:
+        dict: the state updated with all the rows of the file.
+    """
+    path_data = Path(od_anac_dir) / file_od
+    conf = {
+        'list_col_exc': list_col_exc,
+        'list_col_type': list_col_type_dic,
+        'list_col_stats_inc': list_col_stats_inc,
+        'list_derived': [(col_name, spec) for col_name, _, spec in list_derived],
+        'list_col_read': list_col_read,
+        'list_col_pk': list_col_pk,
+        'cubes': list_cubes or [],
+        'dup': [dup_mode, dup_spill_dir, dup_spill_partitions, dup_hll_precision, DUP_HASH_VERSION]
+    }
+    conf_hash = stats_conf_hash(conf)
+    state = state_load(stats_state_dir, file_od)
+    size = path_data.stat().st_size
+    offset = state_delta_offset(path_data, state, conf_hash)
+    if offset is None:
+        print("File unchanged, stats computed from the saved state")
+        print()
+        return state
+    if offset == 0:
+        print("No valid saved state, file read from the start")
+        state = None
+    else:
+        print(f"Rows appended, file read from byte {offset} (rows in the saved state: {state['rows_num']})")
+    state = stats_stream_file(file_od, list_col_exc, list_col_type_dic, list_col_stats_inc, list_derived, list_col_read, list_col_pk, stats_chunk_size or STATS_INCREMENTAL_CHUNK_SIZE, state, offset, list_cubes)
+    print("Saving state:", state_path(stats_state_dir, file_od))
+    state_save(stats_state_dir, file_od, state, path_data, size, conf_hash)
+    print()
+    return state
+
+def stats_duckdb_file(file_od: str, list_col_exc: list, list_col_type_dic: dict, list_col_stats_inc: list, list_derived: list, list_col_read: list = None, list_col_pk: list = None, list_cubes: list = None) -> tuple:
+    """
+    Computes the missing values and distinct values stats (and the cubes) of a file with DuckDB: the file is parsed in parallel into a temporary table (spilled to disk beyond the memory limit) and the stats are computed with SQL, without loading the file in Python.
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc (list): columns to be excluded.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_inc (list): columns to be included in the distinct values stats.
+        list_derived (list): the compiled derived columns of the file.
+        list_col_read (list, optional): columns to be read (if None, all the columns not excluded).
+        list_col_pk (list, optional): primary key columns (duplicated keys stats).
+        list_cubes (list, optional): the compiled cubes of the file (see cubes_compile).
+
+    Returns:
+        tuple: the summary dictionary (see summarize_dataframe_to_dict, None with STATS_DISTINCT_ONLY), the distinct values dataframe (None without columns included) and the cells of each cube.
+    """
+    path_data = Path(od_anac_dir) / file_od
+    list_cols = csv_columns_kept(csv_read_header(path_data, csv_sep), list_col_exc, list_col_read)
+    con = duckdb_connect(stats_duckdb_threads, stats_duckdb_memory_limit, stats_duckdb_temp_dir)
+    try:
+        list_table_cols, dic_derived = duckdb_table_from_csv(con, path_data, list_cols, list_derived, csv_sep)
+        dic_od = None
+        if stats_distinct_only:
+            num_rows, dic_missing = duckdb_missing_counts(con, list_col_stats_inc)
+        else:
+            dic_od = duckdb_summary_dict(con, file_od, list_table_cols, list_col_pk)
+            num_rows, dic_missing = dic_od['rows_num'], dic_od['missing_values']
+        print(f"Rows: {num_rows} - columns: {len(list_table_cols)}")
+        df_distinct = None
+        if len(list_col_stats_inc) > 0:
+            df_distinct = duckdb_distinct_df(con, list_col_stats_inc, list_col_type_dic, dic_missing, dic_derived, stats_distinct_top_k)
+        dic_cubes = {cube['name']: duckdb_cube_df(con, cube, list_col_type_dic, dic_derived) for cube in list_cubes or []}
+    finally:
+        con.close()
+    print()
+    return dic_od, df_distinct, dic_cubes
+
+def summarize_dataframe_to_dict(df: pd.DataFrame, file_name: str, list_col_pk: list = None) -> dict:
+    """
+    Creates a dictionary summarizing the input DataFrame with the file name, and the count of missing (empty) values for each column. Duplicated rows (and primary keys) are counted on 64-bit row fingerprints.
 
     Parameters:
         df (pd.DataFrame): The DataFrame to summarize.
         file_name (str): The name of the file associated with the DataFrame.
+        list_col_pk (list, optional): primary key columns (if given, the rows with a duplicated key are counted too).
 
     Returns:
         dict: a dictionary containing the file name and missing value counts for each column.
@@ -41,7 +244,7 @@ def summarize_dataframe_to_dict(df: pd.DataFrame, file_name: str) -> dict:
     # Convert the Series to a dictionary
     missing_counts_dict = missing_counts.to_dict()
     # Count the number of duplicate rows, considering all columns
-    duplicate_rows_count = df.duplicated().sum()
+    duplicate_rows_count = df_duplicated_count(df, dup_counter_new(file_name, "rows"))
     # Get the number of rows and columns in the DataFrame
     num_rows, num_columns = df.shape
     # Calculate the ratio of duplicate rows to total rows
@@ -56,6 +259,11 @@ def summarize_dataframe_to_dict(df: pd.DataFrame, file_name: str) -> dict:
         'duplicated_rows': duplicate_rows_count,
         'duplicated_rows_perc': round(ratio_dup,2)
     }
+    if list_col_pk:
+        # Count the number of rows with a primary key already found
+        duplicate_pk_count = df_duplicated_count(df, dup_counter_new(file_name, "pk"), list_col_pk)
+        summary_dict['duplicated_pk'] = duplicate_pk_count
+        summary_dict['duplicated_pk_perc'] = round(duplicate_pk_count / num_rows if num_rows > 0 else 0, 2)
     return summary_dict
 
 def summarize_dataframe_to_df(summary_dict:dict) -> pd.DataFrame:
@@ -82,64 +290,403 @@ def summarize_dataframe_to_df(summary_dict:dict) -> pd.DataFrame:
     return df
 
 
-def distinct_values_frequencies(df: pd.DataFrame, include_cols: list) -> pd.DataFrame:
+def distinct_values_frequencies(df: pd.DataFrame, include_cols: list, top_k: int = 0) -> pd.DataFrame:
     """
-    Extracts the distinct values and their frequencies in percentage for each column of the given dataframe, excluding specified columns.
+    Extracts the distinct values and their frequencies in percentage for each column of the given dataframe, excluding specified columns. The values are counted on the factorised codes of each column and the result is built from arrays.
     
     Parameters:
         df (pd.DataFrame): The input dataframe.
         include_cols (list): A list of column names to be included int the analysis.
+        top_k (int): If greater than 0, only the top_k most frequent values of each column are kept (frequencies are computed on all the values).
     
     Returns:
         pd.DataFrame: A dataframe containing the distinct values and their frequencies  in percentage for each column of the input dataframe, excluding  the specified columns.
     """
-    # Use only the specified columns
-    df_filtered = df[include_cols]
-    # df_filtered = df.loc[:, include_cols]
-    
-    # Create an empty DataFrame to store the results
-    result_df = pd.DataFrame(columns=['Column', 'Value', 'Frequency (%)'])
-    
-    # List to store the results
-    result_list = []
-
-    # Calculate the distinct values and their frequencies
-    for col in df_filtered.columns:
-        value_counts = df_filtered[col].value_counts(normalize=True) * 100
-        value_counts = value_counts.round(2)  # Round frequencies to two decimal places
-        for value, freq in value_counts.items():
-            # result_df = pd.concat([result_df, pd.DataFrame({'Column': [col], 'Value': [value], 'Frequency (%)': [freq]})], ignore_index=True)
-            result_list.append({'Column': col, 'Value': value, 'Frequency (%)': freq})
-    
-    # Create the result DataFrame from the list
-    result_df = pd.DataFrame(result_list, columns=['Column', 'Value', 'Frequency (%)'])
+    list_values = []
+    list_counts = []
+
+    # Calculate the distinct values and their counts
+    for col in include_cols:
+        values, counts = series_value_counts_arrays(df[col])
+        list_values.append(values)
+        list_counts.append(counts)
+
+    # Create the result DataFrame (sorted by frequency, rounded to two decimal places)
+    result_df = frequencies_long_df(include_cols, list_values, list_counts, top_k)
     
     return result_df
 
-def save_stats(df_stats:pd.DataFrame, file_name:str, stats_suffix:str, csv_sep:str = ";") -> None:
+def stats_writer_get() -> dict:
     """
-    Saves a DataFrame containing statistical data to both CSV and Excel file formats.
+    Returns the writer of the stats files of this process, creating it at the first call. In a worker process the files are written immediately (the processes already overlap) and the consolidated workbook is left to the main process.
+
+    Returns:
+        dict: the writer.
+    """
+    global stats_writer
+    if stats_writer is None:
+        if multiprocessing.parent_process() is None:
+            stats_writer = stats_writer_init(stats_dir, stats_output_formats, csv_sep, stats_output_background, stats_output_max_pending)
+        else:
+            list_formats = [stats_format for stats_format in stats_output_formats if stats_format != "xlsx_run"]
+            stats_writer = stats_writer_init(stats_dir, list_formats, csv_sep, False)
+    return stats_writer
+
+def save_stats(df_stats:pd.DataFrame, file_name:str, stats_suffix:str) -> None:
+    """
+    Saves a DataFrame containing statistical data in the formats of STATS_OUTPUT_FORMATS (CSV, Parquet, Excel and a sheet of the consolidated Excel of the run), in a background thread if STATS_OUTPUT_BACKGROUND is True.
 
     Parameters:
         df_stats (pd.DataFrame): The DataFrame containing the statistics to be saved.
         file_name (str): The base name for the output files (without extension). The function will append '{stats_suffix}' to the base name.
         stats_suffix (str): The suffix of the stats type.
-        csv_sep (str): The CSV separator.
 
     Returns:
         None
     """
-    stats_out_csv = Path(stats_dir) / f"{file_name}{stats_suffix}.csv"
-    print("Writing CSV:", stats_out_csv)
-    df_stats.to_csv(stats_out_csv, sep=csv_sep, index=False)
-    stats_out_xlsx = Path(stats_dir) / f"{file_name}{stats_suffix}.xlsx"
+    writer = stats_writer_get()
+    if "csv" in writer['formats']:
+        print("Writing CSV:", Path(stats_dir) / f"{file_name}{stats_suffix}.csv")
+    if "parquet" in writer['formats']:
+        print("Writing Parquet:", Path(stats_dir) / f"{file_name}{stats_suffix}.parquet")
     xls_sheet_name=f"{file_name.removesuffix("_csv")[0:31]}" # For compatibility with older versions of Excel
-    print("Writing XLSX:", stats_out_xlsx)
-    print("XLSX sheet name:", xls_sheet_name)
-    df_stats.to_excel(stats_out_xlsx, sheet_name=f"{xls_sheet_name}", index=False)
+    if "xlsx" in writer['formats']:
+        print("Writing XLSX:", Path(stats_dir) / f"{file_name}{stats_suffix}.xlsx")
+        print("XLSX sheet name:", xls_sheet_name)
+    if "xlsx_run" in writer['formats']:
+        print("Adding sheet to XLSX:", Path(stats_dir) / STATS_RUN_XLSX)
+    stats_writer_submit(writer, df_stats, file_name, stats_suffix, xls_sheet_name)
+
+def stats_run_workbook_from_files(list_od_files: list) -> None:
+    """
+    Adds to the consolidated workbook of the run the stats files written by the worker processes (Parquet if available, otherwise CSV), in the order of the files.
+
+    Parameters:
+        list_od_files (list): The files of the ANAC catalogue.
+
+    Returns:
+        None
+    """
+    writer = stats_writer_get()
+    for file_od in list_od_files:
+        file_stem = Path(file_od).stem
+        for stats_suffix in STATS_SUFFIXES:
+            path_base = Path(stats_dir) / f"{file_stem}{stats_suffix}"
+            if "parquet" in stats_output_formats and path_base.with_suffix(".parquet").exists():
+                df_stats = pd.read_parquet(path_base.with_suffix(".parquet"))
+            elif "csv" in stats_output_formats and path_base.with_suffix(".csv").exists():
+                df_stats = pd.read_csv(path_base.with_suffix(".csv"), sep=csv_sep)
+            else:
+                continue
+            stats_writer_submit(writer, df_stats, file_stem, stats_suffix, file_stem, ["xlsx_run"])
+
+def file_cubes(file_od: str, list_col_exc: list) -> list:
+    """
+    Returns the cubes of a file (see STATS_CUBES), without the cubes on excluded columns.
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc (list): columns to be excluded.
+
+    Returns:
+        list: the compiled cubes (see cubes_compile).
+    """
+    list_cubes = []
+    for cube in cubes_compile(dic_stats_cubes.get(file_od)):
+        list_col_cube_exc = [col for col in cubes_columns([cube]) if col in list_col_exc]
+        if len(list_col_cube_exc) > 0:
+            print(f"Cube '{cube['name']}' not computed, columns excluded from the dataframe:", list_col_cube_exc)
+            continue
+        list_cubes.append(cube)
+    return list_cubes
+
+def analyse_file_read(file_od: str, list_col_exc_dic: list, list_col_type_dic: dict, list_col_stats_dic: list) -> pd.DataFrame:
+    """
+    Reads a file of the ANAC catalogue as analyse_file does (without the excluded columns, only the stats columns with STATS_DISTINCT_ONLY), so that it can be parsed ahead by the reader thread (see run_tasks_prefetched).
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_dic (list): List of dictionaries with columns to be included in stats for each file.
+
+    Returns:
+        pd.DataFrame: the file read, or None if the file is skipped (no stats columns nor cubes with STATS_DISTINCT_ONLY).
+    """
+    list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
+    list_col_read = None
+    if stats_distinct_only:
+        list_col_stats_inc = get_values_from_dict_list(list_col_stats_dic, file_od)
+        list_cubes = file_cubes(file_od, list_col_exc)
+        if len(list_col_stats_inc) == 0 and len(list_cubes) == 0:
+            return None
+        list_col_read = list_col_stats_inc + cubes_columns(list_cubes) + derived_columns_sources(derived_columns_compile(dic_derived_cols.get(file_od)))
+    return df_read_csv(od_anac_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep, cache_dir, cache_max_size_mb, list_col_read, csv_read_engine)
+
+def analyse_file(file_od: str, list_col_exc_dic: list, list_col_type_dic: dict, list_col_stats_dic: list, list_primary_key_dic: list, engine: str = "pandas", prefetched: tuple = None) -> dict:
+    """
+    Analyses a file of the ANAC catalogue and saves its missing values and distinct values stats and its cubes.
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_dic (list): List of dictionaries with columns to be included in stats for each file.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        engine (str): The engine of the stats (see STATS_ENGINES).
+        prefetched (tuple, optional): The file already read by the reader thread (see analyse_file_read) and the seconds of the reading; if None, the file is read here.
+
+    Returns:
+        tuple: the memory used before and after the types optimisation and the types inferred (None if the types are not optimised), and the profile of the file (seconds of each stage, rows, throughput and peak memory, see file_profile_end).
+    """
+    # File info
+    print("> Reading file")
+    print("File:", file_od)
+    file_path = Path(file_od)
+    file_stem = file_path.stem # get the name without extension
+    profile = file_profile_init(file_od, (Path(od_anac_dir) / file_od).stat().st_size)
+    rows_num = None
+
+    # Get the columns excluded from the configuration list
+    list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
+    list_col_exc_len = len(list_col_exc)
+    print("Columns exluded from the dataframe:", list_col_exc_len)
+
+    # Get the columns to be included in stats
+    list_col_stats_inc = get_values_from_dict_list(list_col_stats_dic, file_od)
+    list_col_stats_inc_len = len(list_col_stats_inc)
+    dic_dtype_result = None
+
+    # Get the primary key columns (duplicated keys stats), if they are all read
+    list_col_pk = get_values_from_dict_list(list_primary_key_dic, file_od)
+    if any(col in list_col_exc for col in list_col_pk):
+        print("Primary key columns excluded from the dataframe, duplicated keys not counted:", list_col_pk)
+        list_col_pk = []
+    print("Primary key columns:", list_col_pk)
+
+    # Get the derived columns from the configuration
+    list_derived = derived_columns_compile(dic_derived_cols.get(file_od))
+
+    # Get the cubes (cross-tabs of the dimensions with the measures) from the configuration
+    list_cubes = file_cubes(file_od, list_col_exc)
+    print("Cubes:", [cube['name'] for cube in list_cubes])
+
+    # With only the distinct values stats, only the stats columns (and the ones they derive from) are read
+    list_col_read = None
+    if stats_distinct_only:
+        if list_col_stats_inc_len == 0 and len(list_cubes) == 0:
+            print("No columns included for the distinct values stats, file skipped")
+            print("-"*3)
+            return None, file_profile_end(profile)
+        list_col_read = list_col_stats_inc + cubes_columns(list_cubes) + derived_columns_sources(list_derived)
+        print("Columns read (distinct values stats only):", len(list_col_read))
+    
+    stats_from_state = engine == "pandas" and (stats_incremental or stats_chunk_size > 0)
+    if engine == "duckdb":
+        # The file is parsed and the stats are computed by DuckDB (chunks, incremental state, cache and types optimisation are not used)
+        print("> Computing stats with DuckDB")
+        with profile_stage(profile, "duckdb_stats"):
+            dic_od_duckdb, df_distinct_duckdb, dic_cubes = stats_duckdb_file(file_od, list_col_exc, list_col_type_dic, list_col_stats_inc, list_derived, list_col_read, list_col_pk, list_cubes)
+        rows_num = dic_od_duckdb['rows_num'] if dic_od_duckdb is not None else None
+    elif stats_incremental:
+        # Only the rows added since the previous run are read, the stats are updated on the saved state
+        print("> Updating the saved stats state")
+        with profile_stage(profile, "read_stats"):
+            state = stats_incremental_file(file_od, list_col_exc, list_col_type_dic, list_col_stats_inc, list_derived, list_col_read, list_col_pk, list_cubes)
+        rows_num = state['rows_num']
+        dic_cubes = cube_state_to_dfs(state['cubes'], list_col_type_dic, [col_name for col_name, _, _ in list_derived])
+    elif stats_chunk_size > 0:
+        # Read the file (dataset) in chunks, the stats are updated one chunk at a time
+        print(f"> Streaming file in chunks of {stats_chunk_size} rows")
+        with profile_stage(profile, "read_stats"):
+            state = stats_stream_file(file_od, list_col_exc, list_col_type_dic, list_col_stats_inc, list_derived, list_col_read, list_col_pk, list_cubes=list_cubes)
+        rows_num = state['rows_num']
+        dic_cubes = cube_state_to_dfs(state['cubes'], list_col_type_dic, [col_name for col_name, _, _ in list_derived])
+    else:
+        # Read the file (dataset), unless it has been parsed ahead while the previous file was analysed
+        if prefetched is not None:
+            df_od, read_seconds = prefetched
+            profile['stages']['read_prefetch'] = round(read_seconds, 4)
+        else:
+            with profile_stage(profile, "read"):
+                df_od = df_read_csv(od_anac_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep, cache_dir, cache_max_size_mb, list_col_read, csv_read_engine)
+        rows_num = len(df_od)
+        df_print_details(df_od, f"File '{file_od}'")
+        print()
+
+        if dtype_optimise:
+            print("> Optimising column types")
+            mem_before = df_memory_bytes(df_od)
+            with profile_stage(profile, "dtype"):
+                df_od, dic_types = df_optimise_dtypes(df_od, dtype_category_ratio)
+            mem_after = df_memory_bytes(df_od)
+            print(f"Memory before / after: {mem_before} / {mem_after} bytes")
+            print()
+            dic_dtype_result = {'file_name': file_od, 'mem_bytes_before': mem_before, 'mem_bytes_after': mem_after, 'col_types': dic_types}
+
+        if len(list_derived) > 0:
+            print(f"> Adding derived columns to '{file_od}':", [col_name for col_name, _, _ in list_derived])
+            with profile_stage(profile, "derived"):
+                df_od = df_add_derived_columns(df_od, list_derived)
+
+        with profile_stage(profile, "cube_stats"):
+            dic_cubes = {cube['name']: cube_df_from_df(df_od, cube) for cube in list_cubes}
+
+    # Stats 1 - Missing values
+    print("> Creating stats")
+    if not stats_distinct_only:
+        print("> Missing values")
+        if engine == "duckdb":
+            dic_od = dic_od_duckdb
+        elif stats_from_state:
+            dic_od = stats_state_to_summary_dict(state)
+        else:
+            with profile_stage(profile, "missing_stats"):
+                dic_od = summarize_dataframe_to_dict(df_od, file_od, list_col_pk)
+        # print(dic_od) # debug
+        df_stats = summarize_dataframe_to_df(dic_od)
+        # print(df_stats.head()) # debug
+        print("> Saving stats")
+        save_stats(df_stats, file_stem, STATS_SUFFIXES[0])
+        print()
+
+    # Stats 2 - Distinct values
+    print("> Distinct values")
+    print("Colums included for this stat:", list_col_stats_inc_len)
+    print(list_col_stats_inc) # debug
+    if list_col_stats_inc_len > 0:
+        if engine == "duckdb":
+            df_stats = df_distinct_duckdb
+        elif stats_from_state:
+            df_stats = stats_state_to_distinct_df(state, stats_distinct_top_k)
+        else:
+            with profile_stage(profile, "distinct_stats"):
+                df_stats = distinct_values_frequencies(df_od, list_col_stats_inc, stats_distinct_top_k)
+        # print(df_stats.head()) # debug
+        print("> Saving stats")
+        save_stats(df_stats, file_stem, STATS_SUFFIXES[1])
+    print()
+
+    # Stats 3 - Cubes
+    if len(dic_cubes) > 0:
+        print("> Cubes")
+        for cube_name, df_cube in dic_cubes.items():
+            path_cube = cube_path(stats_dir, file_od, cube_name)
+            print(f"Cube '{cube_name}' cells:", len(df_cube))
+            print("Writing Parquet:", path_cube)
+            cube_write(df_cube, path_cube)
+        print()
+
+    if multiprocessing.parent_process() is not None:
+        # In a worker process the files must be complete when the task ends
+        stats_writer_wait(stats_writer_get())
+    if stats_writer_get()['executor'] is None:
+        # Written in this process: the seconds of each format are known (with the background thread, they are added at the end of the run)
+        profile['stages'].update(stats_writer_timings(stats_writer_get(), file_stem))
+
+    print("-"*3)
+    return dic_dtype_result, file_profile_end(profile, rows_num)
+
+def analyse_conf_hash(file_od: str, list_col_exc_dic: list, list_col_type_dic: dict, list_col_stats_dic: list, list_primary_key_dic: list, engine: str = "pandas") -> str:
+    """
+    Computes the hash of the configuration the stats of a file depend on (columns, types, keys, derived columns, engine, stats options and output formats), recorded in the manifest.
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_dic (list): List of dictionaries with columns to be included in stats for each file.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        engine (str): The engine of the stats (see STATS_ENGINES).
+
+    Returns:
+        str: The hexadecimal hash of the configuration.
+    """
+    conf = {
+        'col_exc': sorted(get_values_from_dict_list(list_col_exc_dic, file_od)),
+        'col_type': list_col_type_dic,
+        'col_stats': get_values_from_dict_list(list_col_stats_dic, file_od),
+        'col_pk': get_values_from_dict_list(list_primary_key_dic, file_od),
+        'derived': dic_derived_cols.get(file_od),
+        'engine': engine,
+        'csv_read_engine': csv_read_engine,
+        'distinct_only': stats_distinct_only,
+        'distinct_top_k': stats_distinct_top_k,
+        'cubes': dic_stats_cubes.get(file_od),
+        'dup_mode': dup_mode,
+        'dup_hll_precision': dup_hll_precision,
+        'formats': sorted(stats_format for stats_format in stats_output_formats if stats_format != "xlsx_run"), # the workbook of the run is built again from the stats files
+        'csv_sep': csv_sep
+    }
+    return stats_conf_hash(conf)
+
+def stats_output_paths(file_od: str, list_col_stats_dic: list) -> list:
+    """
+    Lists the stats files written for a file, the cubes included (the consolidated workbook of the run excluded).
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_stats_dic (list): List of dictionaries with columns to be included in stats for each file.
+
+    Returns:
+        list: the paths of the stats files.
+    """
+    list_suffixes = [] if stats_distinct_only else [STATS_SUFFIXES[0]]
+    if len(get_values_from_dict_list(list_col_stats_dic, file_od)) > 0:
+        list_suffixes.append(STATS_SUFFIXES[1])
+    list_ext = [f".{stats_format}" for stats_format in stats_output_formats if stats_format != "xlsx_run"]
+    list_cube_paths = [cube_path(stats_dir, file_od, cube['name']) for cube in cubes_compile(dic_stats_cubes.get(file_od))]
+    return [Path(stats_dir) / f"{Path(file_od).stem}{stats_suffix}{ext}" for stats_suffix in list_suffixes for ext in list_ext] + list_cube_paths
+
+def save_dtype_results(list_dtype_results: list) -> None:
+    """
+    Saves the memory used by each file before and after the types optimisation and the generated JSON with the types inferred (same format of the columns type configuration file).
+
+    Parameters:
+        list_dtype_results (list): The results of analyse_file, one for each file.
+
+    Returns:
+        None
+    """
+    df_mem = pd.DataFrame([{key: value for key, value in dic_result.items() if key != 'col_types'} for dic_result in list_dtype_results])
+    df_mem['mem_ratio'] = (df_mem['mem_bytes_after'] / df_mem['mem_bytes_before']).round(3)
+    print(df_mem.to_string(index=False))
+    path_mem = Path(stats_dir) / "_dtype_memory.csv"
+    print("Writing CSV:", path_mem)
+    df_mem.to_csv(path_mem, sep=csv_sep, index=False)
+    dic_types = dtype_merge_files([dic_result['col_types'] for dic_result in list_dtype_results])
+    print("Writing JSON (columns type generated):", conf_file_cols_type_gen)
+    with open(conf_file_cols_type_gen, "w") as fp:
+        json.dump(dic_types, fp, indent=4)
+
+def analyse_file_profiled(profile_mode: str, file_od: str, list_col_exc_dic: list, list_col_type_dic: dict, list_col_stats_dic: list, list_primary_key_dic: list, engine: str = "pandas") -> tuple:
+    """
+    Analyses a file again under a profiler (see profile_capture) and saves the reports in the stats directory. The stats files are written in this process (not in the background thread, so that the profiler sees them) and the consolidated workbook of the run is not changed.
+
+    Parameters:
+        profile_mode (str): The profiler (see PROFILE_MODES).
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (dict): columns type.
+        list_col_stats_dic (list): List of dictionaries with columns to be included in stats for each file.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        engine (str): The engine of the stats (see STATS_ENGINES).
+
+    Returns:
+        tuple: the path of the reports (without extension) and the profile of the file.
+    """
+    global stats_writer
+    stats_writer_run = stats_writer
+    stats_writer = stats_writer_init(stats_dir, [stats_format for stats_format in stats_output_formats if stats_format != "xlsx_run"], csv_sep, False)
+    path_base = Path(stats_dir) / f"_profile_{Path(file_od).stem}_{profile_mode}"
+    try:
+        _, profile = profile_capture(profile_mode, analyse_file, (file_od, list_col_exc_dic, list_col_type_dic, list_col_stats_dic, list_primary_key_dic, engine), path_base)
+    finally:
+        stats_writer = stats_writer_run
+    return path_base, profile
 
 ### MAIN ###
-def main():
+def main(workers: int = 1, engine: str = "pandas", profile_mode: str = None, force: bool = False):
     print()
     print(f"*** PROGRAM START ({script_name}) ***")
     print()
@@ -148,13 +695,20 @@ def main():
     print("Start process: " + str(start_time))
     print()
 
+    if engine not in STATS_ENGINES:
+        raise ValueError(f"Unknown stats engine '{engine}' (allowed: {', '.join(STATS_ENGINES)})")
+    print("Stats engine:", engine)
+    print()
+
     print(">> Preparing output directories")
     check_and_create_directory(stats_dir)
     print()
 
+    run_profile = {'stages': {}} # seconds of the stages of the run
     print(">> Scanning Open Data catalogue")
     print("Directory:", od_anac_dir)
-    list_od_files = list_files_by_type(od_anac_dir, od_file_type)
+    with profile_stage(run_profile, "scan"):
+        list_od_files = list_files_by_type(od_anac_dir, od_file_type)
     list_od_files_len = len(list_od_files)
     print(f"Files '{od_file_type}' found: {list_od_files_len}")
     print()
@@ -172,63 +726,109 @@ def main():
     print("File (stats columns):", conf_file_stats_inc)
     list_col_stats_dic = json_to_list_dict(conf_file_stats_inc)
     # print(list_col_stats_dic) # debug
+
+    print("File (columns keys):", conf_file_primary_keys)
+    list_primary_key_dic = json_to_list_dict(conf_file_primary_keys)
     
     list_col_exc_dic_len = len(list_col_exc_dic)
     print("Files indexed (columns excluded):", list_col_exc_dic_len)
     print()
 
+    list_od_files_scan = list(list_od_files)
+    list_od_files_skipped = []
+    dic_manifest = None
+    if manifest_skip_unchanged:
+        # Files whose stats files are up to date (same file, same configuration, stats files not changed) are skipped
+        print(">> Checking the manifest")
+        with profile_stage(run_profile, "manifest"):
+            dic_manifest = manifest_load(manifest_dir, script_name)
+            dic_fingerprints = {}
+            dic_conf_hashes = {}
+            for file_od in list_od_files_scan:
+                dic_conf_hashes[file_od] = analyse_conf_hash(file_od, list_col_exc_dic, list_col_type_dic, list_col_stats_dic, list_primary_key_dic, engine)
+                is_current, dic_fingerprints[file_od] = manifest_check(dic_manifest, Path(od_anac_dir) / file_od, dic_conf_hashes[file_od], stats_output_paths(file_od, list_col_stats_dic), manifest_hash_mode)
+                if is_current and not force and not dtype_optimise:
+                    list_od_files_skipped.append(file_od)
+        list_od_files = [file_od for file_od in list_od_files_scan if file_od not in list_od_files_skipped]
+        if dtype_optimise:
+            print("Types optimisation enabled, all the files are analysed (the types are inferred on all of them)")
+        elif force:
+            print("Forced, all the files are analysed")
+        print("Files unchanged (skipped):", len(list_od_files_skipped))
+        print("Files to be analysed:", len(list_od_files))
+        print()
+
     print(">> Analysing Open Data files")
     print()
-    for file_od in list_od_files:
-        # File info
-        print("> Reading file")
-        print("File:", file_od)
-        file_path = Path(file_od)
-        file_stem = file_path.stem # get the name without extension
-
-        # Get the columns excluded from the configuration list
-        list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
-        list_col_exc_len = len(list_col_exc)
-        print("Columns exluded from the dataframe:", list_col_exc_len)
-
-        # Get the columns to be included in stats
-        list_col_stats_inc = get_values_from_dict_list(list_col_stats_dic, file_od)
-        list_col_stats_inc_len = len(list_col_stats_inc)
-        
-        # Read the file (dataset)
-        df_od = df_read_csv(od_anac_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep)
-        df_print_details(df_od, f"File '{file_od}'")
+    if workers > 1:
+        # The largest files are scheduled first so that a slow file does not finish last
+        print(f"Workers: {workers} (largest files first)")
         print()
+        list_od_files = list_files_by_size(od_anac_dir, list_od_files)
+    list_tasks = [(file_od, list_col_exc_dic, list_col_type_dic, list_col_stats_dic, list_primary_key_dic, engine) for file_od in list_od_files]
+    with profile_stage(run_profile, "files"):
+        if workers <= 1 and stats_prefetch_files > 0 and engine == "pandas" and not stats_incremental and stats_chunk_size == 0:
+            # Pipeline: the next files are parsed by a reader thread while the current one is analysed and the stats of the previous ones are written
+            print(f"Files parsed ahead: {stats_prefetch_files}")
+            print()
+            list_read_tasks = [(file_od, list_col_exc_dic, list_col_type_dic, list_col_stats_dic) for file_od in list_od_files]
+            list_results = run_tasks_prefetched(analyse_file, list_tasks, analyse_file_read, list_read_tasks, stats_prefetch_files)
+        else:
+            list_results = run_tasks_in_pool(analyse_file, list_tasks, workers)
+    list_profiles = [profile for _, profile in list_results]
+    print()
 
-        # Add the column "cpv_division" that takes the first two characters of "cod_cpv" if it's not null
-        if file_od == tender_main_file:
-            print(f"> Updating main tender file '{file_od}'")
-            df_od['cpv_division'] = df_od['cod_cpv'].apply(lambda x: x[:2] if pd.notnull(x) else None)
-            df_od['accordo_quadro'] = df_od['cig_accordo_quadro'].apply(lambda x: 1 if pd.notna(x) else 0)
+    # The worker processes do not write the consolidated workbook and the skipped files are not analysed: their stats files are read again
+    list_od_files_run = list_od_files_scan if workers > 1 and len(list_tasks) > 1 else list_od_files_skipped
+    if "xlsx_run" in stats_output_formats and len(list_od_files_run) > 0:
+        if "csv" in stats_output_formats or "parquet" in stats_output_formats:
+            print(">> Reading the stats files for the consolidated XLSX")
+            with profile_stage(run_profile, "xlsx_run_from_files"):
+                stats_run_workbook_from_files(list_od_files_run)
+        else:
+            print(">> Consolidated XLSX skipped: with workers it is built from the 'csv' or 'parquet' stats files")
+        print()
 
-        # Stats 1 - Missing values
-        print("> Creating stats")
-        print("> Missing values")
-        dic_od = summarize_dataframe_to_dict(df_od, file_od)
-        # print(dic_od) # debug
-        df_stats = summarize_dataframe_to_df(dic_od)
-        # print(df_stats.head()) # debug
-        print("> Saving stats")
-        save_stats(df_stats, file_stem, "_stats_missing")
+    print(">> Waiting for the stats files to be written")
+    with profile_stage(run_profile, "stats_write_wait"):
+        path_run = stats_writer_close(stats_writer_get())
+    if path_run is not None:
+        print("Writing XLSX (run):", path_run)
+    for profile in list_profiles:
+        # Seconds of the files written by the background thread of this process
+        profile['stages'].update(stats_writer_timings(stats_writer_get(), Path(profile['file_name']).stem))
+    print()
+
+    print(">> Writing the run report")
+    path_json, path_csv = run_report_write(list_profiles, run_profile['stages'], stats_dir, script_name, csv_sep)
+    print("Writing JSON:", path_json)
+    print("Writing CSV:", path_csv)
+    for profile in sorted(list_profiles, key=lambda profile: profile['sec'], reverse=True):
+        print(f"File: {profile['file_name']} - sec: {profile['sec']} - rows/s: {profile['rows_per_sec']} - MB/s: {round((profile['bytes_per_sec'] or 0) / 1024**2, 1)} - peak RSS MB: {profile['peak_rss_mb']}")
+    print()
+
+    if profile_mode is not None and len(list_profiles) > 0:
+        file_slowest = max(list_profiles, key=lambda profile: profile['sec'])['file_name']
+        print(f">> Profiling the slowest file ({profile_mode})")
+        print("File:", file_slowest)
+        print()
+        path_base, _ = analyse_file_profiled(profile_mode, file_slowest, list_col_exc_dic, list_col_type_dic, list_col_stats_dic, list_primary_key_dic, engine)
+        print("Writing profile:", path_base.with_suffix(".txt"))
         print()
 
-        # Stats 2 - Distinct values
-        print("> Distinct values")
-        print("Colums included for this stat:", list_col_stats_inc_len)
-        print(list_col_stats_inc) # debug
-        if list_col_stats_inc_len > 0:
-            df_stats = distinct_values_frequencies(df_od, list_col_stats_inc)
-            # print(df_stats.head()) # debug
-            print("> Saving stats")
-            save_stats(df_stats, file_stem, "_stats_distinct")
+    if dic_manifest is not None:
+        # The files analysed are recorded with the stats files just written (the ones of the profiled file included)
+        print(">> Saving the manifest")
+        for file_od in list_od_files:
+            manifest_update(dic_manifest, Path(od_anac_dir) / file_od, dic_fingerprints[file_od], dic_conf_hashes[file_od], stats_output_paths(file_od, list_col_stats_dic))
+        manifest_save(dic_manifest, [Path(od_anac_dir) / file_od for file_od in list_od_files_scan])
+        print("Writing JSON:", dic_manifest['path'])
         print()
 
-        print("-"*3)
+    list_dtype_results = [dic_result for dic_result, _ in list_results if dic_result is not None]
+    if len(list_dtype_results) > 0:
+        print(">> Saving types optimisation results")
+        save_dtype_results(list_dtype_results)
     print()
 
     # Program end
@@ -246,4 +846,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyses the files of the ANAC Open Data catalogue")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (files are processed in parallel, largest first)")
+    parser.add_argument("--engine", choices=STATS_ENGINES, default=stats_engine, help="engine of the stats (default: STATS_ENGINE)")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None, help="analyse the slowest file again under cProfile or tracemalloc (reports in OD_STATS_DIR)")
+    parser.add_argument("--force", action="store_true", help="analyse all the files, also the unchanged ones (with MANIFEST_SKIP_UNCHANGED)")
+    args = parser.parse_args()
+    main(args.workers, args.engine, args.profile, args.force)
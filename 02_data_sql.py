@@ -1,14 +1,24 @@
 # 01_data_analyser.py
 
 ### IMPORT ###
+import argparse
+import json
 import pandas as pd
+import pyarrow as pa
 from datetime import datetime
 from pathlib import Path
 import glob
 
 ### LOCAL IMPORT ###
 from config import config_reader
-from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, list_files_by_type, get_values_from_dict_list, df_to_sql_create_table_query, df_read_csv, sql_create_database, sql_generate_foreign_keys, script_info
+from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, list_files_by_type, get_values_from_dict_list, df_to_sql_create_table_query, df_to_sql_column_types, df_read_csv_schema, csv_read_header, csv_columns_kept, sql_create_database, sql_generate_foreign_keys, list_files_by_size, run_tasks_in_pool, script_info
+from utility_manager.csv_rewriter import csv_rewrite_columns
+from utility_manager.schema_inference import SCHEMA_SAMPLE_MODES, col_profile_init, col_profile_update, col_profile_sample_df, col_profile_sql_types
+from utility_manager.reference_data import ref_table_update, ref_paths
+from utility_manager.run_profiler import PROFILE_MODES, file_profile_init, profile_stage, file_profile_end, run_report_write, profile_capture
+from utility_manager.stats_incremental import stats_conf_hash
+from utility_manager.table_store import store_path, store_table_write, store_catalogue_write
+from utility_manager.catalogue_manifest import manifest_load, manifest_save, manifest_check, manifest_update
 
 ### GLOBALS ###
 yaml_config = config_reader.config_read_yaml("config.yml", "config")
@@ -29,6 +39,9 @@ dic_istat_columns_fix = dict(yaml_config["OD_ISTAT_COLUMNS_FIX"])
 od_bdap_dir = str(yaml_config["OD_BDAP_DIR"])
 dic_bdap_columns_fix = dict(yaml_config["OD_BDAP_COLUMNS_FIX"]) 
 
+# Reference data (ISTAT, BDAP)
+ref_dir = str(yaml_config["REF_DIR"]) # typed tables of the reference files, built again only when a file changes
+
 conf_file_cols_exc = str(yaml_config["CONF_COLS_EXCL_FILE"]) # JSON
 conf_file_cols_type = str(yaml_config["CONF_COLS_TYPE_FILE"]) # JSON
 conf_file_primary_keys = str(yaml_config["CONF_PRIMARY_KEYS_FILE"]) # JSON
@@ -38,6 +51,16 @@ sql_dir_tables = str(yaml_config["SQL_DIR_TABLES"])
 sql_drop_table = bool(yaml_config["SQL_DROP_TABLE"])
 sql_file_type = str(yaml_config["SQL_FILE_TYPE"])
 db_name_drop = bool(yaml_config["SQL_DROP_DB"])
+sql_schema_sample = str(yaml_config["SQL_SCHEMA_SAMPLE"]) # head or reservoir
+sql_schema_sample_rows = int(yaml_config["SQL_SCHEMA_SAMPLE_ROWS"]) # rows of the sample used to infer the column types
+sql_schema_refine = bool(yaml_config["SQL_SCHEMA_REFINE"]) # refine the column types with the stats of the whole file
+sql_table_store = bool(yaml_config["SQL_TABLE_STORE"]) # if True, the cleaned tables are written as Arrow files too
+sql_dir_store = str(yaml_config["SQL_DIR_TABLES_STORE"]) # output
+sql_copy_write_queue = int(yaml_config["SQL_COPY_WRITE_QUEUE"]) # blocks of rows waiting to be written by the background thread of the copy (0 = no thread)
+manifest_dir = str(yaml_config["MANIFEST_DIR"]) # manifests of the files processed
+manifest_skip_unchanged = bool(yaml_config["MANIFEST_SKIP_UNCHANGED"]) # if True, the files with up to date SQL table files and import CSV are skipped
+manifest_hash_mode = str(yaml_config["MANIFEST_HASH_MODE"]) # content hash: sample or full
+stats_dir = str(yaml_config["OD_STATS_DIR"]) # run report (seconds of each stage of each file)
 
 # OUTPUT
 sql_dir_db = str(yaml_config["SQL_DIR_DB"]) # output
@@ -48,79 +71,346 @@ script_path, script_name = script_info(__file__)
 
 ### FUNCTIONS ###
 
-def process_files_to_sql(od_dir: str, list_od_files: list, list_col_exc_dic: list, list_col_type_dic:list, dict_rename_col:dict, sql_drop_table: bool, list_primary_key_dic:list, sql_dir_tables:str, sql_dir_import_tables:str, list_tables_eng_dic:dict, csv_sep: str = ";") -> None:
+def process_file_to_sql(od_dir: str, file_od: str, list_col_exc_dic: list, list_col_type_dic:list, dict_rename_col:dict, sql_drop_table: bool, list_primary_key_dic:list, sql_dir_tables:str, sql_dir_import_tables:str, list_tables_eng_dic:dict, csv_sep: str = ";") -> None:
     """
-    Processes a list of files, excluding specified columns, and creates SQL table files.
+    Processes a single file, excluding specified columns, and creates its SQL table file and its cleaned CSV to be imported.
 
     Parameters:
         od_dir (str): Directory containing the original data files.
-        list_od_files (list): List of file names to be processed.
+        file_od (str): File name to be processed.
         list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
         list_col_type_dic (list): List of dictionaries specifying the type of each column.
         dict_rename_col (dict): Dictionary with column to be renamed.
         sql_drop_table (bool): Flag indicating whether to include a DROP TABLE statement in the SQL.
         list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
         sql_dir_tables (str): Directory where the generated SQL files will be saved.
-        sql_dir_import_db (str): Directory with CSV cleaned and with ENG name to be imported in the database.
+        sql_dir_import_tables (str): Directory with CSV cleaned and with ENG name to be imported in the database.
+        list_tables_eng_dic (dict): Dictionary with ENG table names.
+        csv_sep (str): Separator used in the CSV files. Default is ';'.
+
+    Returns:
+        dict: the profile of the file (seconds of each stage, rows, throughput and peak memory, see file_profile_end).
+    """
+
+    # File info
+    print("> Reading file")
+    print("File:", file_od)
+    profile = file_profile_init(file_od, (Path(od_dir) / file_od).stat().st_size)
+    profile['od_dir'] = od_dir
+    
+    # Create the table name (in ITA) and get the table name in ENG
+    table_name_clean, table_name_eng = table_names(file_od, list_tables_eng_dic)
+    print("Table ITA:", table_name_clean)
+    print("Table ENG:", table_name_eng)
+
+    # Get the columns excluded from the configuration list
+    list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
+    list_col_exc_len = len(list_col_exc)
+    print("Columns excluded from the dataframe:", list_col_exc_len)
+    
+    list_p_key = get_values_from_dict_list(list_primary_key_dic, file_od) # get the key list by file name 
+
+    # Save the file in ENG name and without the columns excluded (copied in blocks of rows, not loaded in memory, each block written while the next one is parsed)
+    print("> Saving CSV - table file (in ENG) for MySQL import")
+    path_data = Path(od_dir) / file_od
+    path_table_eng = Path(sql_dir_import_tables) / f"{table_name_eng.upper()}.csv"
+    print("Path:", path_table_eng)
+    list_col_kept = csv_columns_kept(csv_read_header(path_data, csv_sep), list_col_exc)
+    # The column stats and the reservoir sample are collected while the rows are copied
+    col_profile = None
+    if sql_schema_refine or sql_schema_sample == "reservoir":
+        col_profile = col_profile_init(list_col_kept, sql_schema_sample_rows if sql_schema_sample == "reservoir" else 0)
+    with profile_stage(profile, "copy"):
+        rows_num = csv_rewrite_columns(path_data, path_table_eng, list_col_kept, csv_sep, col_profile, sql_copy_write_queue)
+    print("Rows written:", rows_num)
+
+    # Infer the column types from a sample (the first rows or the reservoir sample)
+    print(f"> Inferring column types (sample: {sql_schema_sample}, {sql_schema_sample_rows} rows)")
+    with profile_stage(profile, "schema"):
+        if sql_schema_sample == "reservoir":
+            df_od = col_profile_sample_df(col_profile, list_col_type_dic, csv_sep)
+            df_od = pd.DataFrame(columns=list_col_kept, dtype="object") if df_od is None else df_od.head(0)
+        else:
+            df_od = df_read_csv_schema(od_dir, file_od, list_col_exc, list_col_type_dic, sql_schema_sample_rows, csv_sep)
+
+        # Refine the column types with the stats of all the rows (lengths, integer ranges, dates)
+        dic_col_sql_types = None
+        if sql_schema_refine:
+            dic_col_sql_types = col_profile_sql_types(col_profile, list_col_type_dic, list_p_key)
+            print("Column types refined:", len(dic_col_sql_types))
+
+    # Checks whether each key is a column present in the DataFrame (therefore to be renamed)
+    if dict_rename_col is not None:
+        for key in dict_rename_col:
+            if key in df_od.columns:
+                df_od.rename(columns={key: dict_rename_col[key]}, inplace=True)
+            if dic_col_sql_types is not None and key in dic_col_sql_types:
+                dic_col_sql_types[dict_rename_col[key]] = dic_col_sql_types.pop(key)
+
+    # Create the SQL and the table schema
+    with profile_stage(profile, "sql_write"):
+        dic_schema = table_sql_write(df_od, dic_col_sql_types, list_p_key, table_name_clean, table_name_eng, path_table_eng, sql_drop_table, sql_dir_tables)
+    if sql_table_store:
+        table_store_write(path_table_eng, dic_schema, table_name_eng, profile, csv_sep)
+    print("-"*3)
+    return file_profile_end(profile, rows_num)
+
+def table_names(file_od: str, list_tables_eng_dic: dict) -> tuple:
+    """
+    Creates the table name (in ITA, from the file name) and gets its ENG name.
+
+    Parameters:
+        file_od (str): File name.
         list_tables_eng_dic (dict): Dictionary with ENG table names.
+
+    Returns:
+        tuple: the table name in ITA and in ENG.
+    """
+    file_stem = Path(file_od).stem # get the name without extension
+    table_name = file_stem.removesuffix("_csv")
+    table_name_clean = table_name.replace("-","_")
+    return table_name_clean, list_tables_eng_dic[table_name_clean]
+
+def table_sql_write(df_od: pd.DataFrame, dic_col_sql_types: dict, list_p_key: list, table_name_clean: str, table_name_eng: str, path_table_eng: Path, sql_drop_table: bool, sql_dir_tables: str) -> dict:
+    """
+    Writes the SQL table file of a table and its schema (columns, types and keys), read by the loader (03_data_load.py).
+
+    Parameters:
+        df_od (pd.DataFrame): The columns of the table (only the names and the types are used).
+        dic_col_sql_types (dict): MySQL types of the columns (if None, mapped from the DataFrame).
+        list_p_key (list): Primary key columns.
+        table_name_clean (str): Table name (in ITA).
+        table_name_eng (str): Table name in ENG.
+        path_table_eng (Path): Cleaned CSV to be imported.
+        sql_drop_table (bool): Flag indicating whether to include a DROP TABLE statement in the SQL.
+        sql_dir_tables (str): Directory where the generated SQL files will be saved.
+
+    Returns:
+        dict: the table schema.
+    """
+    # Create the SQL
+    print("> Creating SQL - table file")
+    sql_db_file = f"{table_name_clean}.sql"
+    # print(list_col_key_dic) # debug
+    print("Table name / file name:", table_name_clean, "/", sql_db_file)
+    print("Table primary keys:", list_p_key)
+    sql = df_to_sql_create_table_query(df_od, sql_drop_table, list_p_key, table_name_clean, dic_col_sql_types)
+    sql_path = Path(sql_dir_tables) / sql_db_file
+    print("Writing:", sql_path)
+    with open(sql_path, "w") as fp:
+        fp.write(sql)
+
+    # Save the table schema
+    dic_schema = {
+        'table_name': table_name_clean,
+        'table_name_eng': table_name_eng.upper(),
+        'import_file': path_table_eng.name,
+        'columns': df_to_sql_column_types(df_od, dic_col_sql_types),
+        'primary_keys': [key.replace('-', '_') for key in list_p_key]
+    }
+    schema_path = Path(sql_dir_tables) / f"{table_name_clean}.json"
+    print("Writing:", schema_path)
+    with open(schema_path, "w") as fp:
+        json.dump(dic_schema, fp, indent=4)
+    return dic_schema
+
+def table_store_write(path_table_eng: Path, dic_schema: dict, table_name_eng: str, profile: dict, csv_sep: str = ";") -> None:
+    """
+    Writes the cleaned CSV of a table as an Arrow file of the table store (see store_table_write), to be opened memory mapped by the downstream consumers.
+
+    Parameters:
+        path_table_eng (Path): Cleaned CSV to be imported.
+        dic_schema (dict): The table schema.
+        table_name_eng (str): Table name in ENG.
+        profile (dict): The profile of the file (the 'store_write' stage is added).
         csv_sep (str): Separator used in the CSV files. Default is ';'.
 
     Returns:
         None
     """
+    print("> Saving Arrow - table file (in ENG) for the table store")
+    path_store = store_path(sql_dir_store, table_name_eng)
+    print("Path:", path_store)
+    with profile_stage(profile, "store_write"):
+        rows_num = store_table_write(path_table_eng, dic_schema, path_store, csv_sep)
+    print("Rows written:", rows_num)
+
+def process_files_to_sql(od_dir: str, list_od_files: list, list_col_exc_dic: list, list_col_type_dic:list, dict_rename_col:dict, sql_drop_table: bool, list_primary_key_dic:list, sql_dir_tables:str, sql_dir_import_tables:str, list_tables_eng_dic:dict, csv_sep: str = ";", workers: int = 1) -> None:
+    """
+    Processes a list of files, excluding specified columns, and creates SQL table files (see process_file_to_sql).
 
-    for file_od in list_od_files:
-        # File info
-        print("> Reading file")
-        print("File:", file_od)
-        file_path = Path(file_od)
-        file_stem = file_path.stem # get the name without extension
-        
-        # Create the table name (in ITA)
-        table_name = file_stem.removesuffix("_csv")
-        table_name_clean = table_name.replace("-","_")
-        print("Table ITA:", table_name_clean)
-
-        # Get table name in ENG
-        table_name_eng = list_tables_eng_dic[table_name_clean]
-        print("Table ENG:", table_name_eng)
-
-        # Get the columns excluded from the configuration list
-        list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
-        list_col_exc_len = len(list_col_exc)
-        print("Columns excluded from the dataframe:", list_col_exc_len)
-        
-        # Read the file (dataset)
-        df_od = df_read_csv(od_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep) # read just one row, no needed for SQL
-
-        # Save the dataframe file in ENG name and without the columns excluded
-        print("> Saving CSV - table file (in ENG) for MySQL import")
-        path_table_eng = Path(sql_dir_import_db) / f"{table_name_eng.upper()}.csv"
-        print("Path:", path_table_eng)
-        df_od.to_csv(path_table_eng, index=False, sep = csv_sep)
-
-        # Checks whether each key is a column present in the DataFrame (therefore to be renamed)
-        if dict_rename_col is not None:
-            for key in dict_rename_col:
-                if key in df_od.columns:
-                    df_od.rename(columns={key: dict_rename_col[key]}, inplace=True)
-
-        # Create the SQL
-        print("> Creating SQL - table file")
-        sql_db_file = f"{table_name_clean}.sql"
-        # print(list_col_key_dic) # debug
-        list_p_key = get_values_from_dict_list(list_primary_key_dic, file_od) # get the key list by file name 
-        print("Table name / file name:", table_name_clean, "/", sql_db_file)
-        print("Table primary keys:", list_p_key)
-        sql = df_to_sql_create_table_query(df_od, sql_drop_table, list_p_key, table_name_clean)
-        sql_path = Path(sql_dir_tables) / sql_db_file
-        print("Writing:", sql_path)
-        with open(sql_path, "w") as fp:
-            fp.write(sql)
-        print("-"*3)
+    Parameters:
+        od_dir (str): Directory containing the original data files.
+        list_od_files (list): List of file names to be processed.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (list): List of dictionaries specifying the type of each column.
+        dict_rename_col (dict): Dictionary with column to be renamed.
+        sql_drop_table (bool): Flag indicating whether to include a DROP TABLE statement in the SQL.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        sql_dir_tables (str): Directory where the generated SQL files will be saved.
+        sql_dir_import_tables (str): Directory with CSV cleaned and with ENG name to be imported in the database.
+        list_tables_eng_dic (dict): Dictionary with ENG table names.
+        csv_sep (str): Separator used in the CSV files. Default is ';'.
+        workers (int): Number of worker processes (files are processed in parallel if greater than 1). Default is 1.
+
+    Returns:
+        list: the profiles of the files.
+    """
+
+    if workers > 1:
+        # The largest files are scheduled first so that a slow file does not finish last
+        print(f"Workers: {workers} (largest files first)")
+        print()
+        list_od_files = list_files_by_size(od_dir, list_od_files)
+    list_tasks = [(od_dir, file_od, list_col_exc_dic, list_col_type_dic, dict_rename_col, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_tables, list_tables_eng_dic, csv_sep) for file_od in list_od_files]
+    list_profiles = run_tasks_in_pool(process_file_to_sql, list_tasks, workers)
+    print()
+    return list_profiles
+
+def process_ref_file_to_sql(od_dir: str, file_od: str, list_col_exc_dic: list, list_col_type_dic:list, dict_rename_col:dict, sql_drop_table: bool, list_primary_key_dic:list, sql_dir_tables:str, sql_dir_import_tables:str, list_tables_eng_dic:dict, ref_dir: str, csv_sep: str = ";") -> None:
+    """
+    Processes a reference file (ISTAT, BDAP): its typed table (encoding detected, Italian numbers parsed, sorted by key) is built only if the file has changed (see ref_table_update), then the SQL table file and the cleaned CSV to be imported are created from it.
+
+    Parameters:
+        od_dir (str): Directory containing the original data files.
+        file_od (str): File name to be processed.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (list): List of dictionaries specifying the type of each column.
+        dict_rename_col (dict): Dictionary with column to be renamed.
+        sql_drop_table (bool): Flag indicating whether to include a DROP TABLE statement in the SQL.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        sql_dir_tables (str): Directory where the generated SQL files will be saved.
+        sql_dir_import_tables (str): Directory with CSV cleaned and with ENG name to be imported in the database.
+        list_tables_eng_dic (dict): Dictionary with ENG table names.
+        ref_dir (str): Directory of the typed tables of the reference files.
+        csv_sep (str): Separator used in the CSV files. Default is ';'.
+
+    Returns:
+        dict: the profile of the file (see process_file_to_sql).
+    """
+
+    # File info
+    print("> Reading reference file")
+    print("File:", file_od)
+    profile = file_profile_init(file_od, (Path(od_dir) / file_od).stat().st_size)
+    profile['od_dir'] = od_dir
+    table_name_clean, table_name_eng = table_names(file_od, list_tables_eng_dic)
+    print("Table ITA:", table_name_clean)
+    print("Table ENG:", table_name_eng)
+
+    list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
+    list_p_key = get_values_from_dict_list(list_primary_key_dic, file_od)
+    print("Columns excluded from the dataframe:", len(list_col_exc))
+
+    # Typed table, built again only if the file has changed
+    with profile_stage(profile, "ref_table"):
+        df_ref, dic_manifest, is_built = ref_table_update(od_dir, file_od, ref_dir, list_col_exc, list_col_type_dic, dict_rename_col, list_p_key, csv_sep)
+    print("Typed table:", "built" if is_built else "unchanged, read from", ref_paths(ref_dir, file_od)[0])
+    print("Encoding:", dic_manifest['encoding'])
+    print("Numeric columns (Italian format):", len(dic_manifest['numeric_columns']))
+    if dic_manifest['duplicated_keys'] > 0:
+        print("Duplicated keys:", dic_manifest['duplicated_keys'])
+
+    # Save the file in ENG name (numbers with the dot as decimal separator, missing values empty)
+    print("> Saving CSV - table file (in ENG) for MySQL import")
+    path_table_eng = Path(sql_dir_import_tables) / f"{table_name_eng.upper()}.csv"
+    print("Path:", path_table_eng)
+    with profile_stage(profile, "csv_write"):
+        df_ref.to_csv(path_table_eng, sep=csv_sep, index=False)
+    print("Rows written:", len(df_ref))
+
+    # Column types from the stats of all the rows (as written in the CSV)
+    with profile_stage(profile, "schema"):
+        list_cols = list(df_ref.columns)
+        col_profile = col_profile_init(list_cols)
+        df_text = pd.DataFrame({col: df_ref[col].astype("string").fillna("") for col in list_cols})
+        col_profile_update(col_profile, pa.RecordBatch.from_pandas(df_text, preserve_index=False))
+        dic_col_types = {col: str(dtype) for col, dtype in df_ref.dtypes.items()}
+        dic_col_sql_types = col_profile_sql_types(col_profile, dic_col_types, list_p_key)
+
+    # Create the SQL and the table schema
+    with profile_stage(profile, "sql_write"):
+        dic_schema = table_sql_write(df_ref.head(0), dic_col_sql_types, list_p_key, table_name_clean, table_name_eng, path_table_eng, sql_drop_table, sql_dir_tables)
+    if sql_table_store:
+        table_store_write(path_table_eng, dic_schema, table_name_eng, profile, csv_sep)
+    print("-"*3)
+    return file_profile_end(profile, len(df_ref))
+
+def process_ref_files_to_sql(od_dir: str, list_od_files: list, list_col_exc_dic: list, list_col_type_dic:list, dict_rename_col:dict, sql_drop_table: bool, list_primary_key_dic:list, sql_dir_tables:str, sql_dir_import_tables:str, list_tables_eng_dic:dict, ref_dir: str, csv_sep: str = ";", workers: int = 1) -> None:
+    """
+    Processes a list of reference files in parallel (see process_ref_file_to_sql).
+
+    Parameters:
+        od_dir (str): Directory containing the original data files.
+        list_od_files (list): List of file names to be processed.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (list): List of dictionaries specifying the type of each column.
+        dict_rename_col (dict): Dictionary with column to be renamed.
+        sql_drop_table (bool): Flag indicating whether to include a DROP TABLE statement in the SQL.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        sql_dir_tables (str): Directory where the generated SQL files will be saved.
+        sql_dir_import_tables (str): Directory with CSV cleaned and with ENG name to be imported in the database.
+        list_tables_eng_dic (dict): Dictionary with ENG table names.
+        ref_dir (str): Directory of the typed tables of the reference files.
+        csv_sep (str): Separator used in the CSV files. Default is ';'.
+        workers (int): Number of worker processes (files are processed in parallel if greater than 1). Default is 1.
+
+    Returns:
+        list: the profiles of the files.
+    """
+
+    list_tasks = [(od_dir, file_od, list_col_exc_dic, list_col_type_dic, dict_rename_col, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_tables, list_tables_eng_dic, ref_dir, csv_sep) for file_od in list_files_by_size(od_dir, list_od_files)]
+    list_profiles = run_tasks_in_pool(process_ref_file_to_sql, list_tasks, workers)
     print()
+    return list_profiles
+
+def sql_conf_hash(file_od: str, list_col_exc_dic: list, list_col_type_dic: dict, dict_rename_col: dict, list_primary_key_dic: list, list_tables_eng_dic: dict) -> str:
+    """
+    Computes the hash of the configuration the SQL table file and the import CSV of a file depend on (columns, types, renames, keys, table name and schema options), recorded in the manifest.
+
+    Parameters:
+        file_od (str): File name.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (dict): Dictionary specifying the type of each column.
+        dict_rename_col (dict): Dictionary with column to be renamed.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        list_tables_eng_dic (dict): Dictionary with ENG table names.
 
-def create_sql_load_commands(folder_path: str, output_file:str, extension: str = "csv") -> None:
+    Returns:
+        str: The hexadecimal hash of the configuration.
+    """
+    conf = {
+        'col_exc': sorted(get_values_from_dict_list(list_col_exc_dic, file_od)),
+        'col_type': list_col_type_dic,
+        'rename': dict_rename_col,
+        'col_pk': get_values_from_dict_list(list_primary_key_dic, file_od),
+        'table_names': table_names(file_od, list_tables_eng_dic),
+        'drop_table': sql_drop_table,
+        'schema_sample': sql_schema_sample,
+        'schema_sample_rows': sql_schema_sample_rows,
+        'schema_refine': sql_schema_refine,
+        'csv_sep': csv_sep
+    }
+    return stats_conf_hash(conf)
+
+def sql_output_paths(file_od: str, list_tables_eng_dic: dict) -> list:
+    """
+    Lists the files written for a file: its SQL table file, its schema, its cleaned CSV to be imported and its Arrow file (with SQL_TABLE_STORE).
+
+    Parameters:
+        file_od (str): File name.
+        list_tables_eng_dic (dict): Dictionary with ENG table names.
+
+    Returns:
+        list: the paths of the files.
+    """
+    table_name_clean, table_name_eng = table_names(file_od, list_tables_eng_dic)
+    list_outputs = [Path(sql_dir_tables) / f"{table_name_clean}.sql", Path(sql_dir_tables) / f"{table_name_clean}.json", Path(sql_dir_import_db) / f"{table_name_eng.upper()}.csv"]
+    if sql_table_store:
+        list_outputs.append(store_path(sql_dir_store, table_name_eng))
+    return list_outputs
+
+def create_sql_load_commands(folder_path: str, output_file:str, extension: str = "csv", csv_sep: str = ";") -> None:
     """
     Creates SQL LOAD DATA INFILE commands for each file with the given extension in the specified folder and writes them to a file named import_data.sql.
 
@@ -128,6 +418,7 @@ def create_sql_load_commands(folder_path: str, output_file:str, extension: str =
         folder_path (str): The path to the folder containing the files.
         output_file (str): The file name with import commands results.
         extension (str): The file extension to search for (e.g., 'csv').
+        csv_sep (str): The separator of the files. Default is ';'.
 
     Returns:
         None
@@ -140,7 +431,7 @@ def create_sql_load_commands(folder_path: str, output_file:str, extension: str =
         command = f"""
                 LOAD DATA INFILE '{file.name}'
                 INTO TABLE {table_name}
-                FIELDS TERMINATED BY ','
+                FIELDS TERMINATED BY '{csv_sep}'
                 ENCLOSED BY '"'
                 LINES TERMINATED BY '\\n'
                 IGNORE 1 LINES;
@@ -155,7 +446,7 @@ def create_sql_load_commands(folder_path: str, output_file:str, extension: str =
         sql_file.write(sql_script)
 
 ### MAIN ###
-def main():
+def main(workers: int = 1, profile_mode: str = None, force: bool = False):
     print()
     print(f"*** PROGRAM START ({script_name}) ***")
     print()
@@ -164,16 +455,25 @@ def main():
     print("Start process: " + str(start_time))
     print()
 
+    if sql_schema_sample not in SCHEMA_SAMPLE_MODES:
+        raise ValueError(f"Unknown schema sample '{sql_schema_sample}' (allowed: {', '.join(SCHEMA_SAMPLE_MODES)})")
+
     print(">> Preparing output directories")
     check_and_create_directory(sql_dir_tables)
     check_and_create_directory(sql_dir_db)
     check_and_create_directory(sql_dir_import_db)
+    if sql_table_store:
+        check_and_create_directory(sql_dir_store)
+    check_and_create_directory(stats_dir)
     print()
 
+    run_profile = {'stages': {}} # seconds of the stages of the run
+
     # ANAC OD
     print(">> Scanning Open Data catalogue")
     print("Directory:", od_anac_dir)
-    list_od_files = list_files_by_type(od_anac_dir, od_file_type)
+    with profile_stage(run_profile, "scan"):
+        list_od_files = list_files_by_type(od_anac_dir, od_file_type)
     list_od_files_len = len(list_od_files)
     print(f"Files '{od_file_type}' found: {list_od_files_len}")
     print()
@@ -181,14 +481,16 @@ def main():
     # ISTAT
     print(">> Scanning ISTAT catalogue")
     print("Directory:", od_istat_dir)
-    list_istat_files = list_files_by_type(od_istat_dir, od_file_type)
+    with profile_stage(run_profile, "scan"):
+        list_istat_files = list_files_by_type(od_istat_dir, od_file_type)
     list_istat_files_len = len(list_istat_files)
     print(f"Files '{od_file_type}' found: {list_istat_files_len}")
     print()
 
     print(">> Scanning BDAP catalogue")
     print("Directory:", od_bdap_dir)
-    list_bdap_files = list_files_by_type(od_bdap_dir, od_file_type)
+    with profile_stage(run_profile, "scan"):
+        list_bdap_files = list_files_by_type(od_bdap_dir, od_file_type)
     list_bdap_files_len = len(list_bdap_files)
     print(f"Files '{od_file_type}' found: {list_bdap_files_len}")
     print()
@@ -212,80 +514,149 @@ def main():
     print("Files indexed (columns keys):", list_col_key_dic_len)
     print()
 
+    dic_manifest = None
+    list_sources = []
+    if manifest_skip_unchanged:
+        # Files whose SQL table file, schema and import CSV are up to date (same file, same configuration, outputs not changed) are skipped
+        print(">> Checking the manifest")
+        with profile_stage(run_profile, "manifest"):
+            dic_manifest = manifest_load(manifest_dir, script_name)
+            dic_pending = {}
+            list_skipped = []
+            list_catalogues = [(od_anac_dir, list_od_files, None), (od_istat_dir, list_istat_files, dic_istat_columns_fix), (od_bdap_dir, list_bdap_files, dic_bdap_columns_fix)]
+            for od_dir, list_files, dict_rename_col in list_catalogues:
+                for file_od in list_files:
+                    path_file = Path(od_dir) / file_od
+                    list_sources.append(path_file)
+                    conf_hash = sql_conf_hash(file_od, list_col_exc_dic, list_col_type_dic, dict_rename_col, list_primary_key_dic, list_tables_eng_dic)
+                    is_current, dic_fingerprint = manifest_check(dic_manifest, path_file, conf_hash, sql_output_paths(file_od, list_tables_eng_dic), manifest_hash_mode)
+                    if is_current and not force:
+                        list_skipped.append(path_file)
+                    else:
+                        dic_pending[path_file] = (file_od, dic_fingerprint, conf_hash)
+            list_od_files = [file_od for file_od in list_od_files if Path(od_anac_dir) / file_od in dic_pending]
+            list_istat_files = [file_od for file_od in list_istat_files if Path(od_istat_dir) / file_od in dic_pending]
+            list_bdap_files = [file_od for file_od in list_bdap_files if Path(od_bdap_dir) / file_od in dic_pending]
+        if force:
+            print("Forced, all the files are processed")
+        print("Files unchanged (skipped):", len(list_skipped))
+        print("Files to be processed:", len(dic_pending))
+        print()
+
     print(">> Creating SQL files")
     
-    process_files_to_sql(od_anac_dir, list_od_files, list_col_exc_dic, list_col_type_dic, None, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, csv_sep)
-    process_files_to_sql(od_istat_dir, list_istat_files, list_col_exc_dic, list_col_type_dic, dic_istat_columns_fix, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, csv_sep)
-    process_files_to_sql(od_bdap_dir, list_bdap_files, list_col_exc_dic, list_col_type_dic, dic_bdap_columns_fix, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, csv_sep)
-    print()
-    
-    # Create the final SQL 
-    # 0) Create the file
-    print(">> Creating final SQL file")
-    sql_db_file = f"_{db_name}.sql"
-    path_out = Path(sql_dir_db) / sql_db_file
-    print("Directory output:", sql_dir_db)
-    print("File output:", path_out)
-    print()
-
-    # 1) Get all SQL files of tables
-    print(f"> Listing '{sql_file_type}' files in '{sql_dir_tables}'")
-    list_sql_files = list_files_by_type(sql_dir_tables, sql_file_type)
-    list_sql_files_len = len(list_sql_files)
-    print(f"Files '{sql_file_type}' found: {list_sql_files_len}")
-    print()
-
-    # 2) Add DB creation statement
-    print("> Creating DB statement")
-    print("DB name:", db_name)
-    sql = sql_create_database(db_name, db_name_drop)
-    sql_path = Path(sql_dir_tables) / sql_db_file
-    print("Writing:", sql_path)
-    with open(sql_path, "w") as fp:
-        fp.write(sql)
-    print()
-
-    # 3) Join SQL files from tables 
-    print("> Creating unique SQL file")
-    read_files = glob.glob(f"{sql_dir_tables}/*.sql")
-    with open(path_out, "wb") as outfile:
-        for f in read_files:
-            with open(f, "rb") as infile:
-                outfile.write(infile.read())
-    print("[OK]")
+    with profile_stage(run_profile, "files"):
+        list_profiles = process_files_to_sql(od_anac_dir, list_od_files, list_col_exc_dic, list_col_type_dic, None, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, csv_sep, workers)
+        list_profiles += process_ref_files_to_sql(od_istat_dir, list_istat_files, list_col_exc_dic, list_col_type_dic, dic_istat_columns_fix, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, ref_dir, csv_sep, workers)
+        list_profiles += process_ref_files_to_sql(od_bdap_dir, list_bdap_files, list_col_exc_dic, list_col_type_dic, dic_bdap_columns_fix, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, ref_dir, csv_sep, workers)
     print()
-    
-    # 4) Add Foreign keys
-    list_fk = []
-    print("> Adding FK statement")
-    for sql_file_name in list_sql_files:
-        table_name = Path(sql_file_name).stem
-        print("Table name:", table_name)
-        list_f_key = get_values_from_dict_list(list_foreign_key_dic, table_name)
-        print("Foreign keys:", list_f_key)
-        if len(list_f_key) > 0:
-            str_fk = sql_generate_foreign_keys(table_name, list_f_key)
-            list_fk.append(str_fk)
-    # print(list_fk) # debug
-    path_out = Path(sql_dir_db) / sql_db_file
-    with open(path_out, "a") as fp:
-        for sql_string in list_fk:
-            fp.write(sql_string)
-    
-    # 5) Add tables in english
-    print(list_tables_eng_dic)
-    rename_statements = [f"RENAME TABLE {old_name} TO {new_name.upper()};" for old_name, new_name in list_tables_eng_dic.items()]
-    with open(path_out, "a") as fp:
-        for rename_s in rename_statements:
-            fp.write(rename_s + "\n")
 
-    print()
-    print("Final database SQL file to be imported in MySQL in:", path_out)
+    if profile_mode is not None and len(list_profiles) > 0:
+        # The slowest file is processed again under the profiler (its outputs are written again, the same)
+        profile_slowest = max(list_profiles, key=lambda profile: profile['sec'])
+        file_slowest, od_dir_slowest = profile_slowest['file_name'], profile_slowest['od_dir']
+        print(f">> Profiling the slowest file ({profile_mode})")
+        print("File:", file_slowest)
+        path_base = Path(stats_dir) / f"_profile_{Path(file_slowest).stem}_{profile_mode}"
+        if od_dir_slowest == od_anac_dir:
+            profile_capture(profile_mode, process_file_to_sql, (od_dir_slowest, file_slowest, list_col_exc_dic, list_col_type_dic, None, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, csv_sep), path_base)
+        else:
+            dict_rename_col = dic_istat_columns_fix if od_dir_slowest == od_istat_dir else dic_bdap_columns_fix
+            profile_capture(profile_mode, process_ref_file_to_sql, (od_dir_slowest, file_slowest, list_col_exc_dic, list_col_type_dic, dict_rename_col, sql_drop_table, list_primary_key_dic, sql_dir_tables, sql_dir_import_db, list_tables_eng_dic, ref_dir, csv_sep), path_base)
+        print("Writing profile:", path_base.with_suffix(".txt"))
+        print()
+
+    if dic_manifest is not None:
+        # The files processed are recorded with the outputs just written (the ones of the profiled file included)
+        print(">> Saving the manifest")
+        for path_file, (file_od, dic_fingerprint, conf_hash) in dic_pending.items():
+            manifest_update(dic_manifest, path_file, dic_fingerprint, conf_hash, sql_output_paths(file_od, list_tables_eng_dic))
+        manifest_save(dic_manifest, list_sources)
+        print("Writing JSON:", dic_manifest['path'])
+        print()
+
+    if sql_table_store:
+        print(">> Writing the catalogue of the table store")
+        with profile_stage(run_profile, "store_catalogue"):
+            dic_catalogue = store_catalogue_write(sql_dir_store, sql_dir_tables)
+        print("Directory:", sql_dir_store)
+        print("Tables:", len(dic_catalogue))
+        print()
+
+    with profile_stage(run_profile, "final_sql"):
+        # Create the final SQL 
+        # 0) Create the file
+        print(">> Creating final SQL file")
+        sql_db_file = f"_{db_name}.sql"
+        path_out = Path(sql_dir_db) / sql_db_file
+        print("Directory output:", sql_dir_db)
+        print("File output:", path_out)
+        print()
+
+        # 1) Get all SQL files of tables
+        print(f"> Listing '{sql_file_type}' files in '{sql_dir_tables}'")
+        list_sql_files = list_files_by_type(sql_dir_tables, sql_file_type)
+        list_sql_files_len = len(list_sql_files)
+        print(f"Files '{sql_file_type}' found: {list_sql_files_len}")
+        print()
+
+        # 2) Add DB creation statement
+        print("> Creating DB statement")
+        print("DB name:", db_name)
+        sql = sql_create_database(db_name, db_name_drop)
+        sql_path = Path(sql_dir_tables) / sql_db_file
+        print("Writing:", sql_path)
+        with open(sql_path, "w") as fp:
+            fp.write(sql)
+        print()
+
+        # 3) Join SQL files from tables 
+        print("> Creating unique SQL file")
+        read_files = sorted(glob.glob(f"{sql_dir_tables}/*.sql")) # the DB file ('_' prefix) comes first, whatever the order the tables were written
+        with open(path_out, "wb") as outfile:
+            for f in read_files:
+                with open(f, "rb") as infile:
+                    outfile.write(infile.read())
+        print("[OK]")
+        print()
+
+        # 4) Add Foreign keys
+        list_fk = []
+        print("> Adding FK statement")
+        for sql_file_name in list_sql_files:
+            table_name = Path(sql_file_name).stem
+            print("Table name:", table_name)
+            list_f_key = get_values_from_dict_list(list_foreign_key_dic, table_name)
+            print("Foreign keys:", list_f_key)
+            if len(list_f_key) > 0:
+                str_fk = sql_generate_foreign_keys(table_name, list_f_key)
+                list_fk.append(str_fk)
+        # print(list_fk) # debug
+        path_out = Path(sql_dir_db) / sql_db_file
+        with open(path_out, "a") as fp:
+            for sql_string in list_fk:
+                fp.write(sql_string)
+
+        # 5) Add tables in english
+        print(list_tables_eng_dic)
+        rename_statements = [f"RENAME TABLE {old_name} TO {new_name.upper()};" for old_name, new_name in list_tables_eng_dic.items()]
+        with open(path_out, "a") as fp:
+            for rename_s in rename_statements:
+                fp.write(rename_s + "\n")
+
+        print()
+        print("Final database SQL file to be imported in MySQL in:", path_out)
+        print()
+
+        # Creating import file
+        print(">> Creating import files")
+        create_sql_load_commands(sql_dir_import_db, "_import_script.sql", "csv", csv_sep)
     print()
 
-    # Creating import file
-    print(">> Creating import files")
-    create_sql_load_commands(sql_dir_import_db, "_import_script.sql", "csv")
+    print(">> Writing the run report")
+    path_json, path_csv = run_report_write(list_profiles, run_profile['stages'], stats_dir, script_name, csv_sep)
+    print("Writing JSON:", path_json)
+    print("Writing CSV:", path_csv)
 
     # Program end
     end_time = datetime.now().replace(microsecond=0)
@@ -302,4 +673,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Creates the SQL scripts and the cleaned CSV files of the Open Data catalogue")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (files are processed in parallel, largest first)")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None, help="process the slowest file again under cProfile or tracemalloc (reports in OD_STATS_DIR)")
+    parser.add_argument("--force", action="store_true", help="process all the files, also the unchanged ones (with MANIFEST_SKIP_UNCHANGED)")
+    args = parser.parse_args()
+    main(args.workers, args.profile, args.force)
\ No newline at end of file
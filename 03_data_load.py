@@ -0,0 +1,173 @@
+# 03_data_load.py
+
+### IMPORT ###
+import argparse
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_sorted_dict, check_and_create_directory, script_info
+from utility_manager.db_loader import LOAD_ENGINES, table_schemas_read, foreign_key_edges, foreign_key_levels, db_pool_init, db_pool_close, db_load_table, db_build_indexes, db_check_foreign_key
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+
+# INPUT
+conf_file_foreign_keys = str(yaml_config["CONF_FOREIGN_KEYS_FILE"]) # JSON
+sql_dir_tables = str(yaml_config["SQL_DIR_TABLES"]) # table schemas written by 02_data_sql.py
+sql_dir_import_db = str(yaml_config["SQL_DIR_TABLES_IMPORT"]) # cleaned CSVs written by 02_data_sql.py
+sql_drop_table = bool(yaml_config["SQL_DROP_TABLE"])
+db_name_drop = bool(yaml_config["SQL_DROP_DB"])
+db_name = str(yaml_config["SQL_DB_NAME"])
+load_engine = str(yaml_config["LOAD_ENGINE"]) # sqlite or duckdb
+load_workers = int(yaml_config["LOAD_WORKERS"]) # tables loaded in parallel
+load_batch_rows = int(yaml_config["LOAD_BATCH_ROWS"]) # rows for each insert batch (sqlite)
+
+# OUTPUT
+load_db_dir = str(yaml_config["LOAD_DB_DIR"]) # output
+
+script_path, script_name = script_info(__file__)
+
+### FUNCTIONS ###
+
+def run_in_threads(func, list_tasks: list, workers: int = 1) -> list:
+    """
+    Runs a function over a list of independent tasks in a thread pool (the loads wait on the database, not on Python).
+
+    Parameters:
+        func (callable): The function to be run.
+        list_tasks (list): List of tuples with the arguments of each task.
+        workers (int): Number of threads.
+
+    Returns:
+        list: The results of the function, in the same order as the tasks.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(lambda args: func(*args), list_tasks))
+
+### MAIN ###
+def main(engine: str, workers: int = 1):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process: " + str(start_time))
+    print()
+
+    if engine not in LOAD_ENGINES:
+        raise ValueError(f"Unknown load engine '{engine}' (allowed: {', '.join(LOAD_ENGINES)})")
+
+    print(">> Preparing output directories")
+    check_and_create_directory(load_db_dir)
+    print()
+
+    print(">> Reading the table schemas")
+    print("Directory:", sql_dir_tables)
+    dic_schemas = table_schemas_read(sql_dir_tables)
+    print("Tables found:", len(dic_schemas))
+    print()
+
+    print(">> Reading the configuration file")
+    print("File (foreign keys):", conf_file_foreign_keys)
+    dic_foreign_keys = json_to_sorted_dict(conf_file_foreign_keys)
+    list_edges = foreign_key_edges(dic_foreign_keys, list(dic_schemas))
+    list_levels = foreign_key_levels(list(dic_schemas), list_edges)
+    print("Foreign keys between the tables:", len(list_edges))
+    for level_num, list_level in enumerate(list_levels):
+        print(f"Load level {level_num}:", list_level)
+    print()
+
+    # Open the database
+    path_db = Path(load_db_dir) / f"{db_name}.{engine}"
+    print(">> Opening the database")
+    print("Engine:", engine)
+    print("Path:", path_db)
+    if db_name_drop:
+        for path_old in [path_db, Path(f"{path_db}.wal"), Path(f"{path_db}-wal"), Path(f"{path_db}-shm")]:
+            path_old.unlink(missing_ok=True)
+    pool = db_pool_init(engine, path_db, max(1, workers))
+    print("Connections:", max(1, workers))
+    print()
+
+    try:
+        # Load the tables, level by level (the referenced tables first); foreign keys and indexes are not enforced during the load
+        print(">> Loading the tables")
+        list_results = []
+        for level_num, list_level in enumerate(list_levels):
+            list_tasks = [(pool, dic_schemas[table_name], Path(sql_dir_import_db) / dic_schemas[table_name]['import_file'], csv_sep, load_batch_rows, sql_drop_table) for table_name in list_level]
+            for dic_result in run_in_threads(db_load_table, list_tasks, workers):
+                dic_result['level'] = level_num
+                print(f"Table: {dic_result['table_name']} - rows: {dic_result['rows']} - sec: {dic_result['sec']} - rows/s: {dic_result['rows_per_sec']}")
+                if dic_result['error'] is not None:
+                    print("[ERROR]", dic_result['error'])
+                list_results.append(dic_result)
+        print()
+
+        # Build the keys and the indexes of the loaded tables
+        print(">> Building the indexes")
+        set_loaded = {dic_result['table_name'] for dic_result in list_results if dic_result['error'] is None}
+        list_loaded = [table_name for table_name in dic_schemas if dic_schemas[table_name]['table_name_eng'] in set_loaded]
+        list_tasks = [(pool, dic_schemas[table_name]) for table_name in list_loaded]
+        dic_index_results = {}
+        for dic_result in run_in_threads(db_build_indexes, list_tasks, workers):
+            print(f"Table: {dic_result['table_name']} - indexes: {dic_result['indexes']} - sec: {dic_result['sec']}")
+            for error in dic_result['errors']:
+                print("[ERROR]", error)
+            dic_index_results[dic_result['table_name']] = dic_result
+        print()
+
+        # Check the foreign keys
+        print(">> Checking the foreign keys")
+        list_edges_loaded = [edge for edge in list_edges if edge[0] in list_loaded and edge[2] in list_loaded]
+        list_tasks = [(pool, dic_schemas[table_name]['table_name_eng'], column, dic_schemas[foreign_table]['table_name_eng'], foreign_column) for table_name, column, foreign_table, foreign_column in list_edges_loaded]
+        list_orphans = run_in_threads(db_check_foreign_key, list_tasks, workers)
+        dic_orphans = {}
+        for (table_name, column, foreign_table, foreign_column), orphans_num in zip(list_edges_loaded, list_orphans):
+            print(f"{table_name}.{column} -> {foreign_table}.{foreign_column}: rows without match {orphans_num}")
+            dic_orphans[dic_schemas[table_name]['table_name_eng']] = dic_orphans.get(dic_schemas[table_name]['table_name_eng'], 0) + orphans_num
+        print()
+    finally:
+        db_pool_close(pool)
+
+    # Report
+    print(">> Writing the load report")
+    for dic_result in list_results:
+        dic_index_result = dic_index_results.get(dic_result['table_name'], {})
+        dic_result['indexes'] = dic_index_result.get('indexes', 0)
+        dic_result['indexes_sec'] = dic_index_result.get('sec', 0.0)
+        dic_result['indexes_errors'] = "; ".join(dic_index_result.get('errors', []))
+        dic_result['fk_rows_without_match'] = dic_orphans.get(dic_result['table_name'], 0)
+    df_report = pd.DataFrame(list_results)
+    path_report = Path(load_db_dir) / f"_{db_name}_{engine}_load.csv"
+    print("Writing CSV:", path_report)
+    df_report.to_csv(path_report, sep=csv_sep, index=False)
+    rows_total = int(df_report['rows'].sum()) if len(df_report) > 0 else 0
+    print("Rows loaded:", rows_total)
+
+    # Program end
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+    print()
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Creates the database and loads the cleaned CSV files written by 02_data_sql.py into a local SQLite or DuckDB database")
+    parser.add_argument("--engine", choices=LOAD_ENGINES, default=load_engine, help="database engine (default: LOAD_ENGINE)")
+    parser.add_argument("--workers", type=int, default=load_workers, help="number of tables loaded in parallel (default: LOAD_WORKERS)")
+    args = parser.parse_args()
+    main(args.engine, args.workers)
@@ -0,0 +1,110 @@
+# 04_data_join.py
+
+### IMPORT ###
+import argparse
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_sorted_dict, check_and_create_directory, script_info
+from utility_manager.db_loader import table_schemas_read, foreign_key_edges
+from utility_manager.join_planner import view_plan, view_build
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+
+# INPUT
+conf_file_foreign_keys = str(yaml_config["CONF_FOREIGN_KEYS_FILE"]) # JSON
+sql_dir_tables = str(yaml_config["SQL_DIR_TABLES"]) # table schemas written by 02_data_sql.py
+sql_dir_import_db = str(yaml_config["SQL_DIR_TABLES_IMPORT"]) # cleaned CSVs written by 02_data_sql.py
+dic_join_views = dict(yaml_config["JOIN_VIEWS"] or {}) # denormalised views: base table and columns of each table
+join_chunk_rows = int(yaml_config["JOIN_CHUNK_ROWS"]) # rows of the base table joined at a time
+join_build_max_mb = int(yaml_config["JOIN_BUILD_MAX_MB"]) # largest table file joined in memory
+join_spill_partitions = int(yaml_config["JOIN_SPILL_PARTITIONS"]) # partitions of a join on disk
+join_spill_dir = str(yaml_config["JOIN_SPILL_DIR"]) # directory of the partition files
+
+# OUTPUT
+join_dir = str(yaml_config["JOIN_DIR"]) # output
+
+script_path, script_name = script_info(__file__)
+
+### MAIN ###
+def main(list_views: list):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process: " + str(start_time))
+    print()
+
+    list_unknown = [view_name for view_name in list_views if view_name not in dic_join_views]
+    if len(list_unknown) > 0:
+        raise ValueError(f"Unknown views {list_unknown} (configured: {', '.join(dic_join_views)})")
+
+    print(">> Preparing output directories")
+    check_and_create_directory(join_dir)
+    print()
+
+    print(">> Reading the table schemas")
+    print("Directory:", sql_dir_tables)
+    dic_schemas = table_schemas_read(sql_dir_tables)
+    print("Tables found:", len(dic_schemas))
+    print()
+
+    print(">> Reading the configuration file")
+    print("File (foreign keys):", conf_file_foreign_keys)
+    dic_foreign_keys = json_to_sorted_dict(conf_file_foreign_keys)
+    list_edges = foreign_key_edges(dic_foreign_keys, list(dic_schemas))
+    print("Foreign keys between the tables:", len(list_edges))
+    print()
+
+    list_results = []
+    for view_name in list_views:
+        dic_view = dic_join_views[view_name]
+        print(">> Building view:", view_name)
+        print("Base table:", dic_view['base'])
+        list_steps, _, list_view_cols = view_plan(view_name, dic_view, dic_schemas, list_edges)
+        for step in list_steps:
+            join_type = "one-to-many" if step['one_to_many'] else "lookup"
+            print(f"Join: {step['parent']}.({', '.join(step['left_keys'])}) -> {step['table']}.({', '.join(step['right_keys'])}) [{join_type}]")
+        print("Columns:", len(list_view_cols))
+        path_out = Path(join_dir) / f"{view_name}.csv"
+        dic_result = view_build(view_name, dic_view, dic_schemas, list_edges, sql_dir_import_db, path_out, csv_sep, join_chunk_rows, join_build_max_mb, join_spill_dir, join_spill_partitions)
+        for dic_join in dic_result['joins']:
+            print(f"Table: {dic_join['table']} - method: {dic_join['method']} - rows without match: {dic_join['rows_without_match']}")
+            list_results.append({'view_name': view_name, 'rows': dic_result['rows'], 'sec': dic_result['sec'], **dic_join})
+        print("Writing CSV:", path_out)
+        print(f"Rows: {dic_result['rows']} - sec: {dic_result['sec']}")
+        print()
+
+    # Report
+    print(">> Writing the join report")
+    path_report = Path(join_dir) / "_join_views.csv"
+    print("Writing CSV:", path_report)
+    pd.DataFrame(list_results).to_csv(path_report, sep=csv_sep, index=False)
+
+    # Program end
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+    print()
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the denormalised views of JOIN_VIEWS joining the cleaned CSV files written by 02_data_sql.py on the foreign keys")
+    parser.add_argument("--views", nargs="+", default=list(dic_join_views), help="views to be built (default: all the views of JOIN_VIEWS)")
+    args = parser.parse_args()
+    main(args.views)
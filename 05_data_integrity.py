@@ -0,0 +1,111 @@
+# 05_data_integrity.py
+
+### IMPORT ###
+import argparse
+import shutil
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_sorted_dict, check_and_create_directory, run_tasks_in_pool, script_info
+from utility_manager.db_loader import table_schemas_read, foreign_key_edges
+from utility_manager.integrity import table_keys_scan, foreign_key_scan
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+
+# INPUT
+conf_file_foreign_keys = str(yaml_config["CONF_FOREIGN_KEYS_FILE"]) # JSON
+sql_dir_tables = str(yaml_config["SQL_DIR_TABLES"]) # table schemas (with the primary keys) written by 02_data_sql.py
+sql_dir_import_db = str(yaml_config["SQL_DIR_TABLES_IMPORT"]) # cleaned CSVs written by 02_data_sql.py
+integrity_workers = int(yaml_config["INTEGRITY_WORKERS"]) # tables and foreign keys checked in parallel
+integrity_chunk_rows = int(yaml_config["INTEGRITY_CHUNK_ROWS"]) # rows read at a time
+integrity_sample_size = int(yaml_config["INTEGRITY_SAMPLE_SIZE"]) # orphan and duplicated keys kept as examples
+integrity_keys_dir = str(yaml_config["INTEGRITY_KEYS_DIR"]) # directory of the key arrays
+
+# OUTPUT
+stats_dir = str(yaml_config["OD_STATS_DIR"]) # output
+
+script_path, script_name = script_info(__file__)
+
+### MAIN ###
+def main(workers: int = 1):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process: " + str(start_time))
+    print()
+
+    print(">> Preparing output directories")
+    check_and_create_directory(stats_dir)
+    shutil.rmtree(integrity_keys_dir, ignore_errors=True)
+    check_and_create_directory(integrity_keys_dir)
+    print()
+
+    print(">> Reading the table schemas")
+    print("Directory:", sql_dir_tables)
+    dic_schemas = table_schemas_read(sql_dir_tables)
+    print("Tables found:", len(dic_schemas))
+    print()
+
+    print(">> Reading the configuration file")
+    print("File (foreign keys):", conf_file_foreign_keys)
+    dic_foreign_keys = json_to_sorted_dict(conf_file_foreign_keys)
+    list_edges = foreign_key_edges(dic_foreign_keys, list(dic_schemas))
+    print("Foreign keys between the tables:", len(list_edges))
+    print()
+
+    try:
+        # 1) Primary keys and key arrays of the referenced columns, a task for each table
+        print(">> Checking the primary keys and building the key arrays")
+        dic_ref_cols = {table_name: [] for table_name in dic_schemas}
+        for _, _, foreign_table, foreign_column in list_edges:
+            if foreign_column not in dic_ref_cols[foreign_table]:
+                dic_ref_cols[foreign_table].append(foreign_column)
+        list_tasks = [(dic_schemas[table_name], Path(sql_dir_import_db) / dic_schemas[table_name]['import_file'], dic_ref_cols[table_name], Path(integrity_keys_dir), csv_sep, integrity_chunk_rows, integrity_sample_size) for table_name in dic_schemas]
+        list_pk_results = run_tasks_in_pool(table_keys_scan, list_tasks, workers)
+        print()
+
+        # 2) Foreign keys, a task for each foreign key streaming the table against the key array of the referenced column
+        print(">> Checking the foreign keys")
+        list_tasks = [(dic_schemas[table_name], Path(sql_dir_import_db) / dic_schemas[table_name]['import_file'], column, foreign_table, foreign_column, Path(integrity_keys_dir), csv_sep, integrity_chunk_rows, integrity_sample_size) for table_name, column, foreign_table, foreign_column in list_edges]
+        list_fk_results = run_tasks_in_pool(foreign_key_scan, list_tasks, workers)
+        print()
+    finally:
+        shutil.rmtree(integrity_keys_dir, ignore_errors=True)
+
+    # Report
+    print(">> Writing the integrity reports")
+    for list_results, file_name in [(list_pk_results, "_integrity_pk.csv"), (list_fk_results, "_integrity_fk.csv")]:
+        path_report = Path(stats_dir) / file_name
+        print("Writing CSV:", path_report)
+        pd.DataFrame(list_results).to_csv(path_report, sep=csv_sep, index=False)
+    print("Tables with duplicated or empty primary keys:", sum(1 for dic_result in list_pk_results if dic_result['duplicated_pk_rows'] > 0 or dic_result['pk_null_rows'] > 0))
+    print("Foreign keys with orphan rows:", sum(1 for dic_result in list_fk_results if dic_result['orphan_rows'] > 0))
+
+    # Program end
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+    print()
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the primary keys and the foreign keys of the cleaned CSV files written by 02_data_sql.py before the MySQL import")
+    parser.add_argument("--workers", type=int, default=integrity_workers, help="number of tables and foreign keys checked in parallel (default: INTEGRITY_WORKERS)")
+    args = parser.parse_args()
+    main(args.workers)
@@ -0,0 +1,274 @@
+# 06_data_partition.py
+
+### IMPORT ###
+import argparse
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime
+from pathlib import Path
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, list_files_by_type, get_values_from_dict_list, csv_read_header, csv_columns_kept, script_info
+from utility_manager.csv_reader import csv_encoding_error
+from utility_manager.partitioner import csv_batches, partition_value_array, partition_lookup_init, partition_lookup_add, partition_lookup_close, partition_lookup_probe, dataset_write, dataset_read, dataset_scan_size
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+# print(yaml_config) # debug
+
+od_anac_dir = str(yaml_config["OD_ANAC_DIR"])
+od_file_type = str(yaml_config["OD_FILE_TYPE"])
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+tender_main_table = str(yaml_config["TENDER_MAIN_TABLE"]) # partitioned by its own columns
+
+# INPUT
+conf_file_cols_exc = str(yaml_config["CONF_COLS_EXCL_FILE"]) # JSON
+conf_file_cols_type = str(yaml_config["CONF_COLS_TYPE_FILE"]) # JSON
+conf_file_foreign_keys = str(yaml_config["CONF_FOREIGN_KEYS_FILE"]) # JSON
+partition_cols = list(yaml_config["PARTITION_COLUMNS"]) # columns of TENDER_MAIN_TABLE, a directory level each
+partition_join_key = str(yaml_config["PARTITION_JOIN_KEY"]) # child tables: partition of the main table row with the same key
+partition_row_group_rows = int(yaml_config["PARTITION_ROW_GROUP_ROWS"]) # maximum rows of a Parquet row group
+partition_row_group_min_rows = int(yaml_config["PARTITION_ROW_GROUP_MIN_ROWS"]) # rows of a partition buffered before a row group is written
+partition_compression = str(yaml_config["PARTITION_COMPRESSION"]) # Parquet compression
+
+# OUTPUT
+partition_dir = str(yaml_config["PARTITION_DIR"]) # a dataset directory for each table
+
+script_path, script_name = script_info(__file__)
+
+### FUNCTIONS ###
+def table_name_of_file(file_od: str) -> str:
+    """
+    Creates the table name of a file (as 02_data_sql.py does), used by the foreign keys configuration.
+
+    Parameters:
+        file_od (str): File name.
+
+    Returns:
+        str: the table name.
+    """
+    return Path(file_od).stem.removesuffix("_csv").replace("-", "_")
+
+def child_files(list_od_files: list, dic_foreign_keys: dict) -> list:
+    """
+    Finds the child tables of the main table: the files whose table has a foreign key on the join key.
+
+    Parameters:
+        list_od_files (list): The files of OD_ANAC_DIR.
+        dic_foreign_keys (dict): The foreign keys of each table.
+
+    Returns:
+        list: the child files.
+    """
+    list_children = []
+    for file_od in list_od_files:
+        if file_od == tender_main_table:
+            continue
+        list_fk = dic_foreign_keys.get(table_name_of_file(file_od), [])
+        if any(partition_join_key in dic_fk for dic_fk in list_fk):
+            list_children.append(file_od)
+    return list_children
+
+def file_columns(file_od: str, list_col_exc_dic: list) -> list:
+    """
+    Returns the columns of a file to be written: the columns of the header not excluded by the configuration.
+
+    Parameters:
+        file_od (str): File name.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+
+    Returns:
+        list: the columns, in the order of the file.
+    """
+    return csv_columns_kept(csv_read_header(Path(od_anac_dir) / file_od, csv_sep), get_values_from_dict_list(list_col_exc_dic, file_od))
+
+def partition_main_batches(file_od: str, list_col_kept: list, list_col_type_dic: dict, lookup: dict, dic_result: dict):
+    """
+    Reads the main table one block at a time, preparing the partition columns and adding the keys to the lookup of the child tables.
+
+    Parameters:
+        file_od (str): File name.
+        list_col_kept (list): The columns to be written.
+        list_col_type_dic (dict): Columns type.
+        lookup (dict): The partition lookup (see partition_lookup_init).
+        dic_result (dict): The counters of the table (rows).
+
+    Returns:
+        generator: the record batches.
+    """
+    for batch in csv_batches(Path(od_anac_dir) / file_od, list_col_kept, list_col_type_dic, csv_sep):
+        dic_values = {col: partition_value_array(batch.column(col)) for col in partition_cols}
+        partition_lookup_add(lookup, batch.column(partition_join_key), dic_values)
+        dic_result['rows'] += batch.num_rows
+        arrays = [dic_values[name] if name in dic_values else batch.column(name) for name in batch.schema.names]
+        yield pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+def partition_child_batches(file_od: str, list_col_kept: list, list_col_type_dic: dict, lookup: dict, dic_result: dict):
+    """
+    Reads a child table one block at a time, adding the partition columns of the main table row with the same key (null if there is none).
+
+    Parameters:
+        file_od (str): File name.
+        list_col_kept (list): The columns to be written.
+        list_col_type_dic (dict): Columns type.
+        lookup (dict): The sorted partition lookup (see partition_lookup_close).
+        dic_result (dict): The counters of the table (rows, rows without a match).
+
+    Returns:
+        generator: the record batches.
+    """
+    list_cols = [col for col in list_col_kept if col not in partition_cols]
+    for batch in csv_batches(Path(od_anac_dir) / file_od, list_cols, list_col_type_dic, csv_sep):
+        dic_values, rows_unmatched = partition_lookup_probe(lookup, batch.column(partition_join_key))
+        dic_result['rows'] += batch.num_rows
+        dic_result['rows_unmatched'] += rows_unmatched
+        yield pa.RecordBatch.from_arrays(batch.columns + [dic_values[col] for col in partition_cols], names=batch.schema.names + partition_cols)
+
+def partition_table(file_od: str, list_col_exc_dic: list, list_col_type_dic: dict, lookup: dict, is_main: bool) -> dict:
+    """
+    Writes a table as a Parquet dataset partitioned by the partition columns. If a value does not match the type inferred on the first block, the table is written again with the columns not configured as text (or in the encoding of the whole file, see csv_encoding_error).
+
+    Parameters:
+        file_od (str): File name.
+        list_col_exc_dic (list): List of dictionaries with columns to be excluded for each file.
+        list_col_type_dic (dict): Columns type.
+        lookup (dict): The partition lookup, filled by the main table and probed by the child tables.
+        is_main (bool): True for the main table.
+
+    Returns:
+        dict: the table results (rows, rows without a match, partitions, files, bytes, seconds).
+    """
+    start_time = datetime.now()
+    table_name = table_name_of_file(file_od)
+    dataset_dir = Path(partition_dir) / table_name
+    list_col_kept = file_columns(file_od, list_col_exc_dic)
+    print("File:", file_od)
+    print("Dataset:", dataset_dir)
+    for dic_col_type in [list_col_type_dic, {col: list_col_type_dic.get(col, "object") for col in list_col_kept}]:
+        dic_result = {'table': table_name, 'file': file_od, 'rows': 0, 'rows_unmatched': 0}
+        lookup_table = partition_lookup_init(partition_cols) if is_main else lookup
+        batches = partition_main_batches(file_od, list_col_kept, dic_col_type, lookup_table, dic_result) if is_main else partition_child_batches(file_od, list_col_kept, dic_col_type, lookup_table, dic_result)
+        try:
+            dataset_write(batches, dataset_dir, partition_cols, partition_row_group_rows, partition_row_group_min_rows, partition_compression)
+        except pa.ArrowInvalid as exc:
+            if csv_encoding_error(Path(od_anac_dir) / file_od, exc):
+                # The encoding detected on the first bytes does not decode the whole file
+                print()
+                return partition_table(file_od, list_col_exc_dic, list_col_type_dic, lookup, is_main)
+            print("Arrow types not matched, columns not configured written as text:", str(exc).splitlines()[0])
+            continue
+        if is_main:
+            lookup.update(partition_lookup_close(lookup_table))
+        break
+    dic_scan = dataset_scan_size(dataset_dir)
+    dic_result.update({'partitions': dic_scan['partitions'], 'files': dic_scan['files'], 'bytes': dic_scan['bytes'], 'seconds': round((datetime.now() - start_time).total_seconds(), 3)})
+    print("Rows:", dic_result['rows'])
+    if not is_main:
+        print("Rows without a row of the main table:", dic_result['rows_unmatched'])
+    print("Partitions:", dic_result['partitions'])
+    print("Files:", dic_result['files'], "- MB:", round(dic_result['bytes'] / 1024 / 1024, 2))
+    print()
+    return dic_result
+
+def partition_query(list_tables: list, list_filters: list) -> list:
+    """
+    Reads the rows of the filters from each dataset, with the partitions and the files left by the pruning.
+
+    Parameters:
+        list_tables (list): The table names.
+        list_filters (list): The filters on the partition columns (see dataset_read).
+
+    Returns:
+        list: the query results of each table (rows read, files and bytes left against the whole dataset).
+    """
+    list_results = []
+    for table_name in list_tables:
+        dataset_dir = Path(partition_dir) / table_name
+        dic_scan = dataset_scan_size(dataset_dir, list_filters)
+        rows_num = dataset_read(dataset_dir, list_filters).num_rows
+        print(f"Table: {table_name} - rows: {rows_num} - files: {dic_scan['files_scan']}/{dic_scan['files']} - MB: {round(dic_scan['bytes_scan'] / 1024 / 1024, 2)}/{round(dic_scan['bytes'] / 1024 / 1024, 2)}")
+        list_results.append({'table': table_name, 'rows': rows_num, **dic_scan})
+    return list_results
+
+### MAIN ###
+def main(list_filters: list = None):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    start_time = datetime.now().replace(microsecond=0)
+    print("Start process: " + str(start_time))
+    print()
+
+    print(">> Preparing output directories")
+    check_and_create_directory(partition_dir)
+    print()
+
+    print(">> Reading the configuration files")
+    print("File (columns excluded):", conf_file_cols_exc)
+    list_col_exc_dic = json_to_list_dict(conf_file_cols_exc)
+    print("File (columns type):", conf_file_cols_type)
+    list_col_type_dic = json_to_sorted_dict(conf_file_cols_type)
+    print("File (foreign keys):", conf_file_foreign_keys)
+    dic_foreign_keys = json_to_sorted_dict(conf_file_foreign_keys)
+    print()
+
+    print(">> Scanning the catalogue")
+    list_od_files = list_files_by_type(od_anac_dir, od_file_type)
+    if tender_main_table not in list_od_files:
+        print("Main table not found:", tender_main_table)
+        return
+    list_children = child_files(list_od_files, dic_foreign_keys)
+    print("Main table:", tender_main_table)
+    print("Partition columns:", partition_cols)
+    print(f"Child tables (joined on '{partition_join_key}'):", len(list_children))
+    print()
+
+    # 1) Main table, the partition of each key is kept for the child tables
+    print(">> Writing the main table")
+    lookup = {}
+    list_results = [partition_table(tender_main_table, list_col_exc_dic, list_col_type_dic, lookup, True)]
+
+    # 2) Child tables
+    print(">> Writing the child tables")
+    for file_od in list_children:
+        list_results.append(partition_table(file_od, list_col_exc_dic, list_col_type_dic, lookup, False))
+
+    # Report
+    print(">> Writing the partition report")
+    path_report = Path(partition_dir) / "_partition_report.csv"
+    print("Writing CSV:", path_report)
+    pd.DataFrame(list_results).to_csv(path_report, sep=csv_sep, index=False)
+    print()
+
+    if list_filters:
+        print(">> Reading the partitions of the filters:", list_filters)
+        partition_query([dic_result['table'] for dic_result in list_results], list_filters)
+        print()
+
+    # Program end
+    end_time = datetime.now().replace(microsecond=0)
+    delta_time = end_time - start_time
+
+    print()
+    print("End process:", end_time)
+    print("Time to finish:", delta_time)
+    print()
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes the main tender table and its child tables as Parquet datasets partitioned by year and region (hive layout)")
+    parser.add_argument("--year", type=int, default=None, help="after the writing, reads the rows of this year (partition pruning) and prints the files and bytes read")
+    parser.add_argument("--region", type=str, default=None, help="after the writing, reads the rows of this region (e.g. 'SEZIONE REGIONALE SICILIA')")
+    args = parser.parse_args()
+    list_filters = []
+    if args.year is not None:
+        list_filters.append((partition_cols[0], "=", args.year))
+    if args.region is not None:
+        list_filters.append((partition_cols[-1], "=", args.region))
+    main(list_filters)
@@ -0,0 +1,108 @@
+# bench_derived_columns.py
+
+### IMPORT ###
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from time import perf_counter
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import check_and_create_directory, script_info
+from utility_manager.derived_columns import derived_columns_compile, df_add_derived_columns
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+stats_dir = str(yaml_config["OD_STATS_DIR"])
+tender_main_file = str(yaml_config["TENDER_MAIN_TABLE"])
+dic_derived_cols = dict(yaml_config["DERIVED_COLUMNS"])
+
+script_path, script_name = script_info(__file__)
+
+### FUNCTIONS ###
+
+def df_tender_sample(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Creates a dataframe with the source columns of the tender derived columns (CPV code and framework agreement CIG, with missing values).
+
+    Parameters:
+        num_rows (int): Number of rows.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: the sample dataframe.
+    """
+    rng = np.random.default_rng(seed)
+    list_cpv = np.array(["45000000-7", "33100000-1", "72000000-5", "79000000-4", "09000000-3"], dtype=object)
+    cod_cpv = list_cpv[rng.integers(0, len(list_cpv), num_rows)]
+    cod_cpv[rng.random(num_rows) < 0.05] = None
+    cig_accordo_quadro = np.where(rng.random(num_rows) < 0.1, "A000000001", None).astype(object)
+    return pd.DataFrame({'cod_cpv': cod_cpv, 'cig_accordo_quadro': cig_accordo_quadro})
+
+def df_add_columns_apply(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the tender derived columns with row-wise apply (the computation before the derived columns engine).
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+
+    Returns:
+        pd.DataFrame: The dataframe with the derived columns.
+    """
+    df['cpv_division'] = df['cod_cpv'].apply(lambda x: x[:2] if pd.notnull(x) else None)
+    df['accordo_quadro'] = df['cig_accordo_quadro'].apply(lambda x: 1 if pd.notna(x) else 0)
+    return df
+
+### MAIN ###
+def main(list_rows: list):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    check_and_create_directory(stats_dir)
+    list_derived = derived_columns_compile(dic_derived_cols.get(tender_main_file))
+    print("Derived columns:", [col_name for col_name, _, _ in list_derived])
+    print()
+
+    list_results = []
+    for num_rows in list_rows:
+        df_sample = df_tender_sample(num_rows)
+
+        time_start = perf_counter()
+        df_apply = df_add_columns_apply(df_sample.copy())
+        sec_apply = perf_counter() - time_start
+
+        time_start = perf_counter()
+        df_engine = df_add_derived_columns(df_sample.copy(), list_derived)
+        sec_engine = perf_counter() - time_start
+
+        # Same values (the engine returns int8 flags and NaN instead of None)
+        same_values = all(df_apply[col_name].astype(object).where(df_apply[col_name].notna(), None).tolist() == df_engine[col_name].astype(object).where(df_engine[col_name].notna(), None).tolist() for col_name, _, _ in list_derived)
+        dic_result = {
+            'rows': num_rows,
+            'sec_apply': round(sec_apply, 4),
+            'sec_engine': round(sec_engine, 4),
+            'speedup': round(sec_apply / sec_engine, 1) if sec_engine > 0 else None,
+            'same_values': same_values
+        }
+        print(dic_result)
+        list_results.append(dic_result)
+
+    df_results = pd.DataFrame(list_results)
+    path_out = Path(stats_dir) / "_bench_derived_columns.csv"
+    print()
+    print("Writing CSV:", path_out)
+    df_results.to_csv(path_out, sep=csv_sep, index=False)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the derived columns engine against the row-wise apply")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000], help="numbers of rows of the sample dataframes")
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,110 @@
+# bench_duplicates.py
+
+### IMPORT ###
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from time import perf_counter
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import check_and_create_directory, script_info
+from utility_manager.duplicates import DUP_MODES, dup_counter_init, df_duplicated_count
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+stats_dir = str(yaml_config["OD_STATS_DIR"])
+dup_spill_partitions = int(yaml_config["DUP_SPILL_PARTITIONS"])
+dup_memory_max_rows = int(yaml_config["DUP_MEMORY_MAX_ROWS"])
+dup_hll_precision = int(yaml_config["DUP_HLL_PRECISION"])
+
+script_path, script_name = script_info(__file__)
+
+### FUNCTIONS ###
+
+def df_wide_sample(num_rows: int, num_cols: int, dup_ratio: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """
+    Creates a wide dataframe of text columns with a share of rows copied from other rows.
+
+    Parameters:
+        num_rows (int): Number of rows.
+        num_cols (int): Number of columns.
+        dup_ratio (float): Share of duplicated rows.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: the sample dataframe.
+    """
+    rng = np.random.default_rng(seed)
+    dic_cols = {f"col_{col_num:02d}": rng.integers(0, 1_000_000, num_rows).astype(str).astype(object) for col_num in range(num_cols)}
+    df = pd.DataFrame(dic_cols)
+    rows_dup = rng.random(num_rows) < dup_ratio
+    df.loc[rows_dup] = df.iloc[rng.integers(0, num_rows, int(rows_dup.sum()))].to_numpy()
+    return df
+
+def measure(func) -> tuple:
+    """
+    Runs a function twice, measuring the time (first run) and the peak of the memory allocated (second run, traced).
+
+    Parameters:
+        func (callable): The function (without arguments).
+
+    Returns:
+        tuple: the result of the function, the seconds and the peak memory in bytes.
+    """
+    time_start = perf_counter()
+    result = func()
+    seconds = perf_counter() - time_start
+    # Tracing slows down the allocations, so the memory is measured on a second run
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+### MAIN ###
+def main(list_rows: list, num_cols: int):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    check_and_create_directory(stats_dir)
+
+    list_results = []
+    with tempfile.TemporaryDirectory() as spill_dir:
+        for num_rows in list_rows:
+            df_sample = df_wide_sample(num_rows, num_cols)
+
+            dup_expected, seconds, peak = measure(lambda: int(df_sample.duplicated().sum()))
+            dic_result = {'rows': num_rows, 'cols': num_cols, 'method': 'duplicated', 'duplicated_rows': dup_expected, 'sec': round(seconds, 4), 'peak_mb': round(peak / 2**20, 1)}
+            print(dic_result)
+            list_results.append(dic_result)
+
+            for dup_mode in DUP_MODES:
+                spill_mode_dir = Path(spill_dir) / dup_mode
+                dup_count, seconds, peak = measure(lambda: df_duplicated_count(df_sample, dup_counter_init(dup_mode, spill_mode_dir, dup_spill_partitions, dup_memory_max_rows, dup_hll_precision)))
+                dic_result = {'rows': num_rows, 'cols': num_cols, 'method': dup_mode, 'duplicated_rows': dup_count, 'sec': round(seconds, 4), 'peak_mb': round(peak / 2**20, 1)}
+                print(dic_result)
+                list_results.append(dic_result)
+
+    df_results = pd.DataFrame(list_results)
+    path_out = Path(stats_dir) / "_bench_duplicates.csv"
+    print()
+    print("Writing CSV:", path_out)
+    df_results.to_csv(path_out, sep=csv_sep, index=False)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the duplicated rows counters against DataFrame.duplicated")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000], help="numbers of rows of the sample dataframes")
+    parser.add_argument("--cols", type=int, default=40, help="number of columns of the sample dataframes")
+    args = parser.parse_args()
+    main(args.rows, args.cols)
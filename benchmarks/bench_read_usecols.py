@@ -0,0 +1,129 @@
+# bench_read_usecols.py
+
+### IMPORT ###
+import argparse
+import pandas as pd
+from pathlib import Path
+from time import perf_counter
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, list_files_by_type, get_values_from_dict_list, df_read_csv, script_info
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+od_anac_dir = str(yaml_config["OD_ANAC_DIR"])
+od_file_type = str(yaml_config["OD_FILE_TYPE"])
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+conf_file_cols_exc = str(yaml_config["CONF_COLS_EXCL_FILE"])
+conf_file_cols_type = str(yaml_config["CONF_COLS_TYPE_FILE"])
+conf_file_stats_inc = str(yaml_config["CONF_COLS_STATS_FILE"])
+stats_dir = str(yaml_config["OD_STATS_DIR"])
+
+script_path, script_name = script_info(__file__)
+
+### FUNCTIONS ###
+
+def read_post_hoc_delete(file_od: str, list_col_exc: list, list_col_type_dic: dict) -> tuple:
+    """
+    Reads a file parsing every column and then deleting the excluded ones (the reading before the column pruning).
+
+    Parameters:
+        file_od (str): The file name in the ANAC directory.
+        list_col_exc (list): columns to be excluded.
+        list_col_type_dic (dict): columns type.
+
+    Returns:
+        tuple: the dataframe, the number of columns parsed and the memory (bytes) of the parsed dataframe.
+    """
+    df = pd.read_csv(Path(od_anac_dir) / file_od, sep=csv_sep, dtype=list_col_type_dic, low_memory=False)
+    cols_parsed = df.shape[1]
+    mem_parsed = int(df.memory_usage(deep=True).sum())
+    for col_name in list_col_exc:
+        if col_name in df.columns:
+            del df[col_name]
+    return df, cols_parsed, mem_parsed
+
+def time_min(func, repeat: int) -> tuple:
+    """
+    Runs a function several times and returns the best time and the last result.
+
+    Parameters:
+        func (callable): The function to be timed (without arguments).
+        repeat (int): Number of runs.
+
+    Returns:
+        tuple: the minimum time in seconds and the result of the last run.
+    """
+    list_times = []
+    result = None
+    for _ in range(repeat):
+        time_start = perf_counter()
+        result = func()
+        list_times.append(perf_counter() - time_start)
+    return min(list_times), result
+
+### MAIN ###
+def main(repeat: int = 1):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    check_and_create_directory(stats_dir)
+
+    list_od_files = list_files_by_type(od_anac_dir, od_file_type)
+    list_col_exc_dic = json_to_list_dict(conf_file_cols_exc)
+    list_col_type_dic = json_to_sorted_dict(conf_file_cols_type)
+    list_col_stats_dic = json_to_list_dict(conf_file_stats_inc)
+
+    list_results = []
+    for file_od in list_od_files:
+        print("File:", file_od)
+        list_col_exc = get_values_from_dict_list(list_col_exc_dic, file_od)
+        list_col_stats_inc = get_values_from_dict_list(list_col_stats_dic, file_od)
+
+        sec_old, (df_old, cols_parsed_old, mem_parsed_old) = time_min(lambda: read_post_hoc_delete(file_od, list_col_exc, list_col_type_dic), repeat)
+        sec_new, df_new = time_min(lambda: df_read_csv(od_anac_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep), repeat)
+        mem_new = int(df_new.memory_usage(deep=True).sum())
+        if not df_old.equals(df_new):
+            print("[WARNING] The dataframes read are different")
+
+        dic_result = {
+            'file_name': file_od,
+            'size_bytes': (Path(od_anac_dir) / file_od).stat().st_size,
+            'cols_parsed_delete': cols_parsed_old,
+            'cols_parsed_usecols': df_new.shape[1],
+            'mem_bytes_delete': mem_parsed_old,
+            'mem_bytes_usecols': mem_new,
+            'mem_bytes_saved': mem_parsed_old - mem_new,
+            'sec_delete': round(sec_old, 3),
+            'sec_usecols': round(sec_new, 3),
+            'sec_saved': round(sec_old - sec_new, 3)
+        }
+        # Reading only the stats columns (distinct values stats only)
+        if len(list_col_stats_inc) > 0:
+            sec_stats, df_stats = time_min(lambda: df_read_csv(od_anac_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep, list_col_inc=list_col_stats_inc), repeat)
+            dic_result['cols_parsed_stats'] = df_stats.shape[1]
+            dic_result['mem_bytes_stats'] = int(df_stats.memory_usage(deep=True).sum())
+            dic_result['sec_stats'] = round(sec_stats, 3)
+        list_results.append(dic_result)
+        print(dic_result)
+        print()
+
+    df_results = pd.DataFrame(list_results)
+    print(df_results.to_string(index=False))
+    path_out = Path(stats_dir) / "_bench_read_usecols.csv"
+    print()
+    print("Writing CSV:", path_out)
+    df_results.to_csv(path_out, sep=csv_sep, index=False)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the reading with column pruning (usecols) against the deletion of the excluded columns after the parsing")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs for each reading (the best time is kept)")
+    args = parser.parse_args()
+    main(args.repeat)
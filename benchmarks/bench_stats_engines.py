@@ -0,0 +1,141 @@
+# bench_stats_engines.py
+
+### IMPORT ###
+import argparse
+import importlib
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+from pathlib import Path
+from time import perf_counter
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_list_dict, json_to_sorted_dict, check_and_create_directory, get_values_from_dict_list, df_read_csv, script_info
+from utility_manager.derived_columns import derived_columns_compile, df_add_derived_columns
+from utility_manager.stats_duckdb import STATS_ENGINES
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+od_anac_dir = str(yaml_config["OD_ANAC_DIR"])
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+tender_main_table = str(yaml_config["TENDER_MAIN_TABLE"])
+conf_file_cols_exc = str(yaml_config["CONF_COLS_EXCL_FILE"])
+conf_file_cols_type = str(yaml_config["CONF_COLS_TYPE_FILE"])
+conf_file_stats_inc = str(yaml_config["CONF_COLS_STATS_FILE"])
+conf_file_primary_keys = str(yaml_config["CONF_PRIMARY_KEYS_FILE"])
+dic_derived_cols = dict(yaml_config["DERIVED_COLUMNS"])
+stats_dir = str(yaml_config["OD_STATS_DIR"])
+
+script_path, script_name = script_info(__file__)
+
+### FUNCTIONS ###
+
+def stats_engine_run(engine: str, file_od: str, out_dir: Path) -> dict:
+    """
+    Computes the missing values and distinct values stats of a file with an engine, as 01_data_analyser.py does (without cache, chunks and types optimisation), and writes them as CSV files.
+
+    Parameters:
+        engine (str): The engine (see STATS_ENGINES).
+        file_od (str): The file name in the ANAC directory.
+        out_dir (Path): The directory of the stats files.
+
+    Returns:
+        dict: the rows of the file, the seconds and the peak resident memory of the process (MB).
+    """
+    analyser = importlib.import_module("01_data_analyser")
+    list_col_exc = get_values_from_dict_list(json_to_list_dict(conf_file_cols_exc), file_od)
+    list_col_type_dic = json_to_sorted_dict(conf_file_cols_type)
+    list_col_stats_inc = get_values_from_dict_list(json_to_list_dict(conf_file_stats_inc), file_od)
+    list_col_pk = get_values_from_dict_list(json_to_list_dict(conf_file_primary_keys), file_od)
+    list_derived = derived_columns_compile(dic_derived_cols.get(file_od))
+
+    time_start = perf_counter()
+    if engine == "duckdb":
+        dic_od, df_distinct, _ = analyser.stats_duckdb_file(file_od, list_col_exc, list_col_type_dic, list_col_stats_inc, list_derived, None, list_col_pk)
+    else:
+        df_od = df_read_csv(od_anac_dir, file_od, list_col_exc, list_col_type_dic, None, csv_sep)
+        df_od = df_add_derived_columns(df_od, list_derived)
+        dic_od = analyser.summarize_dataframe_to_dict(df_od, file_od, list_col_pk)
+        df_distinct = analyser.distinct_values_frequencies(df_od, list_col_stats_inc, analyser.stats_distinct_top_k) if len(list_col_stats_inc) > 0 else None
+    seconds = perf_counter() - time_start
+
+    analyser.summarize_dataframe_to_df(dic_od).to_csv(out_dir / "stats_missing.csv", sep=csv_sep, index=False)
+    if df_distinct is not None:
+        df_distinct.to_csv(out_dir / "stats_distinct.csv", sep=csv_sep, index=False)
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {'rows': dic_od['rows_num'], 'sec': round(seconds, 4), 'peak_rss_mb': round(peak_mb, 1)}
+
+def stats_files_equal(dir_a: Path, dir_b: Path) -> bool:
+    """
+    Checks whether two directories have the same stats files, byte by byte.
+
+    Parameters:
+        dir_a (Path): The first directory.
+        dir_b (Path): The second directory.
+
+    Returns:
+        bool: True if the files are the same.
+    """
+    list_names_a = sorted(path.name for path in dir_a.iterdir())
+    list_names_b = sorted(path.name for path in dir_b.iterdir())
+    if list_names_a != list_names_b:
+        return False
+    return all((dir_a / name).read_bytes() == (dir_b / name).read_bytes() for name in list_names_a)
+
+### MAIN ###
+def main(file_od: str, list_engines: list, repeat: int = 1):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    check_and_create_directory(stats_dir)
+    print("File:", file_od)
+    print()
+
+    list_results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for run_num in range(repeat):
+            dic_out_dirs = {}
+            for engine in list_engines:
+                # Each engine runs in a new process, so that the peak memory is its own
+                out_dir = Path(tmp_dir) / f"{engine}_{run_num}"
+                out_dir.mkdir()
+                proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_stats_engines", "--file", file_od, "--child", engine, "--out", str(out_dir)], capture_output=True, text=True, check=True)
+                dic_result = {'run': run_num, 'engine': engine, **json.loads(proc.stdout.strip().splitlines()[-1])}
+                dic_out_dirs[engine] = out_dir
+                list_results.append(dic_result)
+            # The outputs of each engine are compared with the ones of the first engine
+            for dic_result in list_results[-len(list_engines):]:
+                dic_result['same_output'] = stats_files_equal(dic_out_dirs[list_engines[0]], dic_out_dirs[dic_result['engine']])
+                print(dic_result)
+
+    df_results = pd.DataFrame(list_results)
+    path_out = Path(stats_dir) / "_bench_stats_engines.csv"
+    print()
+    print("Writing CSV:", path_out)
+    df_results.to_csv(path_out, sep=csv_sep, index=False)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the stats engines (time, peak memory and equality of the outputs) on the tender table")
+    parser.add_argument("--file", default=tender_main_table, help="file of the ANAC directory (default: TENDER_MAIN_TABLE)")
+    parser.add_argument("--engines", nargs="+", choices=STATS_ENGINES, default=STATS_ENGINES, help="engines compared (the first one is the reference of the outputs)")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs of each engine")
+    parser.add_argument("--child", choices=STATS_ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        # Run of one engine in the child process: the result is the last line of the output
+        dic_result = stats_engine_run(args.child, args.file, Path(args.out))
+        print(json.dumps(dic_result))
+    else:
+        main(args.file, args.engines, args.repeat)
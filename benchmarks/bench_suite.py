@@ -0,0 +1,219 @@
+# bench_suite.py
+
+### IMPORT ###
+import argparse
+import contextlib
+import importlib
+import io
+import platform
+import subprocess
+import tempfile
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+### LOCAL IMPORT ###
+from config import config_reader
+from utility_manager.utilities import json_to_sorted_dict, check_and_create_directory, get_values_from_dict_list, df_read_csv, script_info
+from utility_manager.stats_writer import stats_writer_init, stats_writer_close
+from utility_manager.synthetic_data import table_name_from_file, synth_schemas, synth_catalogue_write
+from benchmarks.bench_duplicates import measure
+
+### GLOBALS ###
+yaml_config = config_reader.config_read_yaml("config.yml", "config")
+od_anac_dir = str(yaml_config["OD_ANAC_DIR"])
+csv_sep = str(yaml_config["CSV_FILE_SEP"])
+tender_main_table = str(yaml_config["TENDER_MAIN_TABLE"])
+conf_file_cols_exc = str(yaml_config["CONF_COLS_EXCL_FILE"])
+conf_file_cols_type = str(yaml_config["CONF_COLS_TYPE_FILE"])
+conf_file_stats_inc = str(yaml_config["CONF_COLS_STATS_FILE"])
+conf_file_primary_keys = str(yaml_config["CONF_PRIMARY_KEYS_FILE"])
+conf_file_foreign_keys = str(yaml_config["CONF_FOREIGN_KEYS_FILE"])
+conf_file_table_eng_names = str(yaml_config["CONF_TABLES_ENG"])
+stats_output_formats = list(yaml_config["STATS_OUTPUT_FORMATS"])
+bench_synth_dir = str(yaml_config["BENCH_SYNTH_DIR"]) # synthetic catalogues (a directory for each scale)
+bench_synth_null_rate = float(yaml_config["BENCH_SYNTH_NULL_RATE"]) # share of empty values of the columns not measured on a real file
+bench_synth_chunk_rows = int(yaml_config["BENCH_SYNTH_CHUNK_ROWS"]) # rows generated and written at a time
+bench_history_file = str(yaml_config["BENCH_HISTORY_FILE"]) # results of all the runs (a row for each scale, file and function)
+
+script_path, script_name = script_info(__file__)
+
+REF_FILE_PREFIXES = ("istat_", "bdap_") # reference files, not part of the synthetic catalogue
+
+### FUNCTIONS ###
+
+def git_commit() -> str:
+    """
+    Returns the current git commit (short hash), to relate the results of the history to the code.
+
+    Returns:
+        str: the commit, or an empty string outside a git repository.
+    """
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return proc.stdout.strip() if proc.returncode == 0 else ""
+
+def bench_file(synth_dir: Path, file_od: str, dic_col_exc: dict, dic_col_type: dict, dic_stats_inc: dict, dic_primary_keys: dict, out_dir: Path) -> list:
+    """
+    Measures the stats functions of 01_data_analyser.py on a synthetic file: the time (first run) and the peak of the memory allocated (second run, traced).
+
+    Parameters:
+        synth_dir (Path): The directory of the synthetic catalogue.
+        file_od (str): The file name.
+        dic_col_exc (dict): The columns excluded of each file.
+        dic_col_type (dict): The column types.
+        dic_stats_inc (dict): The stats columns of each file.
+        dic_primary_keys (dict): The primary keys of each file.
+        out_dir (Path): The directory of the stats files written by save_stats.
+
+    Returns:
+        list: a result for each function (rows, seconds, peak memory in MB).
+    """
+    analyser = importlib.import_module("01_data_analyser")
+    list_col_exc = dic_col_exc.get(file_od, [])
+    list_col_pk = dic_primary_keys.get(file_od, [])
+    list_results = []
+
+    def result_add(function: str, rows: int, seconds: float, peak: int) -> None:
+        list_results.append({'file_name': file_od, 'function': function, 'rows': rows, 'sec': round(seconds, 4), 'peak_mb': round(peak / (1024 * 1024), 1)})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_od, seconds, peak = measure(lambda: df_read_csv(str(synth_dir), file_od, list_col_exc, dic_col_type, None, csv_sep))
+        result_add("df_read_csv", len(df_od), seconds, peak)
+        dic_od, seconds, peak = measure(lambda: analyser.summarize_dataframe_to_dict(df_od, file_od, list_col_pk))
+        result_add("summarize_dataframe_to_dict", len(df_od), seconds, peak)
+        list_col_stats = [col for col in dic_stats_inc.get(file_od, []) if col in df_od.columns]
+        df_distinct = None
+        if len(list_col_stats) > 0:
+            df_distinct, seconds, peak = measure(lambda: analyser.distinct_values_frequencies(df_od, list_col_stats, analyser.stats_distinct_top_k))
+            result_add("distinct_values_frequencies", len(df_od), seconds, peak)
+        # The stats files are written immediately in the benchmark directory (the run workbook is left out)
+        analyser.stats_dir = str(out_dir)
+        analyser.stats_writer = stats_writer_init(str(out_dir), [stats_format for stats_format in stats_output_formats if stats_format != "xlsx_run"], csv_sep, False)
+        df_stats = df_distinct if df_distinct is not None else analyser.summarize_dataframe_to_df(dic_od)
+        _, seconds, peak = measure(lambda: analyser.save_stats(df_stats, Path(file_od).stem, "_stats_distinct_values" if df_distinct is not None else "_stats"))
+        stats_writer_close(analyser.stats_writer)
+        analyser.stats_writer = None
+        result_add("save_stats", len(df_stats), seconds, peak)
+    return list_results
+
+def bench_sql(synth_dir: Path, list_files: list, dic_rows: dict, out_dir: Path) -> dict:
+    """
+    Measures process_files_to_sql of 02_data_sql.py on the synthetic catalogue (a worker, as the default run).
+
+    Parameters:
+        synth_dir (Path): The directory of the synthetic catalogue.
+        list_files (list): The file names.
+        dic_rows (dict): The rows of each file.
+        out_dir (Path): The directory of the SQL files and of the cleaned CSV files.
+
+    Returns:
+        dict: the result (rows of all the files, seconds, peak memory in MB).
+    """
+    sql = importlib.import_module("02_data_sql")
+    sql_dir_tables = out_dir / "sql_tables"
+    sql_dir_import = out_dir / "sql_tables_import"
+    sql_dir_tables.mkdir(exist_ok=True)
+    sql_dir_import.mkdir(exist_ok=True)
+    list_col_exc_dic = [json_to_sorted_dict(conf_file_cols_exc)]
+    list_col_type_dic = json_to_sorted_dict(conf_file_cols_type)
+    list_primary_key_dic = [json_to_sorted_dict(conf_file_primary_keys)]
+    list_tables_eng_dic = json_to_sorted_dict(conf_file_table_eng_names)
+    # Only the files with an ENG table name become SQL tables
+    list_files = [file_od for file_od in list_files if table_name_from_file(file_od) in list_tables_eng_dic]
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds, peak = measure(lambda: sql.process_files_to_sql(str(synth_dir), list_files, list_col_exc_dic, list_col_type_dic, {}, True, list_primary_key_dic, str(sql_dir_tables), str(sql_dir_import), list_tables_eng_dic, csv_sep, 1))
+    return {'file_name': "*", 'function': "process_files_to_sql", 'rows': sum(dic_rows[file_od] for file_od in list_files), 'sec': round(seconds, 4), 'peak_mb': round(peak / (1024 * 1024), 1)}
+
+def history_compare(df_history: pd.DataFrame, df_results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compares the results of the run with the last previous result of the same scale, file and function in the history.
+
+    Parameters:
+        df_history (pd.DataFrame): The history (results of the previous runs).
+        df_results (pd.DataFrame): The results of the run.
+
+    Returns:
+        pd.DataFrame: the results with the previous seconds and peak memory and the ratios (run / previous).
+    """
+    list_keys = ["scale", "file_name", "function"]
+    if len(df_history) == 0:
+        return df_results.assign(sec_prev=None, sec_ratio=None, peak_mb_prev=None, peak_mb_ratio=None)
+    df_prev = df_history.drop_duplicates(subset=list_keys, keep="last")[list_keys + ["sec", "peak_mb"]].rename(columns={'sec': "sec_prev", 'peak_mb': "peak_mb_prev"})
+    df_compare = df_results.merge(df_prev, on=list_keys, how="left")
+    df_compare["sec_ratio"] = (df_compare["sec"] / df_compare["sec_prev"]).round(2)
+    df_compare["peak_mb_ratio"] = (df_compare["peak_mb"] / df_compare["peak_mb_prev"]).round(2)
+    return df_compare
+
+### MAIN ###
+def main(list_scales: list, list_files: list, seed: int = 0, generate_only: bool = False):
+    print()
+    print(f"*** PROGRAM START ({script_name}) ***")
+    print()
+
+    dic_col_exc = json_to_sorted_dict(conf_file_cols_exc)
+    dic_col_type = json_to_sorted_dict(conf_file_cols_type)
+    dic_stats_inc = json_to_sorted_dict(conf_file_stats_inc)
+    dic_primary_keys = json_to_sorted_dict(conf_file_primary_keys)
+    dic_foreign_keys = json_to_sorted_dict(conf_file_foreign_keys)
+    if list_files is None:
+        list_files = [file_od for file_od in dict.fromkeys([tender_main_table] + list(dic_primary_keys)) if not file_od.startswith(REF_FILE_PREFIXES)]
+
+    # The columns of each file: primary and foreign keys, excluded and stats columns (or the header of the real file, if there is one)
+    dic_file_cols = {file_od: get_values_from_dict_list([dic_col_exc], file_od) + get_values_from_dict_list([dic_stats_inc], file_od) for file_od in list_files}
+    dic_schemas = synth_schemas(list_files, dic_file_cols, dic_col_type, [dic_primary_keys], dic_foreign_keys, bench_synth_null_rate, od_anac_dir, csv_sep)
+    print("Files:", len(list_files))
+    print("Real files used as samples:", ", ".join(file_od for file_od in list_files if (Path(od_anac_dir) / file_od).exists()) or "-")
+    print()
+
+    list_results = []
+    for scale in list_scales:
+        synth_dir = Path(bench_synth_dir) / f"scale_{scale}"
+        print(f">> Synthetic catalogue, scale {scale:,} rows:", synth_dir)
+        dic_manifest = synth_catalogue_write(str(synth_dir), dic_schemas, scale, seed, bench_synth_chunk_rows, csv_sep)
+        print("Generated" if dic_manifest['generated'] else "Already generated (same schemas, scale and seed)", "- rows:", sum(dic_manifest['rows'].values()))
+        print()
+        if generate_only:
+            continue
+
+        print(f">> Benchmark, scale {scale:,}")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_od in list_files:
+                for dic_result in bench_file(synth_dir, file_od, dic_col_exc, dic_col_type, dic_stats_inc, dic_primary_keys, Path(tmp_dir)):
+                    list_results.append({'scale': scale, **dic_result})
+                    print(dic_result)
+            dic_result = bench_sql(synth_dir, list_files, dic_manifest['rows'], Path(tmp_dir))
+            list_results.append({'scale': scale, **dic_result})
+            print(dic_result)
+        print()
+
+    if len(list_results) > 0:
+        # The results are appended to the history, with the commit and the versions, to follow the time and the memory of each function between runs
+        df_results = pd.DataFrame(list_results)
+        df_results.insert(0, "date", datetime.now().replace(microsecond=0).isoformat())
+        df_results.insert(1, "commit", git_commit())
+        df_results.insert(2, "python", platform.python_version())
+        df_results.insert(3, "pandas", pd.__version__)
+        df_results.insert(4, "seed", seed)
+        path_history = Path(bench_history_file)
+        check_and_create_directory(str(path_history.parent))
+        df_history = pd.read_csv(path_history, sep=csv_sep) if path_history.exists() else pd.DataFrame()
+        df_compare = history_compare(df_history, df_results)
+        print(">> Comparison with the previous run (ratio > 1 = slower or larger)")
+        print(df_compare[["scale", "file_name", "function", "sec", "sec_prev", "sec_ratio", "peak_mb", "peak_mb_ratio"]].to_string(index=False))
+        print()
+        print("Appending to CSV:", path_history)
+        pd.concat([df_history, df_results], ignore_index=True).to_csv(path_history, sep=csv_sep, index=False)
+
+    print()
+    print("*** PROGRAM END ***")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite of the stats and SQL functions on synthetic ANAC-shaped catalogues (schemas from the configuration files) at several scales, with the history of the results")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1e4], help="rows of the main table of each catalogue, e.g. 1e4 1e5 1e6 (up to 1e8)")
+    parser.add_argument("--files", nargs="+", help="files of the catalogue (default: TENDER_MAIN_TABLE and the files of CONF_PRIMARY_KEYS_FILE, without the ISTAT and BDAP files)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data (same seed, same files)")
+    parser.add_argument("--generate-only", action="store_true", help="only generate the synthetic catalogues")
+    args = parser.parse_args()
+    main([int(scale) for scale in args.scales], args.files, args.seed, args.generate_only)
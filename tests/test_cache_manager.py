@@ -0,0 +1,27 @@
+import os
+
+from utility_manager import cache_manager
+from utility_manager.cache_manager import cache_key
+
+def test_cache_key_hashes_only_changed_files(tmp_path, monkeypatch):
+    path_data = tmp_path / "data.csv"
+    path_data.write_text("a;b\n1;2\n")
+    cache_dir = tmp_path / "cache"
+    list_hashed = []
+    file_content_hash = cache_manager.file_content_hash
+    monkeypatch.setattr(cache_manager, "file_content_hash", lambda path_file: list_hashed.append(path_file) or file_content_hash(path_file))
+
+    key = cache_key(path_data, [], {}, ";", cache_dir=cache_dir)
+    assert cache_key(path_data, [], {}, ";", cache_dir=cache_dir) == key
+    assert len(list_hashed) == 1
+
+    # Only touched: hashed again, same key
+    file_stat = path_data.stat()
+    os.utime(path_data, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1_000_000_000))
+    assert cache_key(path_data, [], {}, ";", cache_dir=cache_dir) == key
+    assert len(list_hashed) == 2
+
+    # Same size, different content
+    path_data.write_text("a;b\n3;4\n")
+    assert cache_key(path_data, [], {}, ";", cache_dir=cache_dir) != key
+    assert len(list_hashed) == 3
@@ -0,0 +1,41 @@
+from utility_manager.csv_reader import csv_encoding, df_read_csv_engine
+from utility_manager.csv_rewriter import csv_rewrite_columns
+from utility_manager.reference_data import REF_DECODE_PREFIX_SIZE, file_encoding_detect
+from utility_manager.utilities import df_read_csv_chunks
+
+def csv_write_late_cp1252(path_data) -> int:
+    # ASCII rows beyond the bytes decoded by the detection, then a row with a cp1252 character
+    rows_num = REF_DECODE_PREFIX_SIZE // 20 + 1000
+    lines = "".join(f"{i};comune {i:08d}\n" for i in range(rows_num))
+    path_data.write_bytes(("id;citta\n" + lines + f"{rows_num};Forlì\n").encode("cp1252"))
+    return rows_num + 1
+
+def test_encoding_detected_on_prefix(tmp_path):
+    path_data = tmp_path / "late.csv"
+    csv_write_late_cp1252(path_data)
+    assert file_encoding_detect(path_data) == "utf-8"
+    assert file_encoding_detect(path_data, 0) == "cp1252"
+
+def test_read_after_late_decode_error(tmp_path):
+    path_data = tmp_path / "late.csv"
+    rows_num = csv_write_late_cp1252(path_data)
+    df = df_read_csv_engine(path_data, ["id", "citta"], {}, None)
+    assert len(df) == rows_num and df['citta'].iloc[-1] == "Forlì"
+    assert csv_encoding(path_data) == "cp1252"
+
+def test_read_chunks_after_late_decode_error(tmp_path):
+    path_data = tmp_path / "late.csv"
+    rows_num = csv_write_late_cp1252(path_data)
+    list_ids = []
+    for df_chunk in df_read_csv_chunks(tmp_path, path_data.name, [], {'id': 'int64'}, 50_000):
+        list_ids.extend(df_chunk['id'].tolist())
+    assert list_ids == list(range(rows_num)) and df_chunk['citta'].iloc[-1] == "Forlì"
+
+def test_rewrite_after_late_decode_error(tmp_path):
+    path_data = tmp_path / "late.csv"
+    rows_num = csv_write_late_cp1252(path_data)
+    path_out = tmp_path / "out.csv"
+    assert csv_rewrite_columns(path_data, path_out, ["citta"]) == rows_num
+    with open(path_out, "rb") as fp:
+        fp.seek(-100, 2)
+        assert fp.read().decode("utf-8").endswith("\nForlì\n")
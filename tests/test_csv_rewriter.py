@@ -0,0 +1,16 @@
+from utility_manager.csv_rewriter import csv_rewrite_columns
+
+def test_rewrite_cp1252_source(tmp_path):
+    path_in = tmp_path / "cp1252.csv"
+    path_in.write_bytes("id;città;note\n1;Forlì;perché\n2;Cefalù;\n".encode("cp1252"))
+    path_out = tmp_path / "out.csv"
+    assert csv_rewrite_columns(path_in, path_out, ["id", "città"]) == 2
+    assert path_out.read_text(encoding="utf-8") == "id;città\n1;Forlì\n2;Cefalù\n"
+
+def test_rewrite_cp1252_source_rows(tmp_path):
+    # A row with an extra field is not parsed by Arrow, the file is rewritten with the csv module
+    path_in = tmp_path / "cp1252.csv"
+    path_in.write_bytes("id;città;note\n1;Forlì;perché\n2;Cefalù;;extra\n".encode("cp1252"))
+    path_out = tmp_path / "out.csv"
+    assert csv_rewrite_columns(path_in, path_out, ["id", "città"]) == 2
+    assert path_out.read_text(encoding="utf-8") == "id;città\n1;Forlì\n2;Cefalù\n"
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from utility_manager.duplicates import HASH_NULL, series_hashes, df_row_hashes, dup_counter_init, dup_counter_update, dup_counter_duplicates, df_duplicated_count
+
+def test_series_hashes_nulls_same_across_cardinality():
+    # A repeated column is hashed on its distinct values, a mostly distinct one value by value
+    series_repeated = pd.Series(["A"] * 100 + [None, np.nan], dtype=object)
+    series_distinct = pd.Series([f"v{i}" for i in range(100)] + [None, np.nan], dtype=object)
+    hashes_repeated = series_hashes(series_repeated)
+    hashes_distinct = series_hashes(series_distinct)
+    assert hashes_repeated[0] == series_hashes(pd.Series(["A"], dtype=object))[0]
+    assert (hashes_repeated[-2:] == HASH_NULL).all()
+    assert (hashes_distinct[-2:] == HASH_NULL).all()
+
+def test_duplicates_chunks_with_nulls():
+    df_first = pd.DataFrame({'k': ["A"] * 100, 'x': [None] * 100})
+    df_second = pd.DataFrame({'k': [f"v{i}" for i in range(99)] + ["A"], 'x': [str(i) for i in range(99)] + [None]})
+    df = pd.concat([df_first, df_second], ignore_index=True)
+    counter = dup_counter_init()
+    for df_chunk in [df_first, df_second]:
+        dup_counter_update(counter, df_row_hashes(df_chunk))
+    assert dup_counter_duplicates(counter) == df.duplicated().sum() == 100
+
+def test_duplicates_slices_with_nulls():
+    df_first = pd.DataFrame({'k': ["A"] * 100, 'x': [None] * 100})
+    df_second = pd.DataFrame({'k': [f"v{i}" for i in range(99)] + ["A"], 'x': [str(i) for i in range(99)] + [None]})
+    df = pd.concat([df_first, df_second], ignore_index=True)
+    assert df_duplicated_count(df, dup_counter_init(), hash_rows=100) == df.duplicated().sum()
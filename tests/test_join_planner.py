@@ -0,0 +1,32 @@
+import pandas as pd
+
+from utility_manager.join_planner import join_hash, join_partitioned
+
+STEP_LOOKUP = {'table': "istat", 'parent': "sa", 'left_keys': ["comune"], 'right_keys': ["codice"], 'one_to_many': False}
+
+def df_rows() -> pd.DataFrame:
+    return pd.DataFrame({'sa.id': ["1", "2", "3", "4"], 'sa.comune': ["001", "999", "002", ""]})
+
+def df_table() -> pd.DataFrame:
+    # '001' is duplicated: the lookup keeps its first row
+    return pd.DataFrame({'istat.codice': ["002", "001", "001"], 'istat.nome': ["Bari", "Roma", "Roma bis"]})
+
+def test_lookup_first_row_and_missing_keys():
+    dic_no_match = {'istat': 0}
+    df_joined = pd.concat(join_hash(iter([df_rows()]), STEP_LOOKUP, df_table(), dic_no_match))
+    assert df_joined['sa.id'].tolist() == ["1", "2", "3", "4"]
+    assert df_joined['istat.nome'].tolist() == ["Roma", "", "Bari", ""]
+    assert dic_no_match['istat'] == 2
+
+def test_lookup_partitioned_first_row(tmp_path):
+    dic_no_match = {'istat': 0}
+    df_joined = pd.concat(join_partitioned(iter([df_rows()]), STEP_LOOKUP, iter([df_table()]), tmp_path, 4, ";", dic_no_match))
+    df_joined = df_joined.sort_values("sa.id")
+    assert df_joined['istat.nome'].tolist() == ["Roma", "", "Bari", ""]
+    assert dic_no_match['istat'] == 2
+
+def test_one_to_many_keeps_all_rows():
+    dic_no_match = {'istat': 0}
+    step = dict(STEP_LOOKUP, one_to_many=True)
+    df_joined = pd.concat(join_hash(iter([df_rows()]), step, df_table(), dic_no_match))
+    assert df_joined['istat.nome'].tolist() == ["Roma", "Roma bis", "", "Bari", ""]
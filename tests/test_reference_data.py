@@ -0,0 +1,20 @@
+import pandas as pd
+
+from utility_manager.reference_data import ref_table_build
+
+def test_numbers_with_missing_markers(tmp_path):
+    # 'N.d.' (ISTAT) is a missing value, it does not keep the column as text
+    path_data = tmp_path / "istat.csv"
+    path_data.write_text("codice;altitudine;superficie\n001;1.080;13,29\n002;N.d.;1.234,5\n003;;-\n", encoding="utf-8")
+    df, dic_numeric = ref_table_build(path_data, "utf-8", [], {'codice': "object"}, {}, ["codice"])
+    assert dic_numeric == {'altitudine': "int", 'superficie': "float"}
+    assert df['codice'].tolist() == ["001", "002", "003"]
+    assert df['altitudine'].iloc[0] == 1080 and df['altitudine'].iloc[1:].isna().all()
+    assert df['superficie'].iloc[:2].tolist() == [13.29, 1234.5] and pd.isna(df['superficie'].iloc[2])
+
+def test_decimal_column_with_missing_markers(tmp_path):
+    path_data = tmp_path / "istat.csv"
+    path_data.write_text("id;valore\na;1.080\nb;13,29\nc;N.d.\nd;\n", encoding="utf-8")
+    df, dic_numeric = ref_table_build(path_data, "utf-8", [], {}, {}, [])
+    assert dic_numeric == {'valore': "float"}
+    assert len(df) == 4 and df['valore'].iloc[:2].tolist() == [1080.0, 13.29] and df['valore'].iloc[2:].isna().all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from utility_manager.utilities import df_read_csv_chunks
+from utility_manager.stats_stream import stats_kinds_update, stats_kinds_dtypes, stats_state_init, stats_state_update, stats_state_to_summary_dict
+
+def csv_write_numbers(path_data, rows_num: int = 3000) -> None:
+    # Numbers written in different ways ('1', '01', '1.0') in the numeric columns, and a text column mixing numbers and codes
+    rng = np.random.default_rng(0)
+    list_lines = ["n_int;n_float;n_nan;code;flag"]
+    for i in range(rows_num):
+        value = int(rng.integers(0, 15))
+        n_int = str(value) if rng.random() < 0.5 else f"{value:02d}"
+        n_float = f"{value}.0" if rng.random() < 0.5 else str(value)
+        n_nan = "" if i % 97 == 0 else str(value % 5)
+        code = f"{value:03d}" if i < rows_num - 1 else "X1"
+        flag = "true" if value % 2 else "TRUE"
+        list_lines.append(f"{n_int};{n_float};{n_nan};{code};{flag}")
+    path_data.write_text("\n".join(list_lines) + "\n")
+
+def stream_duplicated_rows(path_data, chunk_size: int) -> int:
+    # As 01_data_analyser.stats_stream_file: the types of the whole file first, then the chunks read with them
+    dic_kinds = {}
+    for df_chunk in df_read_csv_chunks(path_data.parent, path_data.name, [], {}, chunk_size):
+        stats_kinds_update(dic_kinds, df_chunk)
+    state = stats_state_init(path_data.name, [], {})
+    for df_chunk in df_read_csv_chunks(path_data.parent, path_data.name, [], stats_kinds_dtypes(dic_kinds), chunk_size):
+        stats_state_update(state, df_chunk)
+    return stats_state_to_summary_dict(state)['duplicated_rows']
+
+def test_stream_duplicates_as_whole_file(tmp_path):
+    path_data = tmp_path / "numbers.csv"
+    csv_write_numbers(path_data)
+    df = pd.read_csv(path_data, sep=";")
+    duplicated_rows = int(df.duplicated().sum())
+    assert df['n_int'].dtype == 'int64' and not pd.api.types.is_numeric_dtype(df['code'])
+    for chunk_size in [100, 1000, 5000]:
+        assert stream_duplicated_rows(path_data, chunk_size) == duplicated_rows
+
+def test_stats_kinds_mixed_chunks():
+    dic_kinds = {}
+    stats_kinds_update(dic_kinds, pd.DataFrame({'a': ["1", "2"], 'b': ["1", None], 'c': ["1", "x"], 'd': [None, None]}))
+    stats_kinds_update(dic_kinds, pd.DataFrame({'a': ["1.5", "2"], 'b': ["3", "4"], 'c': ["2", "3"], 'd': ["true", None]}))
+    assert dic_kinds == {'a': ('float', False), 'b': ('int', True), 'c': ('object', False), 'd': ('bool', True)}
+    assert stats_kinds_dtypes(dic_kinds) == {'a': 'float64', 'b': 'float64', 'd': 'boolean'}
@@ -0,0 +1,16 @@
+import importlib
+import sys
+
+import pandas as pd
+
+def test_csv_parquet_without_openpyxl(tmp_path, monkeypatch):
+    # openpyxl is imported only by the Excel formats: the module is imported again without it
+    monkeypatch.setitem(sys.modules, "openpyxl", None)
+    monkeypatch.delitem(sys.modules, "utility_manager.stats_writer", raising=False)
+    stats_writer = importlib.import_module("utility_manager.stats_writer")
+    writer = stats_writer.stats_writer_init(str(tmp_path), ["csv", "parquet"], background=False)
+    df_stats = pd.DataFrame({'Column': ["a", "b"], 'Missing': [0, 1]})
+    stats_writer.stats_write(writer, df_stats, "file", "_stats_missing", "missing", writer['formats'])
+    assert stats_writer.stats_writer_close(writer) is None
+    assert pd.read_csv(tmp_path / "file_stats_missing.csv", sep=";").equals(df_stats)
+    assert (tmp_path / "file_stats_missing.parquet").exists()
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+
+from utility_manager.synthetic_data import col_spec_from_name, col_spec_from_sample, col_values
+
+def test_text_codes_stay_codes():
+    # Mostly distinct codes configured as text (e.g. ISTAT codes) are not measures
+    values = pd.Series([f"{num:06d}" for num in range(31000, 32000)] + [""] * 10)
+    spec = col_spec_from_sample(col_spec_from_name("citta_codice", 0.1, "object"), values, "object")
+    assert spec['kind'] == "category" and spec['key_format'] == "code" and spec['code_width'] == 6
+    spec['null_rate'] = 0.0
+    codes = col_values(np.random.default_rng(0), "citta_codice", spec, np.arange(100), {})
+    assert all(isinstance(code, str) and len(code) == 6 and code.isdigit() for code in codes)
+
+def test_untyped_numbers_are_measures():
+    values = pd.Series([str(num * 1.5) for num in range(100)])
+    assert col_spec_from_sample(col_spec_from_name("importo_lotto", 0.1), values)['kind'] == "float"
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import pandas as pd
+
+CACHE_FILE_TYPE = "feather"
+CACHE_FINGERPRINT_SUFFIX = ".fingerprint.json" # size, modification time and content hash of each source file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_content_hash(path_file: Path) -> str:
+    """
+    Computes the hash (BLAKE2b) of the whole content of a file, reading it in blocks.
+
+    Parameters:
+        path_file (Path): The path of the file.
+
+    Returns:
+        str: The hexadecimal hash of the file content.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path_file, "rb") as fp:
+        for block in iter(lambda: fp.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def cache_content_hash(cache_dir: str, path_data: Path) -> str:
+    """
+    Returns the content hash of a CSV file (see file_content_hash), recorded in the cache directory with the size and the modification time of the file: the file is read again only when they change.
+
+    Parameters:
+        cache_dir (str): The cache directory.
+        path_data (Path): The path of the CSV file.
+
+    Returns:
+        str: The hexadecimal hash of the file content.
+    """
+    file_stat = path_data.stat()
+    path_fingerprint = Path(cache_dir) / f"{path_data.stem}{CACHE_FINGERPRINT_SUFFIX}"
+    dic_fingerprint = {'path': path_data.resolve().as_posix(), 'size': file_stat.st_size, 'mtime_ns': file_stat.st_mtime_ns}
+    if path_fingerprint.exists():
+        with open(path_fingerprint, "r") as fp:
+            dic_saved = json.load(fp)
+        if {key: dic_saved.get(key) for key in dic_fingerprint} == dic_fingerprint:
+            return dic_saved['content_hash']
+    dic_fingerprint['content_hash'] = file_content_hash(path_data)
+    path_fingerprint.parent.mkdir(parents=True, exist_ok=True)
+    with open(path_fingerprint, "w") as fp:
+        json.dump(dic_fingerprint, fp, indent=4)
+    return dic_fingerprint['content_hash']
+
+def cache_key(path_data: Path, list_col_exc: list, list_col_type: dict, csv_sep: str, list_col_inc: list = None, cache_dir: str = None) -> str:
+    """
+    Creates the cache key of a CSV file: it changes when the file (size, content) or the reading configuration (excluded and included columns, column types, separator) changes. A file only touched keeps its key.
+
+    Parameters:
+        path_data (Path): The path of the CSV file.
+        list_col_exc (list): columns to be excluded.
+        list_col_type (dict): columns type.
+        csv_sep (str): the delimiter string used in the CSV file.
+        list_col_inc (list, optional): columns to be included (if None, all).
+        cache_dir (str, optional): The cache directory, where the content hash is recorded (see cache_content_hash); if None, the whole file is hashed.
+
+    Returns:
+        str: The cache key.
+    """
+    file_stat = path_data.stat()
+    content_hash = cache_content_hash(cache_dir, path_data) if cache_dir is not None else file_content_hash(path_data)
+    conf = {
+        'col_exc': sorted(list_col_exc),
+        'col_inc': sorted(list_col_inc) if list_col_inc is not None else None,
+        'col_type': {key: str(value) for key, value in sorted(list_col_type.items())},
+        'csv_sep': csv_sep,
+        'pandas': pd.__version__
+    }
+    conf_hash = hashlib.blake2b(json.dumps(conf).encode("utf-8"), digest_size=16).hexdigest()
+    key_parts = f"{file_stat.st_size}|{content_hash}|{conf_hash}"
+    return hashlib.blake2b(key_parts.encode("utf-8"), digest_size=16).hexdigest()
+
+def cache_path(cache_dir: str, file_name: str, key: str) -> Path:
+    """
+    Returns the path of the cache entry of a file for a given key.
+
+    Parameters:
+        cache_dir (str): The cache directory.
+        file_name (str): The name of the CSV file.
+        key (str): The cache key.
+
+    Returns:
+        Path: The path of the cache entry.
+    """
+    return Path(cache_dir) / f"{Path(file_name).stem}-{key}.{CACHE_FILE_TYPE}"
+
+def cache_load(path_cache: Path) -> pd.DataFrame:
+    """
+    Loads a cache entry with memory mapping and restores the column types of the original dataframe; the entry is marked as recently used.
+
+    Parameters:
+        path_cache (Path): The path of the cache entry.
+
+    Returns:
+        pd.DataFrame: the dataframe stored in the cache, None if the entry does not exist.
+    """
+    if not path_cache.exists():
+        return None
+    import pyarrow.feather as feather
+    table = feather.read_table(path_cache, memory_map=True)
+    df = table.to_pandas()
+    # Arrow strings are read back as 'str', restore the columns that were 'object'
+    pandas_metadata = table.schema.pandas_metadata or {}
+    for col_meta in pandas_metadata.get('columns', []):
+        col_name = col_meta.get('name')
+        if col_meta.get('numpy_type') == 'object' and col_name in df.columns and df[col_name].dtype != object:
+            df[col_name] = df[col_name].astype(object)
+    os.utime(path_cache) # least-recently-used eviction is based on the modification time
+    return df
+
+def cache_save(path_cache: Path, df: pd.DataFrame) -> bool:
+    """
+    Saves a dataframe as cache entry (uncompressed Feather, so that it can be memory mapped), replacing the old entries of the same file.
+
+    Parameters:
+        path_cache (Path): The path of the cache entry.
+        df (pd.DataFrame): The dataframe to be saved.
+
+    Returns:
+        bool: True if the entry has been saved, False if the dataframe cannot be converted to Arrow.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    path_cache.parent.mkdir(parents=True, exist_ok=True)
+    file_stem = path_cache.stem.rsplit("-", 1)[0]
+    for path_old in path_cache.parent.glob(f"{file_stem}-*.{CACHE_FILE_TYPE}"):
+        if path_old.stem.rsplit("-", 1)[0] == file_stem:
+            path_old.unlink()
+    path_tmp = path_cache.with_suffix(".tmp")
+    try:
+        feather.write_feather(df, path_tmp, compression="uncompressed")
+    except (pa.ArrowException, ValueError, TypeError) as exc:
+        print(f"Cache not saved for '{path_cache.name}': {exc}")
+        path_tmp.unlink(missing_ok=True)
+        return False
+    path_tmp.replace(path_cache)
+    return True
+
+def cache_evict(cache_dir: str, max_size_mb: int) -> None:
+    """
+    Removes the least recently used cache entries until the size of the cache directory is within the limit.
+
+    Parameters:
+        cache_dir (str): The cache directory.
+        max_size_mb (int): Maximum size of the cache in MB (0 = no limit).
+
+    Returns:
+        None
+    """
+    if max_size_mb <= 0:
+        return
+    list_entries = sorted(Path(cache_dir).glob(f"*.{CACHE_FILE_TYPE}"), key=lambda path_entry: path_entry.stat().st_mtime)
+    cache_size = sum(path_entry.stat().st_size for path_entry in list_entries)
+    max_size = max_size_mb * 1024 * 1024
+    for path_entry in list_entries:
+        if cache_size <= max_size:
+            break
+        cache_size -= path_entry.stat().st_size
+        print("Cache entry removed:", path_entry.name)
+        path_entry.unlink()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+from pathlib import Path
+
+from utility_manager.cache_manager import file_content_hash
+
+MANIFEST_FORMAT_VERSION = 1 # changes when the entries are recorded in a different way (the files are processed again)
+MANIFEST_HASH_MODES = ["sample", "full"]
+MANIFEST_SAMPLE_BLOCKS = 16 # blocks hashed by the sample hash (evenly spaced, the first and the last included)
+MANIFEST_SAMPLE_BLOCK_SIZE = 64 * 1024
+
+def file_sample_hash(path_file: Path, num_blocks: int = MANIFEST_SAMPLE_BLOCKS, block_size: int = MANIFEST_SAMPLE_BLOCK_SIZE) -> str:
+    """
+    Computes a fast hash (BLAKE2b) of a file from its size and a few blocks at evenly spaced offsets (the first and the last block included), so that its cost does not depend on the file size. Small files are hashed whole. A change that leaves the size the same and falls between the blocks is not seen: the 'full' hash mode reads every byte.
+
+    Parameters:
+        path_file (Path): The path of the file.
+        num_blocks (int): The number of blocks hashed.
+        block_size (int): The size of each block.
+
+    Returns:
+        str: The hexadecimal hash.
+    """
+    size = path_file.stat().st_size
+    if size <= num_blocks * block_size:
+        return file_content_hash(path_file)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(str(size).encode("utf-8"))
+    step = (size - block_size) / (num_blocks - 1)
+    with open(path_file, "rb") as fp:
+        for block_num in range(num_blocks):
+            fp.seek(int(block_num * step))
+            hasher.update(fp.read(block_size))
+    return hasher.hexdigest()
+
+def file_hash(path_file: Path, hash_mode: str = "sample") -> str:
+    """
+    Computes the content hash of a file of the catalogue.
+
+    Parameters:
+        path_file (Path): The path of the file.
+        hash_mode (str): 'sample' (size and sampled blocks, see file_sample_hash) or 'full' (every byte).
+
+    Returns:
+        str: The hexadecimal hash.
+
+    Raises:
+        ValueError: if the hash mode is unknown.
+    """
+    if hash_mode not in MANIFEST_HASH_MODES:
+        raise ValueError(f"Unknown hash mode '{hash_mode}' (allowed: {', '.join(MANIFEST_HASH_MODES)})")
+    return file_sample_hash(path_file) if hash_mode == "sample" else file_content_hash(path_file)
+
+def manifest_load(manifest_dir: str, script_name: str) -> dict:
+    """
+    Loads the manifest of a script: for each source file processed, its size, modification time and content hash, the hash of the configuration used and the outputs written, with their modification time. A manifest of another format version is ignored.
+
+    Parameters:
+        manifest_dir (str): The directory of the manifests.
+        script_name (str): The script name (the manifest is named after it).
+
+    Returns:
+        dict: the manifest (empty if it does not exist).
+    """
+    path_manifest = Path(manifest_dir) / f"{Path(script_name).stem}.json"
+    dic_manifest = {'path': str(path_manifest), 'version': MANIFEST_FORMAT_VERSION, 'files': {}}
+    if path_manifest.exists():
+        with open(path_manifest, "r") as fp:
+            dic_saved = json.load(fp)
+        if dic_saved.get('version') == MANIFEST_FORMAT_VERSION:
+            dic_manifest['files'] = dic_saved['files']
+    return dic_manifest
+
+def manifest_save(dic_manifest: dict, list_sources: list = None) -> None:
+    """
+    Saves a manifest (written apart and then moved, so that a broken write is never read).
+
+    Parameters:
+        dic_manifest (dict): The manifest (see manifest_load).
+        list_sources (list, optional): The source files of the catalogue: the entries of the other files (removed from the catalogue) are dropped. If None, all the entries are kept.
+
+    Returns:
+        None
+    """
+    if list_sources is not None:
+        set_keys = {Path(path_file).as_posix() for path_file in list_sources}
+        dic_manifest['files'] = {key: entry for key, entry in dic_manifest['files'].items() if key in set_keys}
+    path_manifest = Path(dic_manifest['path'])
+    path_manifest.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path_manifest.with_suffix(".tmp")
+    with open(path_tmp, "w") as fp:
+        json.dump({'version': dic_manifest['version'], 'files': dic_manifest['files']}, fp, indent=4)
+    path_tmp.replace(path_manifest)
+
+def outputs_mtimes(list_outputs: list) -> dict:
+    """
+    Returns the modification time of each output file.
+
+    Parameters:
+        list_outputs (list): The output files.
+
+    Returns:
+        dict: the modification time (nanoseconds) of each output, None for the missing ones.
+    """
+    return {Path(path_out).as_posix(): Path(path_out).stat().st_mtime_ns if Path(path_out).exists() else None for path_out in list_outputs}
+
+def manifest_check(dic_manifest: dict, path_file: Path, conf_hash: str, list_outputs: list, hash_mode: str = "sample") -> tuple:
+    """
+    Checks whether the outputs of a source file are up to date (as make does): the file has the same size and content, the configuration has the same hash and every output still exists, unchanged since it was written. The content hash is computed only when the modification time has changed or the file has to be processed (a file only touched is still up to date, and its entry is updated).
+
+    Parameters:
+        dic_manifest (dict): The manifest (see manifest_load).
+        path_file (Path): The source file.
+        conf_hash (str): The hash of the configuration of the file (see stats_conf_hash).
+        list_outputs (list): The output files of the source file.
+        hash_mode (str): The hash mode (see file_hash).
+
+    Returns:
+        tuple: True if the outputs are up to date, and the fingerprint of the file (size, modification time and content hash), to be recorded by manifest_update after the file is processed.
+    """
+    file_stat = Path(path_file).stat()
+    entry = dic_manifest['files'].get(Path(path_file).as_posix())
+    dic_fingerprint = {'size': file_stat.st_size, 'mtime_ns': file_stat.st_mtime_ns, 'content_hash': None, 'hash_mode': hash_mode}
+    is_current = entry is not None and entry['conf_hash'] == conf_hash and entry['hash_mode'] == hash_mode and entry['size'] == file_stat.st_size and entry['outputs'] == outputs_mtimes(list_outputs)
+    if is_current and entry['mtime_ns'] == file_stat.st_mtime_ns:
+        dic_fingerprint['content_hash'] = entry['content_hash']
+        return True, dic_fingerprint
+    # The hash is taken before the file is processed, so that a file changed meanwhile is processed again at the next run
+    dic_fingerprint['content_hash'] = file_hash(Path(path_file), hash_mode)
+    if is_current and dic_fingerprint['content_hash'] == entry['content_hash']:
+        # Only touched: the outputs are still valid
+        entry['mtime_ns'] = file_stat.st_mtime_ns
+        return True, dic_fingerprint
+    return False, dic_fingerprint
+
+def manifest_update(dic_manifest: dict, path_file: Path, dic_fingerprint: dict, conf_hash: str, list_outputs: list) -> None:
+    """
+    Records a source file processed, with the outputs just written.
+
+    Parameters:
+        dic_manifest (dict): The manifest (see manifest_load).
+        path_file (Path): The source file.
+        dic_fingerprint (dict): The fingerprint of the file taken before the processing (see manifest_check).
+        conf_hash (str): The hash of the configuration of the file.
+        list_outputs (list): The output files.
+
+    Returns:
+        None
+    """
+    dic_manifest['files'][Path(path_file).as_posix()] = {**dic_fingerprint, 'conf_hash': conf_hash, 'outputs': outputs_mtimes(list_outputs)}
@@ -0,0 +1,173 @@
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from utility_manager.reference_data import file_encoding_detect
+
+CSV_READ_ENGINES = ["auto", "pyarrow", "c"]
+CSV_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"] # missing values of read_csv
+CSV_ARROW_TYPES = {"object": pa.string(), "str": pa.string(), "string": pa.string(), "int": pa.int64(), "int64": pa.int64(), "float": pa.float64(), "float64": pa.float64()} # configured types parsed by Arrow
+CSV_ARROW_INFERRED = (pa.int64(), pa.float64(), pa.string(), pa.null()) # types inferred by Arrow as the C engine does (dates and times are kept as text)
+CSV_ARROW_BLOCK_SIZE = 16 * 1024 * 1024 # bytes of each block parsed by a thread (the types are inferred on the first one)
+
+dic_encodings = {} # encoding of each file read by this process, by path, size and modification time
+
+def csv_encoding(path_data: Path) -> str:
+    """
+    Returns the encoding of a CSV file, detected on its first bytes (see file_encoding_detect) only the first time the file is read by this process.
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+
+    Returns:
+        str: the encoding ('utf-8-sig' if the file starts with a BOM).
+    """
+    file_stat = Path(path_data).stat()
+    key = (Path(path_data).resolve().as_posix(), file_stat.st_size, file_stat.st_mtime_ns)
+    if key not in dic_encodings:
+        dic_encodings[key] = file_encoding_detect(Path(path_data))
+    return dic_encodings[key]
+
+def csv_encoding_error(path_data: Path, exc: Exception) -> bool:
+    """
+    Checks whether a reading error is a decode error caused by an encoding detected on the first bytes of a CSV file (e.g. a cp1252 character after them): the encoding is detected again on the whole file and replaces the one of csv_encoding.
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+        exc (Exception): the error raised by the reader.
+
+    Returns:
+        bool: True if the file has another encoding and has to be read again.
+    """
+    if not isinstance(exc, UnicodeDecodeError) and "UTF8" not in str(exc):
+        return False
+    encoding_old = csv_encoding(path_data)
+    file_stat = Path(path_data).stat()
+    key = (Path(path_data).resolve().as_posix(), file_stat.st_size, file_stat.st_mtime_ns)
+    dic_encodings[key] = file_encoding_detect(Path(path_data), 0)
+    if dic_encodings[key] == encoding_old:
+        return False
+    print(f"Encoding of '{Path(path_data).name}' detected again on the whole file: {dic_encodings[key]} (not {encoding_old})")
+    return True
+
+def csv_engine_select(list_col_kept: list, list_col_type: dict, nrows: int, engine: str = "auto") -> str:
+    """
+    Selects the parser of a CSV file: the Arrow one (multithreaded, the types are applied while parsing) if each configured type of the columns kept is a text or a number, otherwise the C engine of pandas. The partial reads (nrows) use the C engine.
+
+    Parameters:
+        list_col_kept (list): the columns to be parsed.
+        list_col_type (dict): columns type.
+        nrows (int): rows to be read (if None, all).
+        engine (str, optional): 'auto', 'pyarrow' or 'c'. Defaults to 'auto'.
+
+    Returns:
+        str: 'pyarrow' or 'c'.
+
+    Raises:
+        ValueError: if the engine is unknown.
+    """
+    if engine not in CSV_READ_ENGINES:
+        raise ValueError(f"Unknown CSV engine '{engine}' (allowed: {', '.join(CSV_READ_ENGINES)})")
+    if engine == "c" or nrows is not None:
+        return "c"
+    if all(str(list_col_type[col]) in CSV_ARROW_TYPES for col in list_col_kept if col in list_col_type):
+        return "pyarrow"
+    return "c"
+
+def csv_arrow_options(path_data: Path, list_col_kept: list, list_col_type: dict, csv_sep: str = ";", encoding: str = "utf-8") -> tuple:
+    """
+    Prepares the options of the Arrow CSV reader so that it parses a file as the C engine does: the configured types and the types inferred by Arrow on the first block are fixed before the parsing, so a code with leading zeros stays text and the dates are kept as text; the missing values are the ones of read_csv.
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+        list_col_kept (list): the columns to be parsed, in the order of the file.
+        list_col_type (dict): columns type (only text and numbers, see csv_engine_select).
+        csv_sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+        encoding (str, optional): the encoding of the file (see csv_encoding). Defaults to 'utf-8'.
+
+    Returns:
+        tuple: the read, parse and convert options, None if a column inferred on the first block has a type the C engine would not give (e.g. boolean).
+
+    Raises:
+        pa.ArrowInvalid: if the first block cannot be parsed.
+    """
+    read_options = pa_csv.ReadOptions(block_size=CSV_ARROW_BLOCK_SIZE, encoding="utf8" if encoding.startswith("utf-8") else encoding)
+    parse_options = pa_csv.ParseOptions(delimiter=csv_sep, newlines_in_values=True)
+    dic_arrow_types = {col: CSV_ARROW_TYPES[str(list_col_type[col])] for col in list_col_kept if col in list_col_type}
+    convert_options = pa_csv.ConvertOptions(column_types=dic_arrow_types, include_columns=list_col_kept, null_values=CSV_NA_VALUES, strings_can_be_null=True, quoted_strings_can_be_null=True)
+    # The other columns are inferred on the first block, as the reader of the whole file would do
+    with pa_csv.open_csv(path_data, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+        schema = reader.schema
+    for field in schema:
+        if field.name in dic_arrow_types:
+            continue
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type) or pa.types.is_time(field.type):
+            dic_arrow_types[field.name] = pa.string()
+        elif field.type not in CSV_ARROW_INFERRED:
+            return None
+        elif field.type != pa.null():
+            dic_arrow_types[field.name] = field.type
+    convert_options.column_types = dic_arrow_types
+    return read_options, parse_options, convert_options
+
+def df_read_csv_arrow(path_data: Path, list_col_kept: list, list_col_type: dict, csv_sep: str = ";", encoding: str = "utf-8") -> pd.DataFrame:
+    """
+    Reads a CSV file with the Arrow parser, giving the same DataFrame of the C engine (see csv_arrow_options). The decimals are rounded correctly (the C engine may differ in the last digit).
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+        list_col_kept (list): the columns to be parsed, in the order of the file.
+        list_col_type (dict): columns type (only text and numbers, see csv_engine_select).
+        csv_sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+        encoding (str, optional): the encoding of the file (see csv_encoding). Defaults to 'utf-8'.
+
+    Returns:
+        pd.DataFrame: the data read, None if a column inferred on the first block has a type the C engine would not give (e.g. boolean).
+
+    Raises:
+        pa.ArrowInvalid: if a row cannot be parsed or a value does not match the type of its column.
+    """
+    arrow_options = csv_arrow_options(path_data, list_col_kept, list_col_type, csv_sep, encoding)
+    if arrow_options is None:
+        return None
+    read_options, parse_options, convert_options = arrow_options
+    table = pa_csv.read_csv(path_data, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+    df = table.to_pandas()
+    table = None
+    # Only the types of the C engine: the text columns configured 'object' are not Arrow strings, the empty columns are decimals
+    dic_astype = {col: list_col_type[col] for col in list_col_kept if col in list_col_type and str(df[col].dtype) != str(pd.Series(dtype=list_col_type[col]).dtype)}
+    dic_astype.update({col: "float64" for col in list_col_kept if col not in list_col_type and df[col].isna().all()})
+    return df.astype(dic_astype) if len(dic_astype) > 0 else df
+
+def df_read_csv_engine(path_data: Path, list_col_kept: list, list_col_type: dict, nrows: int, csv_sep: str = ";", engine: str = "auto") -> pd.DataFrame:
+    """
+    Reads a CSV file with the parser selected by csv_engine_select, in its encoding (see csv_encoding). If the Arrow parser cannot be used or fails, the file is read by the C engine; if the encoding detected on the first bytes does not decode the whole file, the file is read again (see csv_encoding_error).
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+        list_col_kept (list): the columns to be parsed, in the order of the file.
+        list_col_type (dict): columns type.
+        nrows (int): rows to be read (if None, all).
+        csv_sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+        engine (str, optional): 'auto', 'pyarrow' or 'c'. Defaults to 'auto'.
+
+    Returns:
+        pd.DataFrame: the data read.
+    """
+    encoding = csv_encoding(path_data)
+    if csv_engine_select(list_col_kept, list_col_type, nrows, engine) == "pyarrow":
+        try:
+            df = df_read_csv_arrow(path_data, list_col_kept, list_col_type, csv_sep, encoding)
+            if df is not None:
+                return df
+            print("Arrow parser not used (a column type differs from the C engine), reading with the C engine")
+        except ValueError as exc: # pa.ArrowInvalid too
+            print("Arrow parser failed, reading with the C engine:", str(exc).splitlines()[0])
+    try:
+        return pd.read_csv(path_data, sep=csv_sep, dtype=list_col_type, usecols=list_col_kept, nrows=nrows, low_memory=False, encoding=encoding)
+    except UnicodeDecodeError as exc:
+        if not csv_encoding_error(path_data, exc):
+            raise
+        return df_read_csv_engine(path_data, list_col_kept, list_col_type, nrows, csv_sep, engine)
@@ -0,0 +1,206 @@
+import csv
+import io
+import re
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from utility_manager.csv_reader import csv_encoding, csv_encoding_error
+from utility_manager.pipeline import queue_worker_start, queue_worker_put, queue_worker_close
+from utility_manager.schema_inference import col_profile_init, col_profile_update
+
+REWRITE_BLOCK_SIZE = 16 * 1024 * 1024 # bytes parsed at a time by the Arrow reader
+REWRITE_PROFILE_ROWS = 100_000 # rows added to the column profile at a time by the csv module rewriter
+
+def csv_header_line(list_cols: list, csv_sep: str) -> str:
+    """
+    Formats the header line of a CSV file as the csv module (and DataFrame.to_csv) does.
+
+    Parameters:
+        list_cols (list): The column names.
+        csv_sep (str): The CSV separator.
+
+    Returns:
+        str: the header line, with the line terminator.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=csv_sep, lineterminator="\n").writerow(list_cols)
+    return buffer.getvalue()
+
+def arrow_quote_minimal(values: pa.Array, csv_sep: str, single_column: bool) -> pa.Array:
+    """
+    Quotes the values of a text column as csv.QUOTE_MINIMAL: values with the separator, quotes or line breaks are enclosed in quotes (with the quotes doubled).
+
+    Parameters:
+        values (pa.Array): The values (strings, without nulls).
+        csv_sep (str): The CSV separator.
+        single_column (bool): True if the file has a single column (the csv module quotes the empty values, otherwise the line would be empty).
+
+    Returns:
+        pa.Array: the values to be written.
+    """
+    # Most columns have no special characters at all: the bytes of all the values are searched before checking each value
+    data = bytes(arrow_strings_bytes(values))
+    special_chars = [csv_sep.encode("utf-8"), b'"', b"\r", b"\n"]
+    if not any(char in data for char in special_chars) and not single_column:
+        return values
+    pattern = f'[{re.escape(csv_sep)}"\\r\\n]'
+    if single_column:
+        pattern += "|^$"
+    needs_quotes = pc.match_substring_regex(values, pattern)
+    quoted = pc.binary_join_element_wise('"', pc.replace_substring(values, '"', '""'), '"', "")
+    return pc.if_else(needs_quotes, quoted, values)
+
+def arrow_strings_bytes(values: pa.Array) -> memoryview:
+    """
+    Returns the bytes of all the values of a string array, one after the other (the values are contiguous in the data buffer, so nothing is copied).
+
+    Parameters:
+        values (pa.Array): The values (strings, without nulls).
+
+    Returns:
+        memoryview: the bytes of the values.
+    """
+    offsets = np.frombuffer(values.buffers()[1], dtype=np.int32)
+    start = offsets[values.offset]
+    end = offsets[values.offset + len(values)]
+    return memoryview(values.buffers()[2])[start:end]
+
+def csv_rewrite_columns_arrow(path_in: Path, path_out: Path, list_col_kept: list, csv_sep: str, profile: dict = None, write_queue: int = 0, encoding: str = "utf-8") -> int:
+    """
+    Rewrites a CSV file keeping only some columns, reading blocks of rows with the Arrow streaming reader and building the output lines with vectorised string functions. The values are copied as they are (no type conversion), the output is written in UTF-8. With a write queue, the blocks are written by a background thread while the next block is parsed and profiled.
+
+    Parameters:
+        path_in (Path): The source CSV file.
+        path_out (Path): The output CSV file.
+        list_col_kept (list): The columns to be kept (in the order of the source header).
+        csv_sep (str): The CSV separator (of both files).
+        profile (dict, optional): A column profile (see col_profile_init) updated with each block of rows.
+        write_queue (int, optional): Blocks waiting to be written by the background thread, the reading waits when they are more (0 = blocks written in this thread).
+        encoding (str, optional): The encoding of the source file (see csv_encoding). Defaults to 'utf-8'.
+
+    Returns:
+        int: the number of rows written.
+
+    Raises:
+        pa.ArrowInvalid: if a row cannot be parsed (e.g. a row with a different number of fields).
+    """
+    read_options = pa_csv.ReadOptions(block_size=REWRITE_BLOCK_SIZE, encoding="utf8" if encoding.startswith("utf-8") else encoding)
+    parse_options = pa_csv.ParseOptions(delimiter=csv_sep, newlines_in_values=True)
+    convert_options = pa_csv.ConvertOptions(column_types={col: pa.string() for col in list_col_kept}, include_columns=list_col_kept, strings_can_be_null=False, quoted_strings_can_be_null=False)
+    rows_num = 0
+    single_column = len(list_col_kept) == 1
+    with pa_csv.open_csv(path_in, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader, open(path_out, "wb") as fp:
+        fp.write(csv_header_line(list_col_kept, csv_sep).encode("utf-8"))
+        writer = queue_worker_start(fp.write, write_queue) if write_queue > 0 else None
+        try:
+            for batch in reader:
+                if batch.num_rows == 0:
+                    continue
+                if profile is not None:
+                    col_profile_update(profile, batch)
+                list_values = [arrow_quote_minimal(batch.column(col), csv_sep, single_column) for col in list_col_kept]
+                lines = pc.binary_join_element_wise(*list_values, csv_sep)
+                lines = pc.binary_join_element_wise(lines, "\n", "")
+                # The memory view keeps the buffer of the lines alive until the block is written
+                if writer is None:
+                    fp.write(arrow_strings_bytes(lines))
+                else:
+                    queue_worker_put(writer, arrow_strings_bytes(lines))
+                rows_num += batch.num_rows
+        finally:
+            if writer is not None:
+                queue_worker_close(writer)
+    return rows_num
+
+def profile_update_rows(profile: dict, list_rows: list) -> None:
+    """
+    Updates a column profile with a block of rows read by the csv module.
+
+    Parameters:
+        profile (dict): The column profile.
+        list_rows (list): The rows (lists of values of the profiled columns).
+
+    Returns:
+        None
+    """
+    if len(list_rows) == 0:
+        return
+    list_arrays = [pa.array(list(values), pa.string()) for values in zip(*list_rows)]
+    col_profile_update(profile, pa.RecordBatch.from_arrays(list_arrays, names=profile['list_cols']))
+
+def csv_rewrite_columns_rows(path_in: Path, path_out: Path, list_col_kept: list, csv_sep: str, profile: dict = None, encoding: str = "utf-8") -> int:
+    """
+    Rewrites a CSV file keeping only some columns, one row at a time with the csv module; rows with missing fields are completed with empty values (as read_csv does) and extra fields are ignored. The output is written in UTF-8.
+
+    Parameters:
+        path_in (Path): The source CSV file.
+        path_out (Path): The output CSV file.
+        list_col_kept (list): The columns to be kept (in the order of the source header).
+        csv_sep (str): The CSV separator (of both files).
+        profile (dict, optional): A column profile (see col_profile_init) updated with blocks of REWRITE_PROFILE_ROWS rows.
+        encoding (str, optional): The encoding of the source file (see csv_encoding). Defaults to 'utf-8'.
+
+    Returns:
+        int: the number of rows written.
+    """
+    rows_num = 0
+    list_rows = []
+    with open(path_in, newline="", encoding=encoding) as fp_in, open(path_out, "w", newline="", encoding="utf-8") as fp_out:
+        reader = csv.reader(fp_in, delimiter=csv_sep)
+        writer = csv.writer(fp_out, delimiter=csv_sep, lineterminator="\n")
+        list_header = next(reader)
+        list_index = [list_header.index(col) for col in list_col_kept]
+        writer.writerow(list_col_kept)
+        for row in reader:
+            if len(row) == 0:
+                continue # blank lines are skipped, as in read_csv
+            row_kept = [row[index] if index < len(row) else "" for index in list_index]
+            writer.writerow(row_kept)
+            rows_num += 1
+            if profile is not None:
+                list_rows.append(row_kept)
+                if len(list_rows) >= REWRITE_PROFILE_ROWS:
+                    profile_update_rows(profile, list_rows)
+                    list_rows = []
+    if profile is not None:
+        profile_update_rows(profile, list_rows)
+    return rows_num
+
+def csv_rewrite_columns(path_in: Path, path_out: Path, list_col_kept: list, csv_sep: str = ";", profile: dict = None, write_queue: int = 0) -> int:
+    """
+    Rewrites a CSV file keeping only some columns, in blocks of rows (the memory used does not depend on the file size). The source file is read in its encoding (see csv_encoding), the output has the format of DataFrame.to_csv (UTF-8, same separator, values quoted only when needed, '\\n' line terminator) but the values are copied as they are. The Arrow reader is used first; if a row cannot be parsed, the file is rewritten one row at a time with the csv module. If the encoding detected on the first bytes does not decode the whole file, the file is rewritten again (see csv_encoding_error).
+
+    Parameters:
+        path_in (Path): The source CSV file.
+        path_out (Path): The output CSV file.
+        list_col_kept (list): The columns to be kept (in the order of the source header).
+        csv_sep (str): The CSV separator (of both files). Defaults to ';'.
+        profile (dict, optional): A column profile (see col_profile_init) of the kept columns, updated with all the rows written.
+        write_queue (int, optional): Blocks waiting to be written by a background thread with the Arrow reader (0 = no background thread).
+
+    Returns:
+        int: the number of rows written.
+    """
+    encoding = csv_encoding(path_in)
+    try:
+        try:
+            return csv_rewrite_columns_arrow(path_in, path_out, list_col_kept, csv_sep, profile, write_queue, encoding)
+        except pa.ArrowInvalid as exc:
+            if csv_encoding_error(path_in, exc):
+                raise
+            print("Arrow reader failed, rewriting one row at a time:", str(exc).splitlines()[0])
+            if profile is not None:
+                # The profile restarts from the first row
+                profile.update(col_profile_init(profile['list_cols'], profile['sample_rows'], profile['seed']))
+            return csv_rewrite_columns_rows(path_in, path_out, list_col_kept, csv_sep, profile, encoding)
+    except (pa.ArrowInvalid, UnicodeDecodeError) as exc:
+        # The encoding detected on the first bytes does not decode the whole file: rewritten again from the first row
+        if encoding == csv_encoding(path_in) and not csv_encoding_error(path_in, exc):
+            raise
+        if profile is not None:
+            profile.update(col_profile_init(profile['list_cols'], profile['sample_rows'], profile['seed']))
+        return csv_rewrite_columns(path_in, path_out, list_col_kept, csv_sep, profile, write_queue)
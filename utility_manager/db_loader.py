@@ -0,0 +1,321 @@
+import csv
+import json
+import queue
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+LOAD_ENGINES = ["sqlite", "duckdb"]
+LOAD_BUSY_TIMEOUT = 600 # seconds a SQLite connection waits for the write lock held by another table load
+
+def sql_quote_name(name: str) -> str:
+    """
+    Quotes a table or column name (names may contain spaces, e.g. the ISTAT columns).
+
+    Parameters:
+        name (str): The name.
+
+    Returns:
+        str: the quoted name.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+def table_schemas_read(dir_name: str) -> dict:
+    """
+    Reads the table schemas written by 02_data_sql.py (a JSON file for each table, next to its SQL file).
+
+    Parameters:
+        dir_name (str): The directory of the SQL table files.
+
+    Returns:
+        dict: the schema of each table, by table name (ITA).
+    """
+    dic_schemas = {}
+    for path_schema in sorted(Path(dir_name).glob("*.json")):
+        with open(path_schema) as fp:
+            dic_schema = json.load(fp)
+        dic_schemas[dic_schema['table_name']] = dic_schema
+    return dic_schemas
+
+def foreign_key_edges(dic_foreign_keys: dict, list_tables: list) -> list:
+    """
+    Lists the foreign keys of the configuration between the given tables.
+
+    Parameters:
+        dic_foreign_keys (dict): The foreign keys of each table (table name: list of dictionaries 'column': 'table.column').
+        list_tables (list): The table names (foreign keys to or from other tables are ignored).
+
+    Returns:
+        list: tuples (table, column, referenced table, referenced column).
+    """
+    list_edges = []
+    for table_name in list_tables:
+        for dic_columns in dic_foreign_keys.get(table_name, []):
+            for column, foreign_key in dic_columns.items():
+                foreign_table, foreign_column = foreign_key.split(".")
+                if foreign_table in list_tables and foreign_table != table_name:
+                    list_edges.append((table_name, column, foreign_table, foreign_column))
+    return list_edges
+
+def foreign_key_levels(list_tables: list, list_edges: list) -> list:
+    """
+    Orders the tables by the foreign key graph: each level contains the tables whose referenced tables are all in the previous levels, so the tables of a level are independent and can be loaded in parallel.
+
+    Parameters:
+        list_tables (list): The table names.
+        list_edges (list): The foreign keys (see foreign_key_edges).
+
+    Returns:
+        list: the levels (lists of table names); the tables of a cycle, if any, are in the last level.
+    """
+    dic_parents = {table_name: set() for table_name in list_tables}
+    for table_name, _, foreign_table, _ in list_edges:
+        dic_parents[table_name].add(foreign_table)
+    list_levels = []
+    set_done = set()
+    list_left = list(list_tables)
+    while len(list_left) > 0:
+        list_level = [table_name for table_name in list_left if dic_parents[table_name] <= set_done]
+        if len(list_level) == 0:
+            print("Foreign keys cycle between:", list_left)
+            list_level = list_left
+        list_levels.append(list_level)
+        set_done.update(list_level)
+        list_left = [table_name for table_name in list_left if table_name not in set_done]
+    return list_levels
+
+def db_pool_init(engine: str, db_path: str, size: int) -> dict:
+    """
+    Opens a pool of connections to a local database (SQLite file or DuckDB file), one for each loading thread.
+
+    Parameters:
+        engine (str): one of LOAD_ENGINES.
+        db_path (str): The database file (created if it does not exist).
+        size (int): The number of connections.
+
+    Returns:
+        dict: the pool.
+
+    Raises:
+        ValueError: if the engine is unknown.
+    """
+    if engine not in LOAD_ENGINES:
+        raise ValueError(f"Unknown load engine '{engine}' (allowed: {', '.join(LOAD_ENGINES)})")
+    pool = {'engine': engine, 'db_path': str(db_path), 'connections': queue.Queue(), 'base': None}
+    if engine == "duckdb":
+        import duckdb # optional dependency, needed only by this engine
+        # The cursors of a DuckDB connection are connections to the same database, usable from other threads
+        pool['base'] = duckdb.connect(str(db_path))
+        pool['errors'] = (duckdb.Error,)
+        for _ in range(size):
+            pool['connections'].put(pool['base'].cursor())
+    else:
+        pool['errors'] = (sqlite3.Error,)
+        for _ in range(size):
+            con = sqlite3.connect(str(db_path), timeout=LOAD_BUSY_TIMEOUT, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=OFF")
+            con.execute("PRAGMA foreign_keys=OFF")
+            pool['connections'].put(con)
+    return pool
+
+@contextmanager
+def db_pool_connection(pool: dict):
+    """
+    Takes a connection from the pool (waiting until one is free) and gives it back at the end of the block.
+
+    Parameters:
+        pool (dict): The pool.
+
+    Returns:
+        the connection.
+    """
+    con = pool['connections'].get()
+    try:
+        yield con
+    finally:
+        pool['connections'].put(con)
+
+def db_pool_close(pool: dict) -> None:
+    """
+    Closes all the connections of the pool.
+
+    Parameters:
+        pool (dict): The pool.
+
+    Returns:
+        None
+    """
+    while not pool['connections'].empty():
+        pool['connections'].get().close()
+    if pool['base'] is not None:
+        pool['base'].close()
+
+def db_create_table_query(dic_schema: dict, drop_table: bool) -> str:
+    """
+    Generates the CREATE TABLE query of a table without constraints and indexes (keys and indexes are built after the load, see db_index_queries).
+
+    Parameters:
+        dic_schema (dict): The table schema.
+        drop_table (bool): If True, the table is dropped first.
+
+    Returns:
+        str: the query.
+    """
+    table_name = sql_quote_name(dic_schema['table_name_eng'])
+    query = f"DROP TABLE IF EXISTS {table_name};\n" if drop_table else ""
+    column_definitions = [f"  {sql_quote_name(column)} {sql_type}" for column, sql_type in dic_schema['columns'].items()]
+    query += f"CREATE TABLE {table_name} (\n" + ",\n".join(column_definitions) + "\n);"
+    return query
+
+def db_index_queries(dic_schema: dict) -> list:
+    """
+    Generates the queries of the indexes of a table, as in the MySQL script: a unique index on the primary key and an index on each key column.
+
+    Parameters:
+        dic_schema (dict): The table schema.
+
+    Returns:
+        list: tuples (index name, query, True for the primary key).
+    """
+    table_name = dic_schema['table_name_eng']
+    list_keys = dic_schema['primary_keys']
+    list_queries = []
+    if len(list_keys) > 0:
+        index_name = f"{table_name}_pk"
+        keys_str = ", ".join(sql_quote_name(key) for key in list_keys)
+        list_queries.append((index_name, f"CREATE UNIQUE INDEX {sql_quote_name(index_name)} ON {sql_quote_name(table_name)} ({keys_str});", True))
+    for key in list_keys:
+        index_name = f"{table_name}_{key}_idx"
+        list_queries.append((index_name, f"CREATE INDEX {sql_quote_name(index_name)} ON {sql_quote_name(table_name)} ({sql_quote_name(key)});", False))
+    return list_queries
+
+def db_load_csv_duckdb(con, dic_schema: dict, path_csv: Path, csv_sep: str) -> int:
+    """
+    Loads a CSV file into a DuckDB table with the native COPY (the file is parsed in parallel by DuckDB). The columns are matched by position, as in LOAD DATA INFILE; empty values become NULL.
+
+    Parameters:
+        con: The connection.
+        dic_schema (dict): The table schema.
+        path_csv (Path): The CSV file (with header).
+        csv_sep (str): The CSV separator.
+
+    Returns:
+        int: the number of rows loaded.
+    """
+    path_str = str(path_csv).replace("'", "''")
+    result = con.execute(f"COPY {sql_quote_name(dic_schema['table_name_eng'])} FROM '{path_str}' (FORMAT csv, DELIMITER '{csv_sep}', HEADER true, QUOTE '\"', ESCAPE '\"')").fetchone()
+    return int(result[0])
+
+def db_load_csv_sqlite(con, dic_schema: dict, path_csv: Path, csv_sep: str, batch_rows: int) -> int:
+    """
+    Loads a CSV file into a SQLite table with batched executemany, a transaction for each batch (so that the tables loaded in parallel take the write lock in turn). The columns are matched by position, as in LOAD DATA INFILE; empty values become NULL.
+
+    Parameters:
+        con: The connection.
+        dic_schema (dict): The table schema.
+        path_csv (Path): The CSV file (with header).
+        csv_sep (str): The CSV separator.
+        batch_rows (int): The rows inserted for each batch.
+
+    Returns:
+        int: the number of rows loaded.
+    """
+    num_cols = len(dic_schema['columns'])
+    query = f"INSERT INTO {sql_quote_name(dic_schema['table_name_eng'])} VALUES ({', '.join(['?'] * num_cols)})"
+    rows_num = 0
+    list_rows = []
+    with open(path_csv, newline="", encoding="utf-8") as fp:
+        reader = csv.reader(fp, delimiter=csv_sep)
+        next(reader, None)
+        for row in reader:
+            if len(row) < num_cols:
+                row = row + [""] * (num_cols - len(row))
+            list_rows.append([value if value != "" else None for value in row[:num_cols]])
+            if len(list_rows) >= batch_rows:
+                with con:
+                    con.executemany(query, list_rows)
+                rows_num += len(list_rows)
+                list_rows = []
+    if len(list_rows) > 0:
+        with con:
+            con.executemany(query, list_rows)
+        rows_num += len(list_rows)
+    return rows_num
+
+def db_load_table(pool: dict, dic_schema: dict, path_csv: Path, csv_sep: str = ";", batch_rows: int = 50_000, drop_table: bool = True) -> dict:
+    """
+    Creates a table (without constraints and indexes) and loads its CSV file.
+
+    Parameters:
+        pool (dict): The connection pool.
+        dic_schema (dict): The table schema.
+        path_csv (Path): The CSV file (with header).
+        csv_sep (str): The CSV separator. Defaults to ';'.
+        batch_rows (int): The rows inserted for each batch (SQLite).
+        drop_table (bool): If True, the table is dropped first.
+
+    Returns:
+        dict: the load result (table, rows, seconds, rows/s, error).
+    """
+    dic_result = {'table_name': dic_schema['table_name_eng'], 'rows': 0, 'sec': 0.0, 'rows_per_sec': 0.0, 'error': None}
+    time_start = perf_counter()
+    with db_pool_connection(pool) as con:
+        try:
+            for query in db_create_table_query(dic_schema, drop_table).split(";\n"):
+                con.execute(query)
+            if pool['engine'] == "duckdb":
+                dic_result['rows'] = db_load_csv_duckdb(con, dic_schema, path_csv, csv_sep)
+            else:
+                dic_result['rows'] = db_load_csv_sqlite(con, dic_schema, path_csv, csv_sep, batch_rows)
+        except pool['errors'] as exc:
+            dic_result['error'] = str(exc).splitlines()[0]
+    dic_result['sec'] = round(perf_counter() - time_start, 3)
+    dic_result['rows_per_sec'] = round(dic_result['rows'] / dic_result['sec'], 1) if dic_result['sec'] > 0 else 0.0
+    return dic_result
+
+def db_build_indexes(pool: dict, dic_schema: dict) -> dict:
+    """
+    Builds the indexes of a loaded table (see db_index_queries). A primary key with duplicated values cannot be built: the error is reported and the other indexes are built.
+
+    Parameters:
+        pool (dict): The connection pool.
+        dic_schema (dict): The table schema.
+
+    Returns:
+        dict: the result (table, indexes built, seconds, errors).
+    """
+    dic_result = {'table_name': dic_schema['table_name_eng'], 'indexes': 0, 'sec': 0.0, 'errors': []}
+    time_start = perf_counter()
+    with db_pool_connection(pool) as con:
+        for index_name, query, _ in db_index_queries(dic_schema):
+            try:
+                con.execute(query)
+                if pool['engine'] == "sqlite":
+                    con.commit()
+                dic_result['indexes'] += 1
+            except pool['errors'] as exc:
+                dic_result['errors'].append(f"{index_name}: {str(exc).splitlines()[0]}")
+    dic_result['sec'] = round(perf_counter() - time_start, 3)
+    return dic_result
+
+def db_check_foreign_key(pool: dict, table_name: str, column: str, foreign_table: str, foreign_column: str) -> int:
+    """
+    Counts the rows of a table whose foreign key has no matching row in the referenced table (the foreign key constraints are checked after the load instead of being enforced during it).
+
+    Parameters:
+        pool (dict): The connection pool.
+        table_name (str): The table (loaded name).
+        column (str): The foreign key column.
+        foreign_table (str): The referenced table (loaded name).
+        foreign_column (str): The referenced column.
+
+    Returns:
+        int: the number of rows without a match.
+    """
+    query = f"""SELECT COUNT(*) FROM {sql_quote_name(table_name)} AS c
+        WHERE c.{sql_quote_name(column)} IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM {sql_quote_name(foreign_table)} AS p WHERE p.{sql_quote_name(foreign_column)} = c.{sql_quote_name(column)})"""
+    with db_pool_connection(pool) as con:
+        return int(con.execute(query).fetchone()[0])
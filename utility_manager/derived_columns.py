@@ -0,0 +1,139 @@
+import pandas as pd
+
+DATE_PARTS = ["year", "quarter", "month", "day", "dayofweek"]
+
+def op_str_slice(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """
+    Takes a part of a text column, e.g. the CPV division from the CPV code ({op: str_slice, col: cod_cpv, stop: 2}).
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        spec (dict): 'col', 'start' (optional, default 0), 'stop' (optional, default to the end).
+
+    Returns:
+        pd.Series: the derived column (missing values stay missing).
+    """
+    return df[spec['col']].str[spec.get('start', 0):spec.get('stop')]
+
+def op_notna(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """
+    Flags the rows where a column has a value (1) or is missing (0), e.g. {op: notna, col: cig_accordo_quadro}.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        spec (dict): 'col'.
+
+    Returns:
+        pd.Series: the derived column (int8).
+    """
+    return df[spec['col']].notna().astype('int8')
+
+def op_date_part(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """
+    Extracts a part of a date column, e.g. {op: date_part, col: data_pubblicazione, part: year}; values that are not dates become missing.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        spec (dict): 'col', 'part' (one of DATE_PARTS), 'format' (optional, the date format).
+
+    Returns:
+        pd.Series: the derived column (nullable integer).
+    """
+    series_date = pd.to_datetime(df[spec['col']], format=spec.get('format'), errors='coerce')
+    return getattr(series_date.dt, spec['part']).astype('Int16')
+
+def op_bucket(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """
+    Groups the values of a numeric column in intervals, e.g. {op: bucket, col: anno_pubblicazione, bins: [2015, 2019, 2023], labels: ["2016-2019", "2020-2023"]}.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        spec (dict): 'col', 'bins' (the interval edges, right included), 'labels' (optional, one for each interval).
+
+    Returns:
+        pd.Series: the derived column (category).
+    """
+    series_num = pd.to_numeric(df[spec['col']], errors='coerce')
+    return pd.cut(series_num, bins=spec['bins'], labels=spec.get('labels'))
+
+def op_map(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """
+    Maps the values of a column with a dictionary, e.g. {op: map, col: settore, values: {ORDINARIO: O, SPECIALE: S}}; values not in the dictionary become missing.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        spec (dict): 'col', 'values' (the dictionary).
+
+    Returns:
+        pd.Series: the derived column.
+    """
+    return df[spec['col']].map(spec['values'])
+
+DERIVED_OPS = {
+    'str_slice': op_str_slice,
+    'notna': op_notna,
+    'date_part': op_date_part,
+    'bucket': op_bucket,
+    'map': op_map
+}
+
+def derived_columns_compile(dic_spec: dict) -> list:
+    """
+    Checks the derived columns configured for a file and turns them into a list of (column name, operation, specification), in the configured order.
+
+    Parameters:
+        dic_spec (dict): The derived columns of a file, {column name: {op: ..., col: ..., ...}}.
+
+    Returns:
+        list: the compiled derived columns.
+
+    Raises:
+        ValueError: if an operation is unknown or a required parameter is missing.
+    """
+    list_compiled = []
+    for col_name, spec in (dic_spec or {}).items():
+        op_name = spec.get('op')
+        if op_name not in DERIVED_OPS:
+            raise ValueError(f"Derived column '{col_name}': unknown operation '{op_name}' (allowed: {', '.join(DERIVED_OPS)})")
+        if 'col' not in spec:
+            raise ValueError(f"Derived column '{col_name}': missing source column 'col'")
+        if op_name == 'date_part' and spec.get('part') not in DATE_PARTS:
+            raise ValueError(f"Derived column '{col_name}': 'part' must be one of {', '.join(DATE_PARTS)}")
+        if op_name == 'bucket' and 'bins' not in spec:
+            raise ValueError(f"Derived column '{col_name}': missing 'bins'")
+        if op_name == 'map' and 'values' not in spec:
+            raise ValueError(f"Derived column '{col_name}': missing 'values'")
+        list_compiled.append((col_name, DERIVED_OPS[op_name], spec))
+    return list_compiled
+
+def derived_columns_sources(list_compiled: list) -> list:
+    """
+    Returns the columns of the file needed to compute the derived columns (derived columns computed from other derived columns are not included).
+
+    Parameters:
+        list_compiled (list): The compiled derived columns.
+
+    Returns:
+        list: the source columns, without duplicates.
+    """
+    list_derived = [col_name for col_name, _, _ in list_compiled]
+    list_sources = []
+    for _, _, spec in list_compiled:
+        if spec['col'] not in list_derived and spec['col'] not in list_sources:
+            list_sources.append(spec['col'])
+    return list_sources
+
+def df_add_derived_columns(df: pd.DataFrame, list_compiled: list) -> pd.DataFrame:
+    """
+    Adds the derived columns to a dataframe (or to one of its chunks) with vectorised operations.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        list_compiled (list): The compiled derived columns.
+
+    Returns:
+        pd.DataFrame: The dataframe with the derived columns.
+    """
+    for col_name, op_func, spec in list_compiled:
+        df[col_name] = op_func(df, spec)
+    return df
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+DTYPE_STRING_ARROW = "string[pyarrow]"
+
+def df_memory_bytes(df: pd.DataFrame) -> int:
+    """
+    Returns the memory used by a dataframe, including the content of the Python objects (strings).
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+
+    Returns:
+        int: the memory used in bytes.
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+def series_is_text(series: pd.Series) -> bool:
+    """
+    Checks whether a column contains strings (Python objects or pandas strings).
+
+    Parameters:
+        series (pd.Series): The column.
+
+    Returns:
+        bool: True if the column is a text column.
+    """
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+def series_optimise_dtype(series: pd.Series, category_ratio: float, string_arrow: bool) -> pd.Series:
+    """
+    Converts a column to a more compact type: text columns with few distinct values become 'category', the other text columns become Arrow strings, integers and floats are downcast when no value changes.
+
+    Parameters:
+        series (pd.Series): The column.
+        category_ratio (float): Text columns with distinct values / rows under this ratio become 'category'.
+        string_arrow (bool): If True, the other text columns become Arrow strings (requires pyarrow).
+
+    Returns:
+        pd.Series: The column converted (or the same column if no conversion applies).
+    """
+    if series_is_text(series):
+        num_rows = len(series)
+        if num_rows == 0:
+            return series
+        values_unique = series.dropna().unique()
+        if len(values_unique) / num_rows < category_ratio:
+            # Categories in order of first appearance, so that value_counts keeps the same order of the text column
+            return series.astype(pd.CategoricalDtype(values_unique))
+        if string_arrow:
+            return series.astype(DTYPE_STRING_ARROW)
+        return series
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series):
+        series_32 = series.astype("float32")
+        # Keep float64 if some value would change (e.g. amounts with many digits)
+        if np.array_equal(series_32.astype("float64").to_numpy(), series.to_numpy(), equal_nan=True):
+            return series_32
+    return series
+
+def df_optimise_dtypes(df: pd.DataFrame, category_ratio: float = 0.05, string_arrow: bool = True) -> tuple:
+    """
+    Converts each column of a dataframe to a more compact type (see series_optimise_dtype).
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        category_ratio (float): Text columns with distinct values / rows under this ratio become 'category'.
+        string_arrow (bool): If True, the other text columns become Arrow strings (requires pyarrow).
+
+    Returns:
+        tuple: the dataframe converted and a dictionary with the new type of each column.
+    """
+    dic_types = {}
+    for col in df.columns:
+        df[col] = series_optimise_dtype(df[col], category_ratio, string_arrow)
+        dtype = df[col].dtype
+        # The name of Arrow strings must keep the storage to be used in read_csv
+        dic_types[col] = f"string[{dtype.storage}]" if isinstance(dtype, pd.StringDtype) else str(dtype)
+    return df, dic_types
+
+def dtype_is_numeric(dtype_name: str) -> bool:
+    """
+    Checks whether a type name is a NumPy numeric type (pandas types such as 'category' or Arrow strings are not).
+
+    Parameters:
+        dtype_name (str): The type name.
+
+    Returns:
+        bool: True if the type is numeric.
+    """
+    try:
+        return pd.api.types.is_numeric_dtype(np.dtype(dtype_name))
+    except TypeError:
+        return False
+
+def dtype_merge(dtype_a: str, dtype_b: str) -> str:
+    """
+    Merges the types inferred for the same column name in two files, so that the resulting type can read both.
+
+    Parameters:
+        dtype_a (str): The first type.
+        dtype_b (str): The second type.
+
+    Returns:
+        str: the type that can hold the values of both columns.
+    """
+    if dtype_a == dtype_b:
+        return dtype_a
+    numeric_a = dtype_is_numeric(dtype_a)
+    numeric_b = dtype_is_numeric(dtype_b)
+    if numeric_a and numeric_b:
+        return str(np.promote_types(dtype_a, dtype_b))
+    if not numeric_a and not numeric_b:
+        return DTYPE_STRING_ARROW
+    return "object"
+
+def dtype_merge_files(list_dic_types: list) -> dict:
+    """
+    Merges the types inferred for each file into a single dictionary (the format of conf_cols_type.json), sorted by column name.
+
+    Parameters:
+        list_dic_types (list): List of dictionaries with the type of each column, one for each file.
+
+    Returns:
+        dict: the type of each column.
+    """
+    dic_merged = {}
+    for dic_types in list_dic_types:
+        for col, dtype in dic_types.items():
+            dic_merged[col] = dtype_merge(dic_merged[col], dtype) if col in dic_merged else dtype
+    return {col: dic_merged[col] for col in sorted(dic_merged)}
@@ -0,0 +1,235 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DUP_MODES = ["exact", "spill", "hll"]
+DUP_HASH_ROWS = 1_000_000 # rows hashed at a time when a whole dataframe is counted
+HASH_SAMPLE_ROWS = 10_000 # rows used to estimate the share of distinct values of a column
+HASH_CATEGORIZE_RATIO = 0.5 # columns with distinct values / rows under this ratio are hashed on their distinct values
+HASH_NULL = np.uint64(0xFFFFFFFFFFFFFFFF) # fingerprint of every missing value (None, NaN, NA), whatever the type of the column and the hashing used
+HASH_VERSION = 2 # changes when the fingerprints of the same values change (saved fingerprints are not comparable)
+
+def series_hashes(series: pd.Series, sample_rows: int = HASH_SAMPLE_ROWS) -> np.ndarray:
+    """
+    Computes a 64-bit fingerprint of each value of a column. Text columns with many repeated values (in the first 'sample_rows' rows) are hashed on their distinct values, the others value by value (faster when most values are distinct); the fingerprints are the same in both cases, and the missing values all get HASH_NULL (as in DataFrame.duplicated, where they are equal), so the same row has the same fingerprint in every chunk.
+
+    Parameters:
+        series (pd.Series): The column.
+        sample_rows (int): rows used to estimate the share of distinct values.
+
+    Returns:
+        np.ndarray: the fingerprints (uint64), one for each value.
+    """
+    series_sample = series.iloc[:sample_rows]
+    categorize = len(series_sample) > 0 and series_sample.nunique(dropna=False) / len(series_sample) < HASH_CATEGORIZE_RATIO
+    hashes = pd.util.hash_pandas_object(series, index=False, categorize=categorize).to_numpy()
+    mask_null = series.isna().to_numpy()
+    if mask_null.any():
+        hashes = np.where(mask_null, HASH_NULL, hashes)
+    return hashes
+
+def df_row_hashes(df: pd.DataFrame, list_cols: list = None) -> np.ndarray:
+    """
+    Computes a 64-bit fingerprint of each row of a dataframe (rows with the same values have the same fingerprint), combining the fingerprints of the columns as pd.util.hash_pandas_object.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        list_cols (list, optional): columns to be considered (if None, all the columns).
+
+    Returns:
+        np.ndarray: the fingerprints (uint64), one for each row.
+    """
+    if list_cols is not None:
+        df = df[list_cols]
+    num_cols = len(df.columns)
+    mult = np.uint64(1000003)
+    hashes = np.full(len(df), 0x345678, dtype='uint64')
+    for col_num in range(num_cols):
+        hashes ^= series_hashes(df.iloc[:, col_num])
+        hashes *= mult
+        mult += np.uint64(82520 + 2 * (num_cols - col_num))
+    hashes += np.uint64(97531)
+    return hashes
+
+def dup_counter_init(mode: str = "exact", spill_dir: str = None, spill_partitions: int = 64, memory_max_rows: int = 10_000_000, hll_precision: int = 14) -> dict:
+    """
+    Creates a counter of duplicated rows fed with row fingerprints, chunk by chunk.
+    - 'exact': the distinct fingerprints are kept in memory (a sorted array, compacted when the buffer is full).
+    - 'spill': the fingerprints are written to partition files on disk when the buffer is full and counted one partition at a time (the memory used depends on the largest partition).
+    - 'hll': the distinct fingerprints are estimated with a HyperLogLog sketch (fixed memory, approximate count).
+
+    Parameters:
+        mode (str): one of DUP_MODES.
+        spill_dir (str, optional): directory of the partition files ('spill' mode), the files already there are removed.
+        spill_partitions (int): number of partition files ('spill' mode).
+        memory_max_rows (int): fingerprints kept in the buffer before compacting ('exact') or writing to disk ('spill').
+        hll_precision (int): bits of the register index ('hll' mode, 2^precision registers of one byte, standard error 1.04 / sqrt(2^precision)).
+
+    Returns:
+        dict: the empty counter.
+
+    Raises:
+        ValueError: if the mode is unknown or 'spill' mode has no directory.
+    """
+    if mode not in DUP_MODES:
+        raise ValueError(f"Unknown duplicates mode '{mode}' (allowed: {', '.join(DUP_MODES)})")
+    counter = {
+        'mode': mode,
+        'rows_num': 0,
+        'buffer': [],
+        'buffer_rows': 0,
+        'memory_max_rows': memory_max_rows,
+        'distinct': np.empty(0, dtype='uint64')
+    }
+    if mode == "spill":
+        if spill_dir is None:
+            raise ValueError("Duplicates mode 'spill' requires a directory")
+        # A new counter starts from empty partitions
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        Path(spill_dir).mkdir(parents=True, exist_ok=True)
+        counter['spill_dir'] = str(spill_dir)
+        counter['spill_partitions'] = spill_partitions
+    if mode == "hll":
+        counter['hll_precision'] = hll_precision
+        counter['registers'] = np.zeros(1 << hll_precision, dtype='uint8')
+    return counter
+
+def hll_ranks(hashes: np.ndarray, precision: int) -> tuple:
+    """
+    Splits each fingerprint in the register index (first 'precision' bits) and the rank (position of the first 1 bit in the other bits).
+
+    Parameters:
+        hashes (np.ndarray): The fingerprints (uint64).
+        precision (int): bits of the register index.
+
+    Returns:
+        tuple: the register indexes and the ranks (uint8).
+    """
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    # A 1 bit after the remaining bits limits the rank when they are all 0
+    bits = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    leading_zeros = np.zeros(len(bits), dtype='uint8')
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = bits < np.uint64(1 << (64 - shift))
+        leading_zeros[mask] += shift
+        bits[mask] <<= np.uint64(shift)
+    return index, leading_zeros + 1
+
+def hll_estimate(registers: np.ndarray) -> float:
+    """
+    Estimates the number of distinct fingerprints from the HyperLogLog registers (with linear counting for small cardinalities).
+
+    Parameters:
+        registers (np.ndarray): The registers.
+
+    Returns:
+        float: the estimated number of distinct fingerprints.
+    """
+    num_registers = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / num_registers)
+    estimate = alpha * num_registers * num_registers / np.sum(np.exp2(-registers.astype('float64')))
+    registers_zero = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * num_registers and registers_zero > 0:
+        estimate = num_registers * np.log(num_registers / registers_zero)
+    return float(estimate)
+
+def dup_counter_flush(counter: dict) -> None:
+    """
+    Empties the buffer of the counter: the fingerprints are merged with the distinct ones ('exact') or appended to the partition files ('spill').
+
+    Parameters:
+        counter (dict): The counter.
+
+    Returns:
+        None
+    """
+    if counter['buffer_rows'] == 0:
+        return
+    hashes = np.concatenate(counter['buffer'])
+    if counter['mode'] == "exact":
+        counter['distinct'] = np.unique(np.concatenate([counter['distinct'], hashes]))
+    elif counter['mode'] == "spill":
+        partitions = (hashes % np.uint64(counter['spill_partitions'])).astype(np.intp)
+        order = np.argsort(partitions, kind="stable")
+        hashes = hashes[order]
+        bounds = np.searchsorted(partitions[order], np.arange(counter['spill_partitions'] + 1))
+        for partition in range(counter['spill_partitions']):
+            start, end = bounds[partition], bounds[partition + 1]
+            if end > start:
+                with open(Path(counter['spill_dir']) / f"part_{partition:04d}.bin", "ab") as fp:
+                    hashes[start:end].tofile(fp)
+    counter['buffer'] = []
+    counter['buffer_rows'] = 0
+
+def dup_counter_update(counter: dict, hashes: np.ndarray) -> None:
+    """
+    Adds the fingerprints of a chunk of rows to the counter.
+
+    Parameters:
+        counter (dict): The counter.
+        hashes (np.ndarray): The fingerprints (uint64).
+
+    Returns:
+        None
+    """
+    counter['rows_num'] += len(hashes)
+    if counter['mode'] == "hll":
+        index, ranks = hll_ranks(hashes, counter['hll_precision'])
+        np.maximum.at(counter['registers'], index, ranks)
+        return
+    counter['buffer'].append(hashes)
+    counter['buffer_rows'] += len(hashes)
+    if counter['buffer_rows'] >= counter['memory_max_rows']:
+        dup_counter_flush(counter)
+
+def dup_counter_distinct(counter: dict) -> int:
+    """
+    Returns the number of distinct fingerprints added to the counter (estimated in 'hll' mode).
+
+    Parameters:
+        counter (dict): The counter.
+
+    Returns:
+        int: the number of distinct fingerprints.
+    """
+    if counter['mode'] == "hll":
+        return min(counter['rows_num'], int(round(hll_estimate(counter['registers']))))
+    dup_counter_flush(counter)
+    if counter['mode'] == "exact":
+        return len(counter['distinct'])
+    # The same fingerprint is always in the same partition, so the distinct values are counted one partition at a time
+    distinct_num = 0
+    for path_part in sorted(Path(counter['spill_dir']).glob("part_*.bin")):
+        distinct_num += len(np.unique(np.fromfile(path_part, dtype='uint64')))
+    return distinct_num
+
+def dup_counter_duplicates(counter: dict) -> int:
+    """
+    Returns the number of duplicated rows (rows equal to a previous row) added to the counter.
+
+    Parameters:
+        counter (dict): The counter.
+
+    Returns:
+        int: the number of duplicated rows (estimated in 'hll' mode).
+    """
+    return counter['rows_num'] - dup_counter_distinct(counter)
+
+def df_duplicated_count(df: pd.DataFrame, counter: dict, list_cols: list = None, hash_rows: int = DUP_HASH_ROWS) -> int:
+    """
+    Counts the duplicated rows of a dataframe on the fingerprints of the rows, hashing 'hash_rows' rows at a time (instead of df.duplicated on all the columns).
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+        counter (dict): An empty counter (see dup_counter_init).
+        list_cols (list, optional): columns to be considered (if None, all the columns).
+        hash_rows (int): rows hashed at a time.
+
+    Returns:
+        int: the number of duplicated rows.
+    """
+    for start in range(0, len(df), hash_rows):
+        dup_counter_update(counter, df_row_hashes(df.iloc[start:start + hash_rows], list_cols))
+    return dup_counter_duplicates(counter)
@@ -0,0 +1,162 @@
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from utility_manager.duplicates import series_hashes, df_row_hashes
+from utility_manager.join_planner import table_chunks
+
+def sorted_contains(sorted_keys: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """
+    Checks which fingerprints are in a sorted array of fingerprints (binary search).
+
+    Parameters:
+        sorted_keys (np.ndarray): The sorted distinct fingerprints (uint64).
+        hashes (np.ndarray): The fingerprints to be looked up.
+
+    Returns:
+        np.ndarray: True for the fingerprints found.
+    """
+    if len(sorted_keys) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, hashes), len(sorted_keys) - 1)
+    return sorted_keys[pos] == hashes
+
+def keys_path(keys_dir: Path, table_name: str, column: str) -> Path:
+    """
+    Returns the file of the sorted key array of a referenced column.
+
+    Parameters:
+        keys_dir (Path): The directory of the key arrays.
+        table_name (str): The table.
+        column (str): The referenced column.
+
+    Returns:
+        Path: the .npy file.
+    """
+    return Path(keys_dir) / f"{table_name}.{column}.npy"
+
+def values_sample(list_values: list, values: np.ndarray, sample_size: int) -> None:
+    """
+    Adds distinct values to a sample until it has sample_size values.
+
+    Parameters:
+        list_values (list): The sample (updated).
+        values (np.ndarray): The values.
+        sample_size (int): The size of the sample.
+
+    Returns:
+        None
+    """
+    for value in pd.unique(values):
+        if len(list_values) >= sample_size:
+            return
+        if value not in list_values:
+            list_values.append(value)
+
+def table_keys_scan(dic_schema: dict, path_csv: Path, list_ref_cols: list, keys_dir: Path, csv_sep: str = ";", chunk_rows: int = 1_000_000, sample_size: int = 10) -> dict:
+    """
+    Streams a table once and builds its compact key arrays: the sorted distinct fingerprints of each column referenced by a foreign key (saved to keys_dir, to be read by the foreign key checks) and the fingerprints of the primary key, sorted to count the duplicated keys. If the primary key has duplicates, the table is read again to sample them.
+
+    Parameters:
+        dic_schema (dict): The table schema (see table_schemas_read).
+        path_csv (Path): The cleaned CSV file of the table.
+        list_ref_cols (list): The columns referenced by foreign keys.
+        keys_dir (Path): The directory of the key arrays.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+        chunk_rows (int): Rows read at a time.
+        sample_size (int): Duplicated keys kept as examples.
+
+    Returns:
+        dict: the primary key result (rows, rows with an empty key, rows with a duplicated key, sample).
+    """
+    time_start = perf_counter()
+    table_name = dic_schema['table_name']
+    list_pk = list(dic_schema['primary_keys'])
+    list_cols = list(dict.fromkeys(list_pk + list_ref_cols))
+    list_pk_read = [f"{table_name}.{col}" for col in list_pk]
+    rows_num = 0
+    pk_null_rows = 0
+    list_pk_hashes = []
+    dic_ref_hashes = {col: [] for col in list_ref_cols}
+    for df_chunk in table_chunks(path_csv, dic_schema, list_cols, csv_sep, chunk_rows):
+        rows_num += len(df_chunk)
+        if len(list_pk) > 0:
+            # A primary key cannot be empty: the rows with an empty key column are counted apart
+            has_key = (df_chunk[list_pk_read] != "").all(axis=1).to_numpy()
+            pk_null_rows += int(np.count_nonzero(~has_key))
+            list_pk_hashes.append(df_row_hashes(df_chunk.loc[has_key], list_pk_read))
+        for col in list_ref_cols:
+            values = df_chunk[f"{table_name}.{col}"]
+            dic_ref_hashes[col].append(np.unique(series_hashes(values[values != ""])))
+
+    for col in list_ref_cols:
+        sorted_keys = np.unique(np.concatenate(dic_ref_hashes[col])) if len(dic_ref_hashes[col]) > 0 else np.zeros(0, dtype=np.uint64)
+        np.save(keys_path(keys_dir, table_name, col), sorted_keys)
+
+    dic_result = {'table_name': table_name, 'table_name_eng': dic_schema['table_name_eng'], 'primary_keys': ", ".join(list_pk), 'rows': rows_num, 'pk_null_rows': pk_null_rows, 'duplicated_pk_rows': 0, 'duplicated_pk_keys': 0, 'duplicated_pk_sample': "", 'sec': 0.0}
+    if len(list_pk_hashes) > 0:
+        pk_hashes = np.sort(np.concatenate(list_pk_hashes))
+        list_pk_hashes = None
+        # In the sorted fingerprints, a duplicated key is equal to the one before it
+        is_repeat = pk_hashes[1:] == pk_hashes[:-1]
+        dic_result['duplicated_pk_rows'] = int(np.count_nonzero(is_repeat))
+        dup_hashes = np.unique(pk_hashes[1:][is_repeat])
+        dic_result['duplicated_pk_keys'] = len(dup_hashes)
+        pk_hashes = None
+        if len(dup_hashes) > 0 and sample_size > 0:
+            list_sample = []
+            for df_chunk in table_chunks(path_csv, dic_schema, list_pk, csv_sep, chunk_rows):
+                has_key = (df_chunk[list_pk_read] != "").all(axis=1).to_numpy()
+                df_keys = df_chunk.loc[has_key]
+                is_dup = sorted_contains(dup_hashes, df_row_hashes(df_keys, list_pk_read))
+                values_sample(list_sample, df_keys.loc[is_dup, list_pk_read].astype(str).agg("|".join, axis=1).to_numpy(), sample_size)
+                if len(list_sample) >= sample_size:
+                    break
+            dic_result['duplicated_pk_sample'] = "; ".join(list_sample)
+    dic_result['sec'] = round(perf_counter() - time_start, 3)
+    print(f"Table: {table_name} - rows: {rows_num} - empty keys: {pk_null_rows} - duplicated keys (rows): {dic_result['duplicated_pk_rows']} - sec: {dic_result['sec']}")
+    return dic_result
+
+def foreign_key_scan(dic_schema: dict, path_csv: Path, column: str, foreign_table: str, foreign_column: str, keys_dir: Path, csv_sep: str = ";", chunk_rows: int = 1_000_000, sample_size: int = 10) -> dict:
+    """
+    Streams the foreign key column of a table against the sorted key array of the referenced column (memory-mapped, see table_keys_scan) and counts the orphan rows, whose key has no matching row in the referenced table (empty keys are not orphans, as NULL in MySQL).
+
+    Parameters:
+        dic_schema (dict): The schema of the table with the foreign key.
+        path_csv (Path): The cleaned CSV file of the table.
+        column (str): The foreign key column.
+        foreign_table (str): The referenced table.
+        foreign_column (str): The referenced column.
+        keys_dir (Path): The directory of the key arrays.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+        chunk_rows (int): Rows read at a time.
+        sample_size (int): Orphan keys kept as examples.
+
+    Returns:
+        dict: the result (rows, empty keys, orphan rows, distinct orphan keys, sample).
+    """
+    time_start = perf_counter()
+    table_name = dic_schema['table_name']
+    sorted_keys = np.load(keys_path(keys_dir, foreign_table, foreign_column), mmap_mode="r")
+    rows_num = 0
+    null_rows = 0
+    orphan_rows = 0
+    list_orphan_hashes = []
+    list_sample = []
+    for df_chunk in table_chunks(path_csv, dic_schema, [column], csv_sep, chunk_rows):
+        values = df_chunk[f"{table_name}.{column}"]
+        rows_num += len(values)
+        values = values[values != ""]
+        null_rows += len(df_chunk) - len(values)
+        hashes = series_hashes(values)
+        is_orphan = ~sorted_contains(sorted_keys, hashes)
+        orphan_rows += int(np.count_nonzero(is_orphan))
+        list_orphan_hashes.append(np.unique(hashes[is_orphan]))
+        if len(list_sample) < sample_size:
+            values_sample(list_sample, values.to_numpy()[is_orphan], sample_size)
+    orphan_keys = len(np.unique(np.concatenate(list_orphan_hashes))) if len(list_orphan_hashes) > 0 else 0
+    dic_result = {'table_name': table_name, 'column': column, 'foreign_table': foreign_table, 'foreign_column': foreign_column, 'rows': rows_num, 'null_rows': null_rows, 'orphan_rows': orphan_rows, 'orphan_keys': orphan_keys, 'orphan_sample': "; ".join(list_sample), 'sec': round(perf_counter() - time_start, 3)}
+    print(f"{table_name}.{column} -> {foreign_table}.{foreign_column}: rows {rows_num} - orphan rows {orphan_rows} - orphan keys {orphan_keys} - sec: {dic_result['sec']}")
+    return dic_result
@@ -0,0 +1,375 @@
+import shutil
+from collections import deque
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+KEY_SEP = "\x1f" # separator of the values of a key with more columns
+
+def join_plan(base_table: str, list_targets: list, list_edges: list) -> list:
+    """
+    Finds the joins from a base table to the target tables on the foreign keys graph (shortest paths, visiting first the tables referenced by the joined ones). A join following a foreign key adds at most one row for each row (lookup); a join against a foreign key adds a row for each match (one-to-many).
+
+    Parameters:
+        base_table (str): The base table of the view.
+        list_targets (list): The tables to be joined.
+        list_edges (list): The foreign keys (see foreign_key_edges).
+
+    Returns:
+        list: the joins in order, dictionaries with the table joined, the table it is joined to, the key columns of both and whether the join is one-to-many.
+
+    Raises:
+        ValueError: if a target table cannot be reached from the base table.
+    """
+    # The foreign keys between the same two tables form a single key (more columns)
+    dic_links = {}
+    for table_name, column, foreign_table, foreign_column in list_edges:
+        link = dic_links.setdefault((table_name, foreign_table), ([], []))
+        link[0].append(column)
+        link[1].append(foreign_column)
+    dic_neighbours = {}
+    for (table_name, foreign_table), (list_cols, list_foreign_cols) in dic_links.items():
+        dic_neighbours.setdefault(table_name, []).append((foreign_table, list_cols, list_foreign_cols, False))
+    for (table_name, foreign_table), (list_cols, list_foreign_cols) in dic_links.items():
+        dic_neighbours.setdefault(foreign_table, []).append((table_name, list_foreign_cols, list_cols, True))
+
+    dic_parent = {base_table: None}
+    visit = deque([base_table])
+    while len(visit) > 0:
+        table_name = visit.popleft()
+        for next_table, list_left, list_right, one_to_many in dic_neighbours.get(table_name, []):
+            if next_table not in dic_parent:
+                dic_parent[next_table] = {'table': next_table, 'parent': table_name, 'left_keys': list_left, 'right_keys': list_right, 'one_to_many': one_to_many}
+                visit.append(next_table)
+
+    list_steps = []
+    for target in list_targets:
+        if target not in dic_parent:
+            raise ValueError(f"Table '{target}' cannot be reached from '{base_table}' with the foreign keys")
+        list_path = []
+        while dic_parent[target] is not None and dic_parent[target] not in list_steps:
+            list_path.append(dic_parent[target])
+            target = dic_parent[target]['parent']
+        list_steps.extend(reversed(list_path))
+    return list_steps
+
+def key_values(df: pd.DataFrame, list_cols: list) -> pd.Series:
+    """
+    Returns the join key of each row: the value of the key column or the values of the key columns joined (empty values are missing keys).
+
+    Parameters:
+        df (pd.DataFrame): The dataframe (text columns).
+        list_cols (list): The key columns.
+
+    Returns:
+        pd.Series: the keys (None for the rows without a key).
+    """
+    keys = df[list_cols[0]]
+    missing = keys == ""
+    for col in list_cols[1:]:
+        keys = keys + KEY_SEP + df[col]
+        missing = missing | (df[col] == "")
+    return keys.where(~missing, None)
+
+def key_index_build(df: pd.DataFrame, list_keys: list, first_only: bool = False) -> dict:
+    """
+    Builds a hash index on the key columns of a table: the distinct keys (hash table of pd.Index) and, for each key, the positions of its rows, stored one key after the other (the rows sorted by key code).
+
+    Parameters:
+        df (pd.DataFrame): The table (text columns).
+        list_keys (list): The key columns.
+        first_only (bool, optional): Only the first row of a duplicated key is indexed (lookup). Defaults to False.
+
+    Returns:
+        dict: the index.
+    """
+    codes, uniques = pd.factorize(key_values(df, list_keys), use_na_sentinel=True)
+    rows_valid = np.flatnonzero(codes >= 0)
+    order = rows_valid[np.argsort(codes[rows_valid], kind="stable")]
+    counts = np.bincount(codes[rows_valid], minlength=len(uniques))
+    offsets = np.cumsum(counts) - counts
+    if first_only:
+        # The stable sort keeps the rows of a key in the table order: the offset of a key is its first row
+        counts = np.minimum(counts, 1)
+    index = {
+        'keys': pd.Index(uniques),
+        'order': order,
+        'counts': counts,
+        'offsets': offsets,
+        'unique': bool(len(counts) == 0 or counts.max() <= 1)
+    }
+    return index
+
+def key_index_probe(index: dict, probe_keys: pd.Series) -> tuple:
+    """
+    Looks up the keys of the probe rows in a hash index (left join): a probe row is repeated for each matching row and kept once without a match.
+
+    Parameters:
+        index (dict): The index (see key_index_build).
+        probe_keys (pd.Series): The keys of the probe rows.
+
+    Returns:
+        tuple: the positions of the probe rows and of the matching rows (-1 without a match).
+    """
+    codes = index['keys'].get_indexer(probe_keys.to_numpy(dtype=object))
+    if len(index['order']) == 0:
+        return np.arange(len(codes)), np.full(len(codes), -1)
+    matches = np.where(codes >= 0, index['counts'][codes], 0)
+    starts = np.where(codes >= 0, index['offsets'][codes], 0)
+    if index['unique']:
+        return np.arange(len(codes)), np.where(matches > 0, index['order'][starts], -1)
+    repeats = np.maximum(matches, 1)
+    probe_pos = np.repeat(np.arange(len(codes)), repeats)
+    # Position of each output row among the rows of its probe row
+    within = np.arange(len(probe_pos)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    has_match = np.repeat(matches, repeats) > 0
+    build_pos = np.full(len(probe_pos), -1)
+    build_pos[has_match] = index['order'][(np.repeat(starts, repeats) + within)[has_match]]
+    return probe_pos, build_pos
+
+def df_join_index(df_left: pd.DataFrame, list_left_keys: list, df_right: pd.DataFrame, index: dict, list_right_cols: list) -> tuple:
+    """
+    Joins a block of rows to a table with a hash index on its key (left join): the columns of the table are added, empty for the rows without a match.
+
+    Parameters:
+        df_left (pd.DataFrame): The block of rows.
+        list_left_keys (list): The key columns of the block.
+        df_right (pd.DataFrame): The table.
+        index (dict): The index of the table (see key_index_build).
+        list_right_cols (list): The columns of the table to be added.
+
+    Returns:
+        tuple: the joined rows and the number of rows of the block without a match.
+    """
+    probe_pos, build_pos = key_index_probe(index, key_values(df_left, list_left_keys))
+    df_joined = df_left.iloc[probe_pos].reset_index(drop=True)
+    no_match = build_pos < 0
+    for col in list_right_cols:
+        values = np.full(len(build_pos), "", dtype=object)
+        values[~no_match] = df_right[col].to_numpy(dtype=object)[build_pos[~no_match]]
+        df_joined[col] = values
+    rows_no_match = int(np.count_nonzero(no_match))
+    return df_joined, rows_no_match
+
+def table_chunks(path_csv: Path, dic_schema: dict, list_cols: list, csv_sep: str, chunk_rows: int = None):
+    """
+    Reads some columns of a cleaned table file as text (values as written, empty for missing values), in blocks of rows. The columns are matched by position with the table schema, as in the database load, and renamed 'table.column'.
+
+    Parameters:
+        path_csv (Path): The CSV file (with header).
+        dic_schema (dict): The table schema.
+        list_cols (list): The columns to be read.
+        csv_sep (str): The CSV separator.
+        chunk_rows (int, optional): Rows of each block (None = the whole file in a block).
+
+    Returns:
+        generator: the blocks of rows.
+    """
+    table_name = dic_schema['table_name']
+    df_iter = pd.read_csv(path_csv, sep=csv_sep, header=0, names=list(dic_schema['columns']), usecols=list_cols, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    for df_chunk in ([df_iter] if chunk_rows is None else df_iter):
+        yield df_chunk[list_cols].rename(columns=lambda col: f"{table_name}.{col}")
+
+def df_partitions_write(df_iter, list_keys: list, dir_parts: Path, num_partitions: int, csv_sep: str) -> list:
+    """
+    Writes blocks of rows to partition files by the hash of the key, so that the rows with the same key are in the same partition.
+
+    Parameters:
+        df_iter: The blocks of rows.
+        list_keys (list): The key columns.
+        dir_parts (Path): The directory of the partition files.
+        num_partitions (int): The number of partitions.
+        csv_sep (str): The CSV separator.
+
+    Returns:
+        list: the columns of the rows.
+    """
+    dir_parts.mkdir(parents=True, exist_ok=True)
+    list_cols = []
+    for df_chunk in df_iter:
+        list_cols = list(df_chunk.columns)
+        hashes = pd.util.hash_pandas_object(key_values(df_chunk, list_keys).fillna(""), index=False).to_numpy()
+        partitions = (hashes % np.uint64(num_partitions)).astype(np.intp)
+        for partition in np.unique(partitions):
+            path_part = dir_parts / f"part_{partition:04d}.csv"
+            df_chunk[partitions == partition].to_csv(path_part, sep=csv_sep, index=False, mode="a", header=not path_part.exists())
+    return list_cols
+
+def partition_read(dir_parts: Path, partition: int, list_cols: list, csv_sep: str) -> pd.DataFrame:
+    """
+    Reads a partition file (an empty dataframe if the partition has no rows).
+
+    Parameters:
+        dir_parts (Path): The directory of the partition files.
+        partition (int): The partition.
+        list_cols (list): The columns of the partition files.
+        csv_sep (str): The CSV separator.
+
+    Returns:
+        pd.DataFrame: the rows of the partition.
+    """
+    path_part = dir_parts / f"part_{partition:04d}.csv"
+    if not path_part.exists():
+        return pd.DataFrame({col: pd.Series(dtype=object) for col in list_cols})
+    return pd.read_csv(path_part, sep=csv_sep, dtype=str, keep_default_na=False)
+
+def join_hash(df_iter, step: dict, df_table: pd.DataFrame, dic_no_match: dict):
+    """
+    Joins blocks of rows to a table kept in memory, with a hash index on its key built once. A lookup (join following a foreign key) keeps the first row of a duplicated key, so it never adds rows.
+
+    Parameters:
+        df_iter: The blocks of rows.
+        step (dict): The join (see join_plan).
+        df_table (pd.DataFrame): The joined table.
+        dic_no_match (dict): Rows without a match of each joined table (updated).
+
+    Returns:
+        generator: the joined blocks of rows.
+    """
+    index = key_index_build(df_table, [f"{step['table']}.{col}" for col in step['right_keys']], not step['one_to_many'])
+    list_left_keys = [f"{step['parent']}.{col}" for col in step['left_keys']]
+    for df_chunk in df_iter:
+        df_joined, no_match = df_join_index(df_chunk, list_left_keys, df_table, index, list(df_table.columns))
+        dic_no_match[step['table']] += no_match
+        yield df_joined
+
+def join_partitioned(df_iter, step: dict, table_iter, dir_parts: Path, num_partitions: int, csv_sep: str, dic_no_match: dict):
+    """
+    Joins blocks of rows to a table larger than the memory (grace hash join): both sides are written to partition files by the hash of the key, then each partition of the table is indexed and joined to the same partition of the rows. As in join_hash, a lookup keeps the first row of a duplicated key.
+
+    Parameters:
+        df_iter: The blocks of rows.
+        step (dict): The join (see join_plan).
+        table_iter: The blocks of rows of the joined table.
+        dir_parts (Path): The directory of the partition files.
+        num_partitions (int): The number of partitions.
+        csv_sep (str): The CSV separator.
+        dic_no_match (dict): Rows without a match of each joined table (updated).
+
+    Returns:
+        generator: the joined rows, a partition at a time.
+    """
+    list_left_keys = [f"{step['parent']}.{col}" for col in step['left_keys']]
+    list_right_keys = [f"{step['table']}.{col}" for col in step['right_keys']]
+    dir_left, dir_right = dir_parts / f"{step['table']}_left", dir_parts / f"{step['table']}_right"
+    df_partitions_write(df_iter, list_left_keys, dir_left, num_partitions, csv_sep)
+    list_right_cols = df_partitions_write(table_iter, list_right_keys, dir_right, num_partitions, csv_sep)
+    for partition in range(num_partitions):
+        path_left = dir_left / f"part_{partition:04d}.csv"
+        if not path_left.exists():
+            continue
+        df_left = pd.read_csv(path_left, sep=csv_sep, dtype=str, keep_default_na=False)
+        df_right = partition_read(dir_right, partition, list_right_cols, csv_sep)
+        df_joined, no_match = df_join_index(df_left, list_left_keys, df_right, key_index_build(df_right, list_right_keys, not step['one_to_many']), list_right_cols)
+        dic_no_match[step['table']] += no_match
+        yield df_joined
+
+def view_columns(dic_columns: dict) -> list:
+    """
+    Names the columns of a view: the column name, or 'table.column' if more tables of the view have a column with that name.
+
+    Parameters:
+        dic_columns (dict): The columns of each table of the view.
+
+    Returns:
+        list: tuples (table, column, name in the view).
+    """
+    list_all = [(table_name, col) for table_name, list_cols in dic_columns.items() for col in list_cols]
+    list_names = [col for _, col in list_all]
+    return [(table_name, col, col if list_names.count(col) == 1 else f"{table_name}.{col}") for table_name, col in list_all]
+
+def view_plan(view_name: str, dic_view: dict, dic_schemas: dict, list_edges: list) -> tuple:
+    """
+    Plans a view: the joins from the base table (see join_plan) and the columns read from each table (the view columns and the join keys).
+
+    Parameters:
+        view_name (str): The view name.
+        dic_view (dict): The view configuration: 'base' (base table) and 'columns' (columns of each table).
+        dic_schemas (dict): The table schemas (see table_schemas_read).
+        list_edges (list): The foreign keys (see foreign_key_edges).
+
+    Returns:
+        tuple: the joins, the columns read from each table and the view columns (see view_columns).
+
+    Raises:
+        ValueError: if a table of the view has no schema, a column is not in its schema or a table cannot be reached.
+    """
+    base_table = dic_view['base']
+    dic_columns = {table_name: list(list_cols or []) for table_name, list_cols in dic_view['columns'].items()}
+    for table_name, list_cols in dic_columns.items():
+        if table_name not in dic_schemas:
+            raise ValueError(f"View '{view_name}': table '{table_name}' has no schema in the SQL tables directory")
+        list_unknown = [col for col in list_cols if col not in dic_schemas[table_name]['columns']]
+        if len(list_unknown) > 0:
+            raise ValueError(f"View '{view_name}': columns not in table '{table_name}': {list_unknown}")
+    list_steps = join_plan(base_table, [table_name for table_name in dic_columns if table_name != base_table], list_edges)
+    for step in list_steps:
+        if step['table'] not in dic_schemas:
+            raise ValueError(f"View '{view_name}': table '{step['table']}' (joined to '{step['parent']}') has no schema in the SQL tables directory")
+
+    dic_read = {table_name: [] for table_name in [base_table] + [step['table'] for step in list_steps]}
+    for table_name, list_cols in dic_columns.items():
+        dic_read[table_name].extend(list_cols)
+    for step in list_steps:
+        dic_read[step['parent']].extend(step['left_keys'])
+        dic_read[step['table']].extend(step['right_keys'])
+    dic_read = {table_name: list(dict.fromkeys(list_cols)) for table_name, list_cols in dic_read.items()}
+    return list_steps, dic_read, view_columns(dic_columns)
+
+def view_build(view_name: str, dic_view: dict, dic_schemas: dict, list_edges: list, import_dir: str, path_out: Path, csv_sep: str = ";", chunk_rows: int = 500_000, build_max_mb: int = 512, spill_dir: str = None, spill_partitions: int = 32) -> dict:
+    """
+    Builds a denormalised view: the base table is read in blocks of rows and joined to the other tables on the foreign keys (see join_plan), then the view columns are written to a CSV file. A joined table not larger than build_max_mb is kept in memory with a hash index on its key (see join_hash); a larger one is joined by partitions on disk (see join_partitioned). The rows keep the order of the base table, except after a join by partitions.
+
+    Parameters:
+        view_name (str): The view name.
+        dic_view (dict): The view configuration: 'base' (base table) and 'columns' (columns of each table).
+        dic_schemas (dict): The table schemas (see table_schemas_read).
+        list_edges (list): The foreign keys (see foreign_key_edges).
+        import_dir (str): The directory of the cleaned table files.
+        path_out (Path): The CSV file of the view.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+        chunk_rows (int): Rows of the base table joined at a time.
+        build_max_mb (int): Largest table file (MB) joined in memory.
+        spill_dir (str, optional): Directory of the partition files (default: the directory of the view).
+        spill_partitions (int): Number of partitions of a join by partitions.
+
+    Returns:
+        dict: the result (view, rows, seconds, joins with their method and rows without a match).
+    """
+    time_start = perf_counter()
+    list_steps, dic_read, list_view_cols = view_plan(view_name, dic_view, dic_schemas, list_edges)
+    dic_paths = {table_name: Path(import_dir) / dic_schemas[table_name]['import_file'] for table_name in dic_read}
+    dir_parts = Path(spill_dir or path_out.parent) / f"_{view_name}_parts"
+    shutil.rmtree(dir_parts, ignore_errors=True)
+
+    # The joins are chained: each block of rows goes through the joins in memory, a join by partitions first reads all the rows it receives
+    dic_no_match = {step['table']: 0 for step in list_steps}
+    base_table = dic_view['base']
+    df_iter = table_chunks(dic_paths[base_table], dic_schemas[base_table], dic_read[base_table], csv_sep, chunk_rows)
+    for step in list_steps:
+        table_name = step['table']
+        step['method'] = "hash" if dic_paths[table_name].stat().st_size <= build_max_mb * 2**20 else "partitioned"
+        table_iter = table_chunks(dic_paths[table_name], dic_schemas[table_name], dic_read[table_name], csv_sep, None if step['method'] == "hash" else chunk_rows)
+        if step['method'] == "hash":
+            df_iter = join_hash(df_iter, step, next(table_iter), dic_no_match)
+        else:
+            df_iter = join_partitioned(df_iter, step, table_iter, dir_parts, spill_partitions, csv_sep, dic_no_match)
+
+    list_cols_in = [f"{table_name}.{col}" for table_name, col, _ in list_view_cols]
+    list_cols_out = [name for _, _, name in list_view_cols]
+    rows_num = 0
+    try:
+        with open(path_out, "w", newline="", encoding="utf-8") as fp:
+            pd.DataFrame(columns=list_cols_out).to_csv(fp, sep=csv_sep, index=False)
+            for df_chunk in df_iter:
+                df_chunk = df_chunk[list_cols_in]
+                df_chunk.columns = list_cols_out
+                df_chunk.to_csv(fp, sep=csv_sep, index=False, header=False)
+                rows_num += len(df_chunk)
+    finally:
+        shutil.rmtree(dir_parts, ignore_errors=True)
+
+    list_joins = [{'table': step['table'], 'joined_to': step['parent'], 'keys': ", ".join(step['right_keys']), 'one_to_many': step['one_to_many'], 'method': step['method'], 'rows_without_match': dic_no_match[step['table']]} for step in list_steps]
+    return {'view_name': view_name, 'rows': rows_num, 'sec': round(perf_counter() - time_start, 3), 'joins': list_joins}
@@ -0,0 +1,216 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from utility_manager.csv_reader import csv_encoding, csv_arrow_options
+from utility_manager.duplicates import series_hashes
+
+PARTITION_FILE_NAME = "part-{i}.parquet"
+PARTITION_NULL = "__HIVE_DEFAULT_PARTITION__" # directory of the rows without a partition value
+
+def csv_batches(path_data: Path, list_col_kept: list, list_col_type: dict, csv_sep: str = ";"):
+    """
+    Reads a CSV file with the Arrow parser one block of rows at a time, with the types of the C engine (see csv_arrow_options); if a column would be read as boolean, all the columns not configured are read as text.
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+        list_col_kept (list): the columns to be parsed, in the order of the file.
+        list_col_type (dict): columns type (only text and numbers).
+        csv_sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+
+    Returns:
+        generator: the record batches.
+    """
+    encoding = csv_encoding(path_data)
+    arrow_options = csv_arrow_options(path_data, list_col_kept, list_col_type, csv_sep, encoding)
+    if arrow_options is None:
+        arrow_options = csv_arrow_options(path_data, list_col_kept, {col: list_col_type.get(col, "object") for col in list_col_kept}, csv_sep, encoding)
+    read_options, parse_options, convert_options = arrow_options
+    with pa_csv.open_csv(path_data, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+        for batch in reader:
+            yield batch
+
+def partition_value_array(values: pa.Array) -> pa.Array:
+    """
+    Prepares the values of a partition column: decimals without a fractional part (e.g. the years read as 2016.0 because of empty values) become integers, so that the directory is 'anno_pubblicazione=2016'.
+
+    Parameters:
+        values (pa.Array): The values.
+
+    Returns:
+        pa.Array: the partition values.
+    """
+    if pa.types.is_floating(values.type):
+        return pc.cast(values, pa.int64())
+    if pa.types.is_null(values.type):
+        return values.cast(pa.string())
+    return values
+
+def partition_lookup_init(list_partition_cols: list) -> dict:
+    """
+    Creates the lookup of the partition of each key of the main table: the 64-bit fingerprints of the keys (see series_hashes) and, for each partition column, the code of the value of each key (the distinct values are kept once).
+
+    Parameters:
+        list_partition_cols (list): The partition columns.
+
+    Returns:
+        dict: the lookup (filled by partition_lookup_add, then sorted by partition_lookup_close).
+    """
+    return {'list_hashes': [], 'cols': {col: {'codes': [], 'values': {}} for col in list_partition_cols}, 'types': {}}
+
+def partition_lookup_add(lookup: dict, keys: pa.Array, dic_values: dict) -> None:
+    """
+    Adds to the lookup the keys of a block of rows of the main table and their partition values (rows without a key are skipped).
+
+    Parameters:
+        lookup (dict): The lookup (see partition_lookup_init).
+        keys (pa.Array): The keys.
+        dic_values (dict): The partition values of each column (see partition_value_array).
+
+    Returns:
+        None
+    """
+    mask_valid = pc.is_valid(keys).to_numpy(zero_copy_only=False)
+    lookup['list_hashes'].append(series_hashes(keys.to_pandas())[mask_valid])
+    for col, values in dic_values.items():
+        dic_col = lookup['cols'][col]
+        lookup['types'][col] = values.type
+        encoded = pc.dictionary_encode(values)
+        dic_codes = dic_col['values']
+        global_codes = np.array([dic_codes.setdefault(value, len(dic_codes)) for value in encoded.dictionary.to_pylist()] + [-1], dtype=np.int32)
+        indices = encoded.indices.fill_null(len(global_codes) - 1).to_numpy()
+        dic_col['codes'].append(global_codes[indices][mask_valid])
+
+def partition_lookup_close(lookup: dict) -> dict:
+    """
+    Sorts the lookup by key fingerprint, to be probed with a binary search (see partition_lookup_probe). If a key is duplicated, its first row is kept.
+
+    Parameters:
+        lookup (dict): The lookup (see partition_lookup_add).
+
+    Returns:
+        dict: the sorted lookup.
+    """
+    hashes = np.concatenate(lookup['list_hashes']) if len(lookup['list_hashes']) > 0 else np.array([], dtype=np.uint64)
+    order = np.argsort(hashes, kind="stable")
+    hashes = hashes[order]
+    first = np.concatenate([[True], hashes[1:] != hashes[:-1]]) if len(hashes) > 0 else np.array([], dtype=bool)
+    dic_cols = {}
+    for col, dic_col in lookup['cols'].items():
+        codes = np.concatenate(dic_col['codes']) if len(dic_col['codes']) > 0 else np.array([], dtype=np.int32)
+        dic_cols[col] = {'codes': codes[order][first], 'values': pa.array(list(dic_col['values']), type=lookup['types'].get(col, pa.string()))}
+    return {'hashes': hashes[first], 'cols': dic_cols}
+
+def partition_lookup_probe(lookup: dict, keys: pa.Array) -> tuple:
+    """
+    Looks up the partition values of the keys of a block of rows of a child table.
+
+    Parameters:
+        lookup (dict): The sorted lookup (see partition_lookup_close).
+        keys (pa.Array): The keys.
+
+    Returns:
+        tuple: the partition values of each column (null for the keys not found) and the number of rows without a match.
+    """
+    hashes = series_hashes(keys.to_pandas())
+    found = pc.is_valid(keys).to_numpy(zero_copy_only=False)
+    pos = np.zeros(len(hashes), dtype=np.int64)
+    if len(lookup['hashes']) > 0:
+        pos = np.minimum(np.searchsorted(lookup['hashes'], hashes), len(lookup['hashes']) - 1)
+        found = found & (lookup['hashes'][pos] == hashes)
+    else:
+        found = np.zeros(len(hashes), dtype=bool)
+    dic_values = {}
+    for col, dic_col in lookup['cols'].items():
+        codes = dic_col['codes'][pos] if len(dic_col['codes']) > 0 else np.zeros(len(hashes), dtype=np.int32)
+        codes = np.where(found, codes, -1)
+        dic_values[col] = dic_col['values'].take(pa.array(codes, mask=codes < 0))
+    return dic_values, int((~found).sum())
+
+def dataset_write(batches, dataset_dir: Path, list_partition_cols: list, row_group_rows: int = 100_000, row_group_min_rows: int = 10_000, compression: str = "zstd") -> None:
+    """
+    Writes record batches as a Parquet dataset partitioned by columns (hive layout: 'col=value' directories), with the statistics (min, max, nulls) of each row group. The previous dataset is removed. The rows of each partition are buffered until row_group_min_rows, so the memory used is at most the partitions times that number of rows.
+
+    Parameters:
+        batches (iterable): The record batches (same schema, the partition columns included).
+        dataset_dir (Path): The directory of the dataset.
+        list_partition_cols (list): The partition columns.
+        row_group_rows (int): Maximum rows of a row group.
+        row_group_min_rows (int): Rows of a partition buffered before a row group is written.
+        compression (str): The Parquet compression.
+
+    Returns:
+        None
+    """
+    batch_iter = iter(batches)
+    batch_first = next(batch_iter, None)
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    if batch_first is None:
+        return
+
+    def batches_all():
+        yield batch_first
+        yield from batch_iter
+
+    schema = batch_first.schema
+    partitioning = ds.partitioning(pa.schema([schema.field(col) for col in list_partition_cols]), flavor="hive")
+    file_options = ds.ParquetFileFormat().make_write_options(compression=compression, write_statistics=True)
+    ds.write_dataset(batches_all(), dataset_dir, schema=schema, format="parquet", partitioning=partitioning, file_options=file_options, basename_template=PARTITION_FILE_NAME,
+                     max_rows_per_group=row_group_rows, min_rows_per_group=min(row_group_min_rows, row_group_rows), existing_data_behavior="delete_matching")
+
+def dataset_open(dataset_dir: Path) -> ds.Dataset:
+    """
+    Opens a partitioned Parquet dataset (see dataset_write): nothing is read until a scan, and the partition columns are read from the directory names.
+
+    Parameters:
+        dataset_dir (Path): The directory of the dataset.
+
+    Returns:
+        ds.Dataset: the dataset.
+    """
+    return ds.dataset(dataset_dir, format="parquet", partitioning=ds.HivePartitioning.discover(infer_dictionary=False, null_fallback=PARTITION_NULL))
+
+def dataset_read(dataset_dir: Path, filters: list = None, columns: list = None) -> pa.Table:
+    """
+    Reads the rows of a partitioned dataset matching the filters: the partitions excluded by the filters on the partition columns are not opened (pruning) and the row groups whose statistics exclude the filters on the other columns are not read (predicate pushdown).
+
+    Parameters:
+        dataset_dir (Path): The directory of the dataset.
+        filters (list, optional): The filters, as in pq.read_table, e.g. [("anno_pubblicazione", "=", 2020), ("importo", ">", 1000)] (if None, all the rows).
+        columns (list, optional): The columns to be read (if None, all).
+
+    Returns:
+        pa.Table: the rows read.
+    """
+    expression = pq.filters_to_expression(filters) if filters else None
+    return dataset_open(dataset_dir).to_table(filter=expression, columns=columns)
+
+def dataset_scan_size(dataset_dir: Path, filters: list = None) -> dict:
+    """
+    Computes the files and bytes of a partitioned dataset left after the partition pruning of the filters, to be compared with the whole dataset.
+
+    Parameters:
+        dataset_dir (Path): The directory of the dataset.
+        filters (list, optional): The filters (see dataset_read).
+
+    Returns:
+        dict: the files, bytes and partitions of the dataset and the ones left by the filters.
+    """
+    dataset = dataset_open(dataset_dir)
+    expression = pq.filters_to_expression(filters) if filters else None
+    list_all = [Path(fragment.path) for fragment in dataset.get_fragments()]
+    list_scan = [Path(fragment.path) for fragment in dataset.get_fragments(filter=expression)] if expression is not None else list_all
+    return {
+        'partitions': len({path_file.parent for path_file in list_all}),
+        'files': len(list_all),
+        'bytes': sum(path_file.stat().st_size for path_file in list_all),
+        'partitions_scan': len({path_file.parent for path_file in list_scan}),
+        'files_scan': len(list_scan),
+        'bytes_scan': sum(path_file.stat().st_size for path_file in list_scan)
+    }
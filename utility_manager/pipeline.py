@@ -0,0 +1,130 @@
+import queue
+import threading
+from time import perf_counter
+
+PIPELINE_END = object() # marks the end of the items of a queue
+
+def run_tasks_prefetched(func, list_tasks: list, func_read, list_read_tasks: list, depth: int = 1) -> list:
+    """
+    Runs tasks one at a time in this thread while a reader thread runs, in order, the reads of the next tasks (e.g. parses file N+1 while file N is analysed): each task is called as func(*task, (read result, read seconds)). A read starts only when there is a free slot, so at most depth + 1 read results are alive at once (the one of the running task and depth read ahead). With depth 0 each read runs just before its task, in this thread.
+
+    Parameters:
+        func (callable): The function of the tasks (the read result is its last argument).
+        list_tasks (list): The arguments of each task (tuples).
+        func_read (callable): The read function.
+        list_read_tasks (list): The arguments of the read of each task (tuples, same order as list_tasks).
+        depth (int): Reads run ahead of the running task. Defaults to 1.
+
+    Returns:
+        list: the results of the tasks, in the order of the tasks.
+
+    Raises:
+        Exception: the first error raised by a read or by a task (the reader thread is stopped).
+    """
+    if depth <= 0:
+        list_results = []
+        for task, read_task in zip(list_tasks, list_read_tasks):
+            time_start = perf_counter()
+            read_result = func_read(*read_task)
+            list_results.append(func(*task, (read_result, perf_counter() - time_start)))
+        return list_results
+
+    slots = threading.Semaphore(depth + 1)
+    stop = threading.Event()
+    results = queue.Queue()
+
+    def reader() -> None:
+        for read_task in list_read_tasks:
+            slots.acquire()
+            if stop.is_set():
+                return
+            time_start = perf_counter()
+            try:
+                read_result = func_read(*read_task)
+            except BaseException as exc:
+                results.put((PIPELINE_END, exc))
+                return
+            results.put((read_result, perf_counter() - time_start))
+
+    thread = threading.Thread(target=reader, name="prefetch", daemon=True)
+    thread.start()
+    list_results = []
+    try:
+        for task in list_tasks:
+            read_result, read_info = results.get()
+            if read_result is PIPELINE_END:
+                raise read_info
+            list_results.append(func(*task, (read_result, read_info)))
+            # The result of the read is released before its slot, so that the next read does not raise the peak
+            read_result = None
+            slots.release()
+    finally:
+        stop.set()
+        slots.release()
+        thread.join()
+    return list_results
+
+def queue_worker_start(func, depth: int) -> dict:
+    """
+    Starts a background thread that calls func(*args) for each item put in its queue (see queue_worker_put), in the order of submission. The queue holds at most depth items: while the thread is behind, queue_worker_put waits (backpressure), so the items waiting never exceed depth.
+
+    Parameters:
+        func (callable): The function called for each item (e.g. the write of a block to a file).
+        depth (int): The maximum number of items waiting.
+
+    Returns:
+        dict: the worker.
+    """
+    worker = {'queue': queue.Queue(maxsize=max(1, depth)), 'errors': []}
+
+    def consumer() -> None:
+        while True:
+            args = worker['queue'].get()
+            if args is PIPELINE_END:
+                return
+            if len(worker['errors']) == 0:
+                # After an error the items are only drained, so that queue_worker_put never waits forever
+                try:
+                    func(*args)
+                except BaseException as exc:
+                    worker['errors'].append(exc)
+
+    worker['thread'] = threading.Thread(target=consumer, name="queue_worker", daemon=True)
+    worker['thread'].start()
+    return worker
+
+def queue_worker_put(worker: dict, *args) -> None:
+    """
+    Puts an item in the queue of a worker, waiting while the queue is full.
+
+    Parameters:
+        worker (dict): The worker (see queue_worker_start).
+        *args: The arguments of the call.
+
+    Returns:
+        None
+
+    Raises:
+        Exception: the error raised by a previous item, if any.
+    """
+    if len(worker['errors']) > 0:
+        raise worker['errors'][0]
+    worker['queue'].put(args)
+
+def queue_worker_close(worker: dict) -> None:
+    """
+    Waits until all the items of a worker are processed and stops its thread.
+
+    Parameters:
+        worker (dict): The worker (see queue_worker_start).
+
+    Returns:
+        None
+
+    Raises:
+        Exception: the first error raised by an item, if any.
+    """
+    worker['queue'].put(PIPELINE_END)
+    worker['thread'].join()
+    if len(worker['errors']) > 0:
+        raise worker['errors'][0]
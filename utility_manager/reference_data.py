@@ -0,0 +1,196 @@
+import codecs
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from utility_manager.cache_manager import file_content_hash
+from utility_manager.schema_inference import REGEX_INT_LEADING_ZERO, dtype_kind
+from utility_manager.stats_incremental import stats_conf_hash
+
+REF_FORMAT_VERSION = 2 # changes when the typed tables are built in a different way (the saved ones are rebuilt)
+REF_FILE_TYPE = "feather"
+REF_ENCODINGS = ["utf-8", "cp1252", "latin-1"] # tried in this order (latin-1 decodes any byte)
+REF_DECODE_BLOCK_SIZE = 1024 * 1024
+REF_DECODE_PREFIX_SIZE = 4 * 1024 * 1024 # bytes decoded to detect the encoding of a file (the readers detect it again on the whole file after a decode error)
+REF_NA_VALUES = ["N.d.", "n.d.", "-"] # missing-value markers of the ISTAT and BDAP files (empty values in the numeric columns)
+REGEX_IT_INT = r"[+-]?(\d{1,3}(\.\d{3})+|\d+)" # 2.562 or 315
+REGEX_IT_DECIMAL = r"[+-]?(\d{1,3}(\.\d{3})+|\d+),\d+" # 1.234,5 or 13,29
+
+def file_encoding_detect(path_file: Path, prefix_size: int = REF_DECODE_PREFIX_SIZE) -> str:
+    """
+    Detects the encoding of a text file: UTF-8 with BOM, UTF-8 or the first encoding of REF_ENCODINGS that decodes the first bytes. The bytes are decoded in blocks (incremental decoder), so the file is never loaded in memory.
+
+    Parameters:
+        path_file (Path): The path of the file.
+        prefix_size (int, optional): The bytes decoded (0 = the whole file). Defaults to REF_DECODE_PREFIX_SIZE.
+
+    Returns:
+        str: the encoding, as accepted by open() and pandas ('utf-8-sig' if the file starts with a BOM).
+    """
+    with open(path_file, "rb") as fp:
+        if fp.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            return "utf-8-sig"
+    for encoding in REF_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path_file, "rb") as fp:
+                bytes_read = 0
+                for block in iter(lambda: fp.read(REF_DECODE_BLOCK_SIZE), b""):
+                    decoder.decode(block)
+                    bytes_read += len(block)
+                    if prefix_size > 0 and bytes_read >= prefix_size:
+                        break
+                else:
+                    # A character cut at the end of the prefix is not an error
+                    decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return REF_ENCODINGS[-1]
+
+def italian_number_kind(values: pd.Series) -> str:
+    """
+    Checks whether all the non-empty values of a text column are numbers in the Italian format (dot as thousands separator, comma as decimal separator), e.g. '2.562' or '13,29'. Codes with leading zeros (e.g. '01', '001001') are not numbers.
+
+    Parameters:
+        values (pd.Series): The values (strings, empty for missing values).
+
+    Returns:
+        str: 'int', 'float' or None (not a numeric column, or only empty values).
+    """
+    values = values[values != ""]
+    if len(values) == 0:
+        return None
+    if values.str.contains(REGEX_INT_LEADING_ZERO, regex=True).any():
+        return None
+    is_int = values.str.fullmatch(REGEX_IT_INT)
+    if is_int.all():
+        return "int"
+    if (is_int | values.str.fullmatch(REGEX_IT_DECIMAL)).all():
+        return "float"
+    return None
+
+def italian_number_parse(values: pd.Series, kind: str) -> pd.Series:
+    """
+    Converts the numbers in the Italian format of a text column (see italian_number_kind): the thousands separators are removed and the decimal comma becomes a dot, for all the values at once.
+
+    Parameters:
+        values (pd.Series): The values (strings, empty for missing values).
+        kind (str): 'int' or 'float'.
+
+    Returns:
+        pd.Series: the numbers, 'Int64' or 'Float64' (missing values as NA).
+    """
+    values = values.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    values = values.where(values != "", None)
+    return pd.to_numeric(values).astype("Int64" if kind == "int" else "Float64")
+
+def ref_paths(ref_dir: str, file_name: str) -> tuple:
+    """
+    Returns the files of the typed table of a reference file: the table (Feather) and its manifest (JSON).
+
+    Parameters:
+        ref_dir (str): The directory of the typed tables.
+        file_name (str): The name of the source CSV file.
+
+    Returns:
+        tuple: the path of the table and the path of the manifest.
+    """
+    file_stem = Path(file_name).stem
+    return Path(ref_dir) / f"{file_stem}.{REF_FILE_TYPE}", Path(ref_dir) / f"{file_stem}.json"
+
+def ref_table_build(path_data: Path, encoding: str, list_col_exc: list, list_col_type: dict, dict_rename_col: dict, list_keys: list, csv_sep: str = ";") -> tuple:
+    """
+    Reads a reference file (ISTAT, BDAP) as text and types it: the columns are renamed, the numbers in the Italian format become 'Int64' or 'Float64' (the markers of REF_NA_VALUES become missing values; columns configured as text are not converted) and the rows are sorted by key.
+
+    Parameters:
+        path_data (Path): The path of the CSV file.
+        encoding (str): The encoding of the file (see file_encoding_detect).
+        list_col_exc (list): columns to be excluded.
+        list_col_type (dict): columns type.
+        dict_rename_col (dict): columns to be renamed (original name: new name).
+        list_keys (list): The key columns (new names).
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        tuple: the typed table and the names of the numeric columns with their kind.
+    """
+    df = pd.read_csv(path_data, sep=csv_sep, dtype=str, keep_default_na=False, encoding=encoding, low_memory=False)
+    df = df.drop(columns=[col for col in list_col_exc if col in df.columns])
+    dic_numeric = {}
+    for col in df.columns:
+        if dtype_kind(list_col_type.get(col)) == "text":
+            continue
+        values = df[col].where(~df[col].isin(REF_NA_VALUES), "")
+        kind = italian_number_kind(values)
+        if kind is not None:
+            df[col] = italian_number_parse(values, kind)
+            dic_numeric[col] = kind
+    df = df.rename(columns=dict_rename_col or {})
+    dic_numeric = {(dict_rename_col or {}).get(col, col): kind for col, kind in dic_numeric.items()}
+    list_keys = [key for key in list_keys if key in df.columns]
+    if len(list_keys) > 0:
+        df = df.sort_values(list_keys, kind="stable", ignore_index=True)
+    return df, dic_numeric
+
+def ref_table_update(od_dir: str, file_od: str, ref_dir: str, list_col_exc: list, list_col_type: dict, dict_rename_col: dict, list_keys: list, csv_sep: str = ";") -> tuple:
+    """
+    Returns the typed table of a reference file, built again only if the file or the configuration has changed since the last build. The manifest keeps the size, the modification time and the content hash of the file: if only the modification time has changed, the content hash decides (and the manifest is updated). The encoding is detected only when the table is built.
+
+    Parameters:
+        od_dir (str): The directory of the file.
+        file_od (str): The file name.
+        ref_dir (str): The directory of the typed tables.
+        list_col_exc (list): columns to be excluded.
+        list_col_type (dict): columns type.
+        dict_rename_col (dict): columns to be renamed (original name: new name).
+        list_keys (list): The key columns (new names).
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        tuple: the typed table, its manifest and True if it has been built again.
+    """
+    import pyarrow.feather as feather
+    path_data = Path(od_dir) / file_od
+    path_table, path_manifest = ref_paths(ref_dir, file_od)
+    file_stat = path_data.stat()
+    conf_hash = stats_conf_hash({'version': REF_FORMAT_VERSION, 'col_exc': sorted(list_col_exc), 'col_type': list_col_type, 'rename': dict_rename_col or {}, 'keys': list_keys, 'csv_sep': csv_sep})
+
+    if path_table.exists() and path_manifest.exists():
+        with open(path_manifest, "r") as fp:
+            dic_manifest = json.load(fp)
+        if dic_manifest['conf_hash'] == conf_hash and dic_manifest['size'] == file_stat.st_size:
+            is_same = dic_manifest['mtime_ns'] == file_stat.st_mtime_ns
+            if not is_same and dic_manifest['content_hash'] == file_content_hash(path_data):
+                # Only touched: the table is still valid
+                dic_manifest['mtime_ns'] = file_stat.st_mtime_ns
+                with open(path_manifest, "w") as fp:
+                    json.dump(dic_manifest, fp, indent=4)
+                is_same = True
+            if is_same:
+                return feather.read_table(path_table, memory_map=True).to_pandas(), dic_manifest, False
+
+    encoding = file_encoding_detect(path_data, 0)
+    df, dic_numeric = ref_table_build(path_data, encoding, list_col_exc, list_col_type, dict_rename_col, list_keys, csv_sep)
+    list_keys = [key for key in list_keys if key in df.columns]
+    dic_manifest = {
+        'file_name': file_od,
+        'size': file_stat.st_size,
+        'mtime_ns': file_stat.st_mtime_ns,
+        'content_hash': file_content_hash(path_data),
+        'conf_hash': conf_hash,
+        'encoding': encoding,
+        'rows': len(df),
+        'keys': list_keys,
+        'duplicated_keys': int(df.duplicated(subset=list_keys).sum()) if len(list_keys) > 0 else 0,
+        'numeric_columns': dic_numeric
+    }
+    path_table.parent.mkdir(parents=True, exist_ok=True)
+    # Uncompressed, so that the table can be memory mapped; written apart and then moved, so that a broken build is never read
+    path_tmp = path_table.with_suffix(".tmp")
+    feather.write_feather(df, path_tmp, compression="uncompressed")
+    path_tmp.replace(path_table)
+    with open(path_manifest, "w") as fp:
+        json.dump(dic_manifest, fp, indent=4)
+    return df, dic_manifest, True
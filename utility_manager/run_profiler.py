@@ -0,0 +1,158 @@
+import contextlib
+import cProfile
+import io
+import json
+import platform
+import pstats
+import resource
+import sys
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+import pandas as pd
+
+PROFILE_MODES = ["cprofile", "tracemalloc"]
+PROFILE_STAGES = ["read", "read_prefetch", "read_stats", "duckdb_stats", "ref_table", "copy", "dtype", "derived", "missing_stats", "distinct_stats", "cube_stats", "schema", "csv_write", "parquet_write", "xlsx_write", "xlsx_run_write", "sql_write", "store_write"] # order of the stage columns of the CSV report (other stages follow)
+PROFILE_TOP_LINES = 40 # functions (cProfile) or allocation lines (tracemalloc) listed in the text report
+TRACEMALLOC_FRAMES = 10 # frames kept for each allocation (tracemalloc)
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident memory of the current process.
+
+    Returns:
+        float: the peak resident memory in MB (ru_maxrss is in kilobytes on Linux, in bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def file_profile_init(file_name: str, size_bytes: int) -> dict:
+    """
+    Creates the profile of a file: the seconds of each stage (see profile_stage) and, at the end (see file_profile_end), the rows, the throughput and the peak memory.
+
+    Parameters:
+        file_name (str): The file name.
+        size_bytes (int): The size of the file.
+
+    Returns:
+        dict: the profile.
+    """
+    return {'file_name': file_name, 'bytes': size_bytes, 'rows': None, 'stages': {}, 'time_start': perf_counter()}
+
+@contextlib.contextmanager
+def profile_stage(profile: dict, stage: str):
+    """
+    Times a stage of a profile (the seconds are added to the ones of the stage, if it is repeated). With profile None nothing is timed.
+
+    Parameters:
+        profile (dict): The profile (see file_profile_init).
+        stage (str): The stage name (e.g. 'read', 'derived', 'missing_stats').
+
+    Yields:
+        None
+    """
+    time_start = perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile['stages'][stage] = round(profile['stages'].get(stage, 0.0) + perf_counter() - time_start, 4)
+
+def file_profile_end(profile: dict, rows: int = None) -> dict:
+    """
+    Closes the profile of a file: the total seconds, the rows and bytes processed per second and the peak resident memory of the process so far.
+
+    Parameters:
+        profile (dict): The profile.
+        rows (int, optional): The rows of the file (None if not known).
+
+    Returns:
+        dict: the profile (without the start time, so that it can be written as JSON).
+    """
+    seconds = perf_counter() - profile.pop('time_start')
+    profile['rows'] = rows
+    profile['sec'] = round(seconds, 4)
+    profile['rows_per_sec'] = round(rows / seconds, 1) if rows is not None and seconds > 0 else None
+    profile['bytes_per_sec'] = round(profile['bytes'] / seconds, 1) if seconds > 0 else None
+    profile['peak_rss_mb'] = peak_rss_mb()
+    return profile
+
+def run_report_write(list_profiles: list, dic_run_stages: dict, stats_dir: str, script_name: str, csv_sep: str = ";") -> tuple:
+    """
+    Writes the run report of a script in the stats directory: a JSON file with the run (date, versions, stages of the run, peak memory) and the profile of each file, and a CSV file with a row for each file and a column for each stage, to be compared between runs.
+
+    Parameters:
+        list_profiles (list): The profiles of the files (see file_profile_end).
+        dic_run_stages (dict): The seconds of the stages of the run (e.g. 'scan', 'files').
+        stats_dir (str): The stats directory.
+        script_name (str): The script name (the reports are named after it).
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        tuple: the paths of the JSON and CSV reports.
+    """
+    script_stem = Path(script_name).stem
+    dic_report = {
+        'script': script_name,
+        'date': datetime.now().replace(microsecond=0).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'stages': dic_run_stages,
+        'peak_rss_mb': peak_rss_mb(),
+        'files': list_profiles
+    }
+    path_json = Path(stats_dir) / f"_run_profile_{script_stem}.json"
+    with open(path_json, "w") as fp:
+        json.dump(dic_report, fp, indent=4, default=str)
+    list_stages = [stage for stage in PROFILE_STAGES if any(stage in profile['stages'] for profile in list_profiles)]
+    list_stages += sorted({stage for profile in list_profiles for stage in profile['stages']} - set(list_stages))
+    list_rows = []
+    for profile in list_profiles:
+        dic_row = {key: value for key, value in profile.items() if key != 'stages'}
+        dic_row.update({f"sec_{stage}": profile['stages'].get(stage) for stage in list_stages})
+        list_rows.append(dic_row)
+    path_csv = Path(stats_dir) / f"_run_profile_{script_stem}.csv"
+    pd.DataFrame(list_rows).to_csv(path_csv, sep=csv_sep, index=False)
+    return path_json, path_csv
+
+def profile_capture(mode: str, func, args: tuple, path_base: Path):
+    """
+    Runs a function under cProfile (the stats are saved as .prof, to be opened with pstats or snakeviz, and the most expensive functions as text) or under tracemalloc (the lines that allocated most of the memory still in use at the end and the peak of the traced memory, as text).
+
+    Parameters:
+        mode (str): The profiler (see PROFILE_MODES).
+        func (callable): The function to be run.
+        args (tuple): The arguments of the function.
+        path_base (Path): The path of the reports, without extension.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        ValueError: if the mode is unknown.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}' (allowed: {', '.join(PROFILE_MODES)})")
+    buffer = io.StringIO()
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func, *args)
+        profiler.dump_stats(path_base.with_suffix(".prof"))
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(PROFILE_TOP_LINES)
+    else:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        try:
+            result = func(*args)
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        buffer.write(f"Peak traced memory: {peak / (1024 * 1024):.1f} MB\n\n")
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP_LINES]:
+            buffer.write(f"{stat}\n")
+    with open(path_base.with_suffix(".txt"), "w") as fp:
+        fp.write(buffer.getvalue())
+    return result
@@ -0,0 +1,209 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+SCHEMA_SAMPLE_MODES = ["head", "reservoir"]
+REGEX_INT = r"^[+-]?\d+$"
+REGEX_INT_LEADING_ZERO = r"^[+-]?0\d" # codes such as '01' or '00123' must stay text
+REGEX_FLOAT = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+REGEX_DATE = r"^\d{4}-\d{2}-\d{2}$"
+REGEX_DATETIME = r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$"
+INT_DIGITS_MAX = 18 # longer integers are not converted (they may not fit in BIGINT)
+INT32_MIN = -2**31
+INT32_MAX = 2**31 - 1
+VARCHAR_MAX_LEN = 255 # longer text columns become TEXT
+VARCHAR_KEY_MAX_LEN = 768 # longest VARCHAR of a key column (index limit of 3072 bytes in utf8mb4)
+
+def col_profile_init(list_cols: list, sample_rows: int = 0, seed: int = 0) -> dict:
+    """
+    Creates an empty profile of the columns of a file, to be updated with the blocks of rows read during the export: for each column the number of non-empty values, the maximum length, which types all the values have (integer, decimal, date, datetime) and the integer range; optionally, a uniform sample of rows (reservoir).
+
+    Parameters:
+        list_cols (list): The column names.
+        sample_rows (int): Rows of the reservoir sample (0 = no sample).
+        seed (int): Seed of the random generator of the sample.
+
+    Returns:
+        dict: the empty profile.
+    """
+    profile = {
+        'list_cols': list(list_cols),
+        'rows_num': 0,
+        'columns': {col: {'non_empty': 0, 'max_len': 0, 'is_int': True, 'leading_zero': False, 'int_min': None, 'int_max': None, 'is_float': True, 'is_date': True, 'is_datetime': True} for col in list_cols},
+        'sample_rows': sample_rows,
+        'seed': seed,
+        'rng': np.random.default_rng(seed),
+        'sample': None,
+        'sample_keys': None
+    }
+    return profile
+
+def col_stats_update(col_stats: dict, values: pa.Array) -> None:
+    """
+    Updates the stats of a column with a block of values (strings, empty for missing values). The type checks stop as soon as a value does not match.
+
+    Parameters:
+        col_stats (dict): The stats of the column.
+        values (pa.Array): The values.
+
+    Returns:
+        None
+    """
+    lengths = pc.utf8_length(values)
+    values = values.filter(pc.greater(lengths, 0))
+    if len(values) == 0:
+        return
+    col_stats['non_empty'] += len(values)
+    col_stats['max_len'] = max(col_stats['max_len'], pc.max(lengths).as_py())
+    if col_stats['is_int']:
+        col_stats['is_int'] = pc.all(pc.match_substring_regex(values, REGEX_INT)).as_py() and pc.max(pc.utf8_length(values)).as_py() <= INT_DIGITS_MAX
+        if col_stats['is_int']:
+            col_stats['leading_zero'] = col_stats['leading_zero'] or pc.any(pc.match_substring_regex(values, REGEX_INT_LEADING_ZERO)).as_py()
+            int_range = pc.min_max(pc.cast(values, pa.int64()))
+            col_stats['int_min'] = int_range['min'].as_py() if col_stats['int_min'] is None else min(col_stats['int_min'], int_range['min'].as_py())
+            col_stats['int_max'] = int_range['max'].as_py() if col_stats['int_max'] is None else max(col_stats['int_max'], int_range['max'].as_py())
+    if col_stats['is_float'] and not col_stats['is_int']:
+        col_stats['is_float'] = pc.all(pc.match_substring_regex(values, REGEX_FLOAT)).as_py()
+    if col_stats['is_date']:
+        col_stats['is_date'] = pc.all(pc.match_substring_regex(values, REGEX_DATE)).as_py()
+    if col_stats['is_datetime']:
+        col_stats['is_datetime'] = pc.all(pc.match_substring_regex(values, REGEX_DATETIME)).as_py()
+
+def col_profile_update(profile: dict, batch: pa.RecordBatch) -> None:
+    """
+    Updates the profile with a block of rows: the stats of each column and the reservoir sample (each row gets a random key, the rows with the smallest keys are kept).
+
+    Parameters:
+        profile (dict): The profile.
+        batch (pa.RecordBatch): The block of rows (string columns, without nulls).
+
+    Returns:
+        None
+    """
+    profile['rows_num'] += batch.num_rows
+    for col in profile['list_cols']:
+        col_stats_update(profile['columns'][col], batch.column(col))
+    if profile['sample_rows'] > 0:
+        table = pa.Table.from_batches([batch]).select(profile['list_cols'])
+        keys = profile['rng'].random(batch.num_rows)
+        if profile['sample'] is not None:
+            table = pa.concat_tables([profile['sample'], table])
+            keys = np.concatenate([profile['sample_keys'], keys])
+        if len(keys) > profile['sample_rows']:
+            index = np.sort(np.argpartition(keys, profile['sample_rows'])[:profile['sample_rows']])
+            table = table.take(index)
+            keys = keys[index]
+        profile['sample'] = table.combine_chunks()
+        profile['sample_keys'] = keys
+
+def col_profile_sample_df(profile: dict, list_col_type: dict, csv_sep: str = ";") -> pd.DataFrame:
+    """
+    Returns the reservoir sample as a DataFrame with the types read_csv would infer (the sample is parsed as a CSV file).
+
+    Parameters:
+        profile (dict): The profile.
+        list_col_type (dict): columns type.
+        csv_sep (str): The CSV separator.
+
+    Returns:
+        pd.DataFrame: the sample (None if the profile has no sample).
+    """
+    if profile['sample'] is None:
+        return None
+    buffer = io.BytesIO()
+    pa_csv.write_csv(profile['sample'], buffer, write_options=pa_csv.WriteOptions(delimiter=csv_sep))
+    buffer.seek(0)
+    return pd.read_csv(buffer, sep=csv_sep, dtype=list_col_type, low_memory=False)
+
+def dtype_kind(dtype_name: str) -> str:
+    """
+    Returns the kind of a configured column type: 'int', 'float', 'text' or None (other types or no type).
+
+    Parameters:
+        dtype_name (str): The type name (e.g. 'object', 'float64', 'Int64').
+
+    Returns:
+        str: the kind of the type.
+    """
+    if dtype_name is None:
+        return None
+    try:
+        dtype = pd.api.types.pandas_dtype(dtype_name)
+    except TypeError:
+        return None
+    if pd.api.types.is_bool_dtype(dtype):
+        return None
+    if pd.api.types.is_integer_dtype(dtype):
+        return "int"
+    if pd.api.types.is_float_dtype(dtype):
+        return "float"
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return "text"
+    return None
+
+def varchar_len(max_len: int) -> int:
+    """
+    Returns the length of a VARCHAR column: the power of two not less than the longest value (some room for longer values in the next files), at most VARCHAR_MAX_LEN.
+
+    Parameters:
+        max_len (int): The length of the longest value.
+
+    Returns:
+        int: the length of the column.
+    """
+    return min(VARCHAR_MAX_LEN, 1 << max(0, int(max_len - 1).bit_length()))
+
+def col_sql_type(col_stats: dict, dtype_name: str = None, is_key: bool = False) -> str:
+    """
+    Chooses the MySQL type of a column from its stats: INT or BIGINT (from the integer range), DOUBLE, DATE, DATETIME, VARCHAR(n) (from the longest value) or TEXT. A configured type restricts the choice (e.g. a text column is never numeric).
+
+    Parameters:
+        col_stats (dict): The stats of the column.
+        dtype_name (str, optional): The configured type of the column.
+        is_key (bool): True if the column is a key (a key is never TEXT, as it is indexed).
+
+    Returns:
+        str: the MySQL type (None if the column has only empty values).
+    """
+    if col_stats['non_empty'] == 0:
+        return None
+    kind = dtype_kind(dtype_name)
+    if kind == "float" and (col_stats['is_int'] or col_stats['is_float']):
+        return "DOUBLE"
+    if kind in (None, "int") and col_stats['is_int'] and not col_stats['leading_zero']:
+        return "INT" if INT32_MIN <= col_stats['int_min'] and col_stats['int_max'] <= INT32_MAX else "BIGINT"
+    if kind is None and col_stats['is_float'] and not col_stats['is_int']:
+        return "DOUBLE"
+    if kind is None and col_stats['is_date']:
+        return "DATE"
+    if kind is None and col_stats['is_datetime']:
+        return "DATETIME"
+    if col_stats['max_len'] <= VARCHAR_MAX_LEN:
+        return f"VARCHAR({varchar_len(col_stats['max_len'])})"
+    if is_key and col_stats['max_len'] <= VARCHAR_KEY_MAX_LEN:
+        return f"VARCHAR({col_stats['max_len']})"
+    return "TEXT"
+
+def col_profile_sql_types(profile: dict, list_col_type: dict, list_keys: list = None) -> dict:
+    """
+    Chooses the MySQL type of each column of the profile (see col_sql_type).
+
+    Parameters:
+        profile (dict): The profile updated with all the rows of the file.
+        list_col_type (dict): columns type.
+        list_keys (list, optional): The key columns.
+
+    Returns:
+        dict: the MySQL type of each column (columns with only empty values are not included).
+    """
+    list_keys = list_keys or []
+    dic_sql_types = {}
+    for col in profile['list_cols']:
+        sql_type = col_sql_type(profile['columns'][col], list_col_type.get(col), col in list_keys)
+        if sql_type is not None:
+            dic_sql_types[col] = sql_type
+    return dic_sql_types
@@ -0,0 +1,243 @@
+from pathlib import Path
+
+import pandas as pd
+
+from utility_manager.stats_stream import stats_values_typed
+
+CUBE_FUNCTIONS = {"count": "sum", "sum": "sum", "min": "min", "max": "max"} # aggregation of each measure function and the function that rolls it up
+CUBE_ROWS_COL = "rows" # rows of each cell
+CUBE_FILE_SUFFIX = "_cube_"
+CUBE_COMPRESSION = "zstd"
+
+def cubes_compile(dic_cubes: dict) -> list:
+    """
+    Checks the cubes configured for a file (STATS_CUBES): each cube has its dimensions, the measure columns and the functions computed on them (all of CUBE_FUNCTIONS if not given).
+
+    Parameters:
+        dic_cubes (dict): The cubes of the file, by name (None if the file has no cubes).
+
+    Returns:
+        list: the cubes (name, dimensions, measures, functions).
+
+    Raises:
+        ValueError: if a cube has no dimensions or an unknown function.
+    """
+    list_cubes = []
+    for cube_name, spec in (dic_cubes or {}).items():
+        list_dims = list(spec.get('dimensions') or [])
+        if len(list_dims) == 0:
+            raise ValueError(f"Cube '{cube_name}' has no dimensions")
+        list_funcs = list(spec.get('functions') or CUBE_FUNCTIONS)
+        list_unknown = [func for func in list_funcs if func not in CUBE_FUNCTIONS]
+        if len(list_unknown) > 0:
+            raise ValueError(f"Cube '{cube_name}': unknown functions {list_unknown} (allowed: {', '.join(CUBE_FUNCTIONS)})")
+        list_cubes.append({'name': cube_name, 'dimensions': list_dims, 'measures': list(spec.get('measures') or []), 'functions': list_funcs})
+    return list_cubes
+
+def cubes_columns(list_cubes: list) -> list:
+    """
+    Lists the columns the cubes are computed on (dimensions and measures).
+
+    Parameters:
+        list_cubes (list): The compiled cubes (see cubes_compile).
+
+    Returns:
+        list: the columns, without repetitions.
+    """
+    return list(dict.fromkeys(col for cube in list_cubes for col in cube['dimensions'] + cube['measures']))
+
+def cube_measure_cols(cube: dict) -> dict:
+    """
+    Returns the measure columns of a cube with the function that rolls each of them up.
+
+    Parameters:
+        cube (dict): The cube (see cubes_compile).
+
+    Returns:
+        dict: the roll-up function of each column, the rows of each cell first.
+    """
+    return {CUBE_ROWS_COL: "sum", **{f"{measure}_{func}": CUBE_FUNCTIONS[func] for measure in cube['measures'] for func in cube['functions']}}
+
+def cube_df_from_df(df: pd.DataFrame, cube: dict) -> pd.DataFrame:
+    """
+    Aggregates the rows of a dataframe by the dimensions of a cube (hash aggregation, in order of first appearance; the missing values are a cell too): the rows of each cell and the functions of each measure (the values that are not numbers are skipped).
+
+    Parameters:
+        df (pd.DataFrame): The rows (e.g. a whole file or a chunk).
+        cube (dict): The cube (see cubes_compile).
+
+    Returns:
+        pd.DataFrame: the cells of the cube, a row for each combination of the dimensions.
+    """
+    df_measures = pd.DataFrame({measure: pd.to_numeric(df[measure], errors="coerce") for measure in cube['measures']}, index=df.index)
+    grouped = df_measures.groupby([df[dim] for dim in cube['dimensions']], sort=False, dropna=False, observed=True)
+    df_cube = grouped.size().rename(CUBE_ROWS_COL).to_frame()
+    if len(cube['measures']) > 0:
+        df_agg = grouped.agg(**{f"{measure}_{func}": (measure, func) for measure in cube['measures'] for func in cube['functions']})
+        df_cube = df_cube.join(df_agg)
+    return df_cube.reset_index()
+
+def cube_df_merge(list_dfs: list, cube: dict, list_dims: list = None) -> pd.DataFrame:
+    """
+    Merges the cells of partial cubes (e.g. of the chunks of a file) or rolls a cube up to fewer dimensions: the rows, counts and sums are added, the minimums and maximums are compared.
+
+    Parameters:
+        list_dfs (list): The partial cubes (see cube_df_from_df).
+        cube (dict): The cube.
+        list_dims (list, optional): The dimensions kept (if None, all the dimensions of the cube; if empty, a single row with the totals).
+
+    Returns:
+        pd.DataFrame: the merged cells.
+    """
+    list_dims = cube['dimensions'] if list_dims is None else list_dims
+    dic_agg = cube_measure_cols(cube)
+    df = pd.concat(list_dfs, ignore_index=True) if len(list_dfs) > 1 else list_dfs[0]
+    if len(list_dims) == 0:
+        return df.agg(dic_agg).to_frame().T.astype({col: df[col].dtype for col in dic_agg})
+    return df.groupby(list_dims, sort=False, dropna=False, observed=True).agg(dic_agg).reset_index()
+
+def cube_df_typed(df_cube: pd.DataFrame, cube: dict, dic_convert: dict) -> pd.DataFrame:
+    """
+    Converts the values of some dimensions of a cube (e.g. the raw strings of a column read in chunks to the type of the whole column) and merges the cells that become equal (e.g. '1' and '1.0').
+
+    Parameters:
+        df_cube (pd.DataFrame): The cells of the cube.
+        cube (dict): The cube.
+        dic_convert (dict): The conversion of each dimension, a function of the values (missing values excluded) and of whether the dimension has missing values, returning the converted values.
+
+    Returns:
+        pd.DataFrame: the cells with the dimensions converted.
+    """
+    if len(dic_convert) == 0:
+        return df_cube
+    df_cube = df_cube.copy()
+    for dim, convert in dic_convert.items():
+        mask_valid = df_cube[dim].notna()
+        column = pd.Series([None] * len(df_cube), dtype=object)
+        column[mask_valid.to_numpy()] = convert(df_cube.loc[mask_valid, dim].tolist(), not mask_valid.all())
+        df_cube[dim] = column.infer_objects()
+    return cube_df_merge([df_cube], cube)
+
+def cube_state_init(list_cubes: list) -> dict:
+    """
+    Creates an empty state to accumulate the cubes of a file chunk by chunk.
+
+    Parameters:
+        list_cubes (list): The compiled cubes (see cubes_compile).
+
+    Returns:
+        dict: the empty state, by cube name.
+    """
+    return {cube['name']: {'cube': cube, 'df': None} for cube in list_cubes}
+
+def cube_state_update(state_cubes: dict, df_chunk: pd.DataFrame) -> None:
+    """
+    Adds the rows of a chunk to the cubes: the chunk is aggregated and merged with the cells of the previous chunks, so the memory used depends on the cells and not on the rows.
+
+    Parameters:
+        state_cubes (dict): The state (see cube_state_init).
+        df_chunk (pd.DataFrame): The chunk to be added.
+
+    Returns:
+        None
+    """
+    for dic_cube in state_cubes.values():
+        df_part = cube_df_from_df(df_chunk, dic_cube['cube'])
+        dic_cube['df'] = df_part if dic_cube['df'] is None else cube_df_merge([dic_cube['df'], df_part], dic_cube['cube'])
+
+def cube_state_to_dfs(state_cubes: dict, list_col_type: dict, list_col_derived: list = None) -> dict:
+    """
+    Returns the cubes of a state, as cube_df_from_df on the whole file: the dimensions without a configured type (read as text in chunks) get the type inferred on the whole column, the derived columns keep the values of their operation.
+
+    Parameters:
+        state_cubes (dict): The state updated with all the chunks of the file.
+        list_col_type (dict): columns type.
+        list_col_derived (list, optional): the derived columns.
+
+    Returns:
+        dict: the cells of each cube, by cube name (the cubes of a file without rows are skipped).
+    """
+    dic_cubes = {}
+    for cube_name, dic_cube in state_cubes.items():
+        if dic_cube['df'] is None:
+            continue
+        dic_convert = {dim: stats_values_typed for dim in dic_cube['cube']['dimensions'] if dim not in list_col_type and dim not in (list_col_derived or [])}
+        dic_cubes[cube_name] = cube_df_typed(dic_cube['df'], dic_cube['cube'], dic_convert)
+    return dic_cubes
+
+def cube_path(stats_dir: str, file_name: str, cube_name: str) -> Path:
+    """
+    Returns the path of a cube of a file.
+
+    Parameters:
+        stats_dir (str): The stats directory.
+        file_name (str): The name of the CSV file.
+        cube_name (str): The cube name.
+
+    Returns:
+        Path: the path of the Parquet file.
+    """
+    return Path(stats_dir) / f"{Path(file_name).stem}{CUBE_FILE_SUFFIX}{cube_name}.parquet"
+
+def cube_write(df_cube: pd.DataFrame, path_cube: Path) -> None:
+    """
+    Writes a cube as a compressed Parquet file, with the text dimensions dictionary encoded (each value stored once).
+
+    Parameters:
+        df_cube (pd.DataFrame): The cells of the cube.
+        path_cube (Path): The path of the Parquet file.
+
+    Returns:
+        None
+    """
+    dic_category = {col: "category" for col in df_cube.columns if col != CUBE_ROWS_COL and not pd.api.types.is_numeric_dtype(df_cube[col])}
+    df_cube.astype(dic_category).to_parquet(path_cube, compression=CUBE_COMPRESSION, index=False)
+
+def cube_read(path_cube: Path) -> tuple:
+    """
+    Reads a cube written by cube_write, rebuilding its dimensions and measures from the columns.
+
+    Parameters:
+        path_cube (Path): The path of the Parquet file.
+
+    Returns:
+        tuple: the cells of the cube and the cube (dimensions, measures, functions).
+    """
+    df_cube = pd.read_parquet(path_cube)
+    list_cols = list(df_cube.columns)
+    pos_rows = list_cols.index(CUBE_ROWS_COL)
+    list_measure_cols = list_cols[pos_rows + 1:]
+    list_funcs = list(dict.fromkeys(col.rsplit("_", 1)[1] for col in list_measure_cols))
+    list_measures = list(dict.fromkeys(col.rsplit("_", 1)[0] for col in list_measure_cols))
+    cube = {'name': Path(path_cube).stem.split(CUBE_FILE_SUFFIX, 1)[-1], 'dimensions': list_cols[:pos_rows], 'measures': list_measures, 'functions': list_funcs}
+    return df_cube, cube
+
+def cube_query(path_cube: Path, list_dims: list, dic_filters: dict = None) -> pd.DataFrame:
+    """
+    Answers a cross-tab from a cube, without reading the source file: the cells matching the filters are rolled up to the dimensions requested (any subset of the dimensions of the cube) and the mean of each measure with a sum and a count is added.
+
+    Parameters:
+        path_cube (Path): The path of the cube (see cube_path).
+        list_dims (list): The dimensions of the cross-tab (empty for the totals).
+        dic_filters (dict, optional): The values kept for some dimensions, a value or a list of values each (e.g. {'anno_pubblicazione': [2022, 2023]}).
+
+    Returns:
+        pd.DataFrame: the cross-tab, sorted by the dimensions.
+
+    Raises:
+        KeyError: if a dimension or a filter is not a dimension of the cube.
+    """
+    df_cube, cube = cube_read(path_cube)
+    list_unknown = [dim for dim in list(list_dims) + list(dic_filters or {}) if dim not in cube['dimensions']]
+    if len(list_unknown) > 0:
+        raise KeyError(f"Not dimensions of the cube '{cube['name']}': {list_unknown} (dimensions: {cube['dimensions']})")
+    for dim, values in (dic_filters or {}).items():
+        list_values = values if isinstance(values, (list, tuple, set)) else [values]
+        df_cube = df_cube[df_cube[dim].isin(list_values)]
+    df_result = cube_df_merge([df_cube], cube, list(list_dims))
+    for measure in cube['measures']:
+        if "sum" in cube['functions'] and "count" in cube['functions']:
+            df_result[f"{measure}_mean"] = df_result[f"{measure}_sum"] / df_result[f"{measure}_count"].where(df_result[f"{measure}_count"] > 0)
+    if len(list_dims) > 0:
+        df_result = df_result.sort_values(list(list_dims), na_position="last", ignore_index=True)
+    return df_result
@@ -0,0 +1,292 @@
+from pathlib import Path
+
+import pandas as pd
+
+from utility_manager.stats_stream import stats_values_typed, value_counts_merge, frequencies_long_df
+from utility_manager.stats_cube import CUBE_ROWS_COL, cube_df_typed
+
+STATS_ENGINES = ["pandas", "duckdb"]
+PANDAS_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'] # default na_values of read_csv
+DUCKDB_TABLE = "od" # temporary table of the file analysed
+
+def sql_quote_name(name: str) -> str:
+    """
+    Quotes a table or column name.
+
+    Parameters:
+        name (str): The name.
+
+    Returns:
+        str: the quoted name.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def sql_literal(value) -> str:
+    """
+    Formats a value as a SQL string literal.
+
+    Parameters:
+        value: The value (converted to a string).
+
+    Returns:
+        str: the literal.
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+def duckdb_connect(threads: int = 0, memory_limit: str = "", temp_dir: str = None):
+    """
+    Opens an in-memory DuckDB database; tables larger than the memory limit are spilled to the temporary directory.
+
+    Parameters:
+        threads (int): Threads used by DuckDB (0 = all the cores).
+        memory_limit (str): Memory limit, e.g. '4GB' (empty = DuckDB default, 80% of the RAM).
+        temp_dir (str, optional): Directory of the spilled data.
+
+    Returns:
+        the connection.
+    """
+    import duckdb # optional dependency, needed only by the duckdb engine
+    con = duckdb.connect()
+    if threads > 0:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = {sql_literal(memory_limit)}")
+    if temp_dir:
+        con.execute(f"SET temp_directory = {sql_literal(temp_dir)}")
+    # The row order of the table is the order of the file (first appearance of the distinct values)
+    con.execute("SET preserve_insertion_order = true")
+    return con
+
+def derived_column_sql(spec: dict, op_name: str, col_expr: str) -> tuple:
+    """
+    Translates a derived column (see derived_columns.py) into a SQL expression with the same values.
+
+    Parameters:
+        spec (dict): The specification of the derived column.
+        op_name (str): The operation.
+        col_expr (str): The SQL expression of the source column.
+
+    Returns:
+        tuple: the SQL expression and, for 'bucket' and 'map', the lookup of the values (the expression gives the index of the value in the list) with a flag telling whether the values without rows are counted too (the categories of 'bucket'), otherwise None.
+
+    Raises:
+        ValueError: if the specification cannot be translated (negative slice positions).
+    """
+    if op_name == "str_slice":
+        start = spec.get('start', 0) or 0
+        stop = spec.get('stop')
+        if start < 0 or (stop is not None and stop < 0):
+            raise ValueError("Derived column 'str_slice' with negative positions is not supported by the duckdb engine")
+        if stop is None:
+            return f"substr(CAST({col_expr} AS VARCHAR), {start + 1})", None
+        return f"substr(CAST({col_expr} AS VARCHAR), {start + 1}, {max(0, stop - start)})", None
+    if op_name == "notna":
+        return f"CAST(({col_expr}) IS NOT NULL AS TINYINT)", None
+    if op_name == "date_part":
+        ts_expr = f"try_strptime(CAST({col_expr} AS VARCHAR), {sql_literal(spec['format'])})" if spec.get('format') else f"TRY_CAST({col_expr} AS TIMESTAMP)"
+        part_expr = f"(isodow({ts_expr}) - 1)" if spec['part'] == "dayofweek" else f"{spec['part']}({ts_expr})"
+        return f"CAST({part_expr} AS SMALLINT)", None
+    if op_name == "bucket":
+        # The categories (labels or intervals) are the ones of pd.cut, the intervals include the right edge
+        categories = list(pd.cut(pd.Series([], dtype='float64'), bins=spec['bins'], labels=spec.get('labels')).cat.categories)
+        num_expr = f"TRY_CAST({col_expr} AS DOUBLE)"
+        bins = spec['bins']
+        list_when = [f"WHEN {num_expr} > {float(bins[i])} AND {num_expr} <= {float(bins[i + 1])} THEN {i}" for i in range(len(bins) - 1)]
+        return f"CASE {' '.join(list_when)} END", (categories, True)
+    if op_name == "map":
+        # The values keep the types of the configuration (e.g. numbers), as with Series.map
+        if len(spec['values']) == 0:
+            return "CAST(NULL AS INTEGER)", ([], False)
+        list_when = [f"WHEN {sql_literal(key)} THEN {index}" for index, key in enumerate(spec['values'])]
+        return f"CASE CAST({col_expr} AS VARCHAR) {' '.join(list_when)} END", (list(spec['values'].values()), False)
+    raise ValueError(f"Derived column operation '{op_name}' is not supported by the duckdb engine")
+
+def derived_columns_sql(list_compiled: list) -> tuple:
+    """
+    Translates the compiled derived columns into SQL expressions (a derived column computed from another one uses its expression).
+
+    Parameters:
+        list_compiled (list): The compiled derived columns (see derived_columns_compile).
+
+    Returns:
+        tuple: the SQL expression of each derived column and its lookup of the values (see derived_column_sql).
+
+    Raises:
+        ValueError: if a derived column cannot be translated.
+    """
+    dic_exprs = {}
+    dic_derived = {}
+    for col_name, op_func, spec in list_compiled:
+        op_name = op_func.__name__.removeprefix("op_")
+        if spec['col'] in dic_derived and dic_derived[spec['col']] is not None:
+            raise ValueError(f"Derived column '{col_name}' computed from a 'bucket' or 'map' column is not supported by the duckdb engine")
+        col_expr = f"({dic_exprs[spec['col']]})" if spec['col'] in dic_exprs else sql_quote_name(spec['col'])
+        dic_exprs[col_name], dic_derived[col_name] = derived_column_sql(spec, op_name, col_expr)
+    return dic_exprs, dic_derived
+
+def duckdb_table_from_csv(con, path_data: Path, list_cols: list, list_derived: list, csv_sep: str = ";") -> tuple:
+    """
+    Loads the columns of a CSV file and the derived columns into a temporary table, parsed in parallel by DuckDB. The values are kept as text and the default missing values of read_csv ('', 'NA', 'NULL', ...) become NULL.
+
+    Parameters:
+        con: The connection.
+        path_data (Path): The CSV file.
+        list_cols (list): The columns to be read (in the order of the file).
+        list_derived (list): The compiled derived columns.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        tuple: the columns of the table (as the columns of the dataframe read with pandas) and the lookup of the values of each derived column (see derived_column_sql).
+    """
+    dic_exprs, dic_derived = derived_columns_sql(list_derived)
+    # As in df_add_derived_columns, a derived column with the name of a column read replaces it
+    list_table_cols = list(list_cols) + [col_name for col_name in dic_exprs if col_name not in list_cols]
+    list_select = [f"{dic_exprs[col]} AS {sql_quote_name(col)}" if col in dic_exprs else sql_quote_name(col) for col in list_table_cols]
+    na_values = ", ".join(sql_literal(value) for value in PANDAS_NA_VALUES)
+    read_csv = f"read_csv({sql_literal(path_data)}, delim={sql_literal(csv_sep)}, header=true, all_varchar=true, nullstr=[{na_values}], null_padding=true, quote='\"', escape='\"')"
+    con.execute(f"DROP TABLE IF EXISTS {DUCKDB_TABLE}")
+    con.execute(f"CREATE TEMP TABLE {DUCKDB_TABLE} AS SELECT {', '.join(list_select)} FROM {read_csv}")
+    return list_table_cols, dic_derived
+
+def duckdb_missing_counts(con, list_cols: list) -> tuple:
+    """
+    Counts the rows of the table and the missing values of some columns.
+
+    Parameters:
+        con: The connection.
+        list_cols (list): The columns.
+
+    Returns:
+        tuple: the number of rows and the missing values of each column.
+    """
+    list_counts = [f"COUNT({sql_quote_name(col)})" for col in list_cols]
+    row = con.execute(f"SELECT COUNT(*){''.join(', ' + count for count in list_counts)} FROM {DUCKDB_TABLE}").fetchone()
+    num_rows = int(row[0])
+    return num_rows, {col: num_rows - int(count) for col, count in zip(list_cols, row[1:])}
+
+def duckdb_summary_dict(con, file_name: str, list_cols: list, list_col_pk: list = None) -> dict:
+    """
+    Computes on the table the same dictionary of summarize_dataframe_to_dict: rows, columns, missing values for each column, duplicated rows (and primary keys).
+
+    Parameters:
+        con: The connection.
+        file_name (str): The file name.
+        list_cols (list): The columns of the table.
+        list_col_pk (list, optional): primary key columns (if given, the rows with a duplicated key are counted too).
+
+    Returns:
+        dict: a dictionary containing the file name and missing value counts for each column.
+    """
+    num_rows, missing_counts_dict = duckdb_missing_counts(con, list_cols)
+    # Rows with the same values (missing values equal to each other, as in DataFrame.duplicated)
+    distinct_rows = con.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT * FROM {DUCKDB_TABLE})").fetchone()[0]
+    duplicate_rows_count = num_rows - int(distinct_rows)
+    ratio_dup = duplicate_rows_count / num_rows if num_rows > 0 else 0  # Avoid division by zero
+
+    summary_dict = {
+        'file_name': file_name,
+        'rows_num': num_rows,
+        'cols_num': len(list_cols),
+        'missing_values': missing_counts_dict,
+        'duplicated_rows': duplicate_rows_count,
+        'duplicated_rows_perc': round(ratio_dup,2)
+    }
+    if list_col_pk:
+        keys_str = ", ".join(sql_quote_name(col) for col in list_col_pk)
+        distinct_pk = con.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {keys_str} FROM {DUCKDB_TABLE})").fetchone()[0]
+        duplicate_pk_count = num_rows - int(distinct_pk)
+        summary_dict['duplicated_pk'] = duplicate_pk_count
+        summary_dict['duplicated_pk_perc'] = round(duplicate_pk_count / num_rows if num_rows > 0 else 0, 2)
+    return summary_dict
+
+def values_astype(values: list, dtype_name: str) -> list:
+    """
+    Converts the raw strings of a column with a configured type to that type, as read_csv does; if the conversion is not possible, the strings are returned unchanged.
+
+    Parameters:
+        values (list): The distinct raw values.
+        dtype_name (str): The configured type.
+
+    Returns:
+        list: The values converted.
+    """
+    try:
+        return pd.Series(values, dtype=object).astype(dtype_name).tolist()
+    except (ValueError, TypeError):
+        return values
+
+def duckdb_distinct_df(con, include_cols: list, list_col_type: dict, dic_missing: dict, dic_derived: dict = None, top_k: int = 0) -> pd.DataFrame:
+    """
+    Computes on the table the same dataframe of distinct_values_frequencies: the values are counted with GROUP BY (in order of first appearance in the file) and typed as read_csv would type them; the derived columns keep the values of their operation.
+
+    Parameters:
+        con: The connection.
+        include_cols (list): The columns to be included.
+        list_col_type (dict): columns type.
+        dic_missing (dict): The missing values of each column (columns with missing values have float values instead of integers, as in read_csv).
+        dic_derived (dict, optional): The lookup of the values of each derived column (see derived_column_sql).
+        top_k (int): If greater than 0, only the top_k most frequent values of each column are kept.
+
+    Returns:
+        pd.DataFrame: A dataframe containing the distinct values and their frequencies in percentage for each included column.
+    """
+    dic_derived = dic_derived or {}
+    list_values = []
+    list_counts = []
+    for col in include_cols:
+        col_sql = sql_quote_name(col)
+        list_rows = con.execute(f"SELECT {col_sql}, COUNT(*) FROM {DUCKDB_TABLE} WHERE {col_sql} IS NOT NULL GROUP BY {col_sql} ORDER BY MIN(rowid)").fetchall()
+        values = [value for value, _ in list_rows]
+        counts = [int(count) for _, count in list_rows]
+        if dic_derived.get(col) is not None:
+            lookup, keep_empty = dic_derived[col]
+            if keep_empty:
+                dic_counts = dict(zip(values, counts))
+                counts = [dic_counts.get(index, 0) for index in range(len(lookup))]
+                values = list(lookup)
+            else:
+                values = [lookup[index] for index in values]
+        elif col in dic_derived:
+            pass # values of the SQL type of the operation (text, integers)
+        elif col in list_col_type:
+            values = values_astype(values, list_col_type[col])
+        else:
+            values = stats_values_typed(values, dic_missing.get(col, 0) > 0)
+        values_typed, counts_typed = value_counts_merge(values, counts)
+        list_values.append(values_typed)
+        list_counts.append(counts_typed)
+    return frequencies_long_df(include_cols, list_values, list_counts, top_k)
+
+def duckdb_cube_df(con, cube: dict, list_col_type: dict, dic_derived: dict = None) -> pd.DataFrame:
+    """
+    Computes on the table the same cube of cube_df_from_df: the rows are aggregated with GROUP BY (in order of first appearance in the file), the measures are cast to numbers (the values that are not numbers are skipped) and the dimensions are typed as read_csv would type them.
+
+    Parameters:
+        con: The connection.
+        cube (dict): The cube (see cubes_compile).
+        list_col_type (dict): columns type.
+        dic_derived (dict, optional): The lookup of the values of each derived column (see derived_column_sql).
+
+    Returns:
+        pd.DataFrame: the cells of the cube.
+    """
+    dic_derived = dic_derived or {}
+    dims_sql = ", ".join(sql_quote_name(dim) for dim in cube['dimensions'])
+    dic_func_sql = {"count": "COUNT({})", "sum": "COALESCE(SUM({}), 0)", "min": "MIN({})", "max": "MAX({})"}
+    list_select = [f"COUNT(*) AS {sql_quote_name(CUBE_ROWS_COL)}"]
+    for measure in cube['measures']:
+        measure_sql = f"TRY_CAST({sql_quote_name(measure)} AS DOUBLE)"
+        list_select += [f"{dic_func_sql[func].format(measure_sql)} AS {sql_quote_name(f'{measure}_{func}')}" for func in cube['functions']]
+    df_cube = con.execute(f"SELECT {dims_sql}, {', '.join(list_select)} FROM {DUCKDB_TABLE} GROUP BY {dims_sql} ORDER BY MIN(rowid)").df()
+    dic_convert = {}
+    for dim in cube['dimensions']:
+        if dic_derived.get(dim) is not None:
+            dic_convert[dim] = lambda values, has_nan, lookup=dic_derived[dim][0]: [lookup[index] for index in values]
+        elif dim in dic_derived:
+            pass # values of the SQL type of the operation (text, integers)
+        elif dim in list_col_type:
+            dic_convert[dim] = lambda values, has_nan, dtype_name=list_col_type[dim]: values_astype(values, dtype_name)
+        else:
+            dic_convert[dim] = stats_values_typed
+    # Values typed the same (e.g. '1' and '1.0') are a single cell, as in read_csv
+    return cube_df_typed(df_cube, cube, dic_convert)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+from utility_manager.stats_stream import stats_state_compact
+
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+def bytes_hash(path_file: Path, start: int, end: int) -> str:
+    """
+    Computes the hash (BLAKE2b) of a range of bytes of a file.
+
+    Parameters:
+        path_file (Path): The path of the file.
+        start (int): The first byte.
+        end (int): The byte after the last one.
+
+    Returns:
+        str: The hexadecimal hash of the bytes.
+    """
+    with open(path_file, "rb") as fp:
+        fp.seek(start)
+        return hashlib.blake2b(fp.read(end - start), digest_size=16).hexdigest()
+
+def file_fingerprint(path_file: Path, size: int) -> dict:
+    """
+    Creates the fingerprint of the first 'size' bytes of a file: the hash of the first block (header and first rows) and of the last block before 'size'. A file with the same fingerprint up to the old size has only been appended.
+
+    Parameters:
+        path_file (Path): The path of the file.
+        size (int): The number of bytes considered (the size of the file when it was processed).
+
+    Returns:
+        dict: the fingerprint.
+    """
+    head_end = min(FINGERPRINT_BLOCK_SIZE, size)
+    tail_start = max(0, size - FINGERPRINT_BLOCK_SIZE)
+    fingerprint = {
+        'size': size,
+        'mtime_ns': path_file.stat().st_mtime_ns,
+        'head_hash': bytes_hash(path_file, 0, head_end),
+        'tail_hash': bytes_hash(path_file, tail_start, size)
+    }
+    return fingerprint
+
+def file_ends_with_newline(path_file: Path, size: int) -> bool:
+    """
+    Checks whether the first 'size' bytes of a file end with a complete line.
+
+    Parameters:
+        path_file (Path): The path of the file.
+        size (int): The number of bytes considered.
+
+    Returns:
+        bool: True if the byte before 'size' is a newline.
+    """
+    if size == 0:
+        return False
+    with open(path_file, "rb") as fp:
+        fp.seek(size - 1)
+        return fp.read(1) == b"\n"
+
+def stats_conf_hash(conf: dict) -> str:
+    """
+    Computes the hash of the configuration used to create the stats of a file (if it changes, the saved state cannot be reused).
+
+    Parameters:
+        conf (dict): The configuration (columns excluded, types, stats columns, derived columns, ...), JSON serialisable.
+
+    Returns:
+        str: The hexadecimal hash of the configuration.
+    """
+    return hashlib.blake2b(json.dumps(conf, sort_keys=True, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+def state_path(state_dir: str, file_name: str) -> Path:
+    """
+    Returns the path of the saved state of a file.
+
+    Parameters:
+        state_dir (str): The directory of the saved states.
+        file_name (str): The name of the CSV file.
+
+    Returns:
+        Path: The path of the saved state.
+    """
+    return Path(state_dir) / f"{Path(file_name).stem}.pkl"
+
+def state_load(state_dir: str, file_name: str) -> dict:
+    """
+    Loads the saved state of a file.
+
+    Parameters:
+        state_dir (str): The directory of the saved states.
+        file_name (str): The name of the CSV file.
+
+    Returns:
+        dict: The state, None if the file has no saved state.
+    """
+    path_state = state_path(state_dir, file_name)
+    if not path_state.exists():
+        return None
+    with open(path_state, "rb") as fp:
+        return pickle.load(fp)
+
+def state_save(state_dir: str, file_name: str, state: dict, path_data: Path, size: int, conf_hash: str) -> None:
+    """
+    Saves the state of a file with the fingerprint of the bytes processed and the configuration hash; the row fingerprints are compacted before saving.
+
+    Parameters:
+        state_dir (str): The directory of the saved states.
+        file_name (str): The name of the CSV file.
+        state (dict): The state updated with all the rows processed.
+        path_data (Path): The path of the CSV file.
+        size (int): The number of bytes of the file processed.
+        conf_hash (str): The hash of the configuration.
+
+    Returns:
+        None
+    """
+    stats_state_compact(state)
+    state['fingerprint'] = file_fingerprint(path_data, size)
+    state['conf_hash'] = conf_hash
+    path_state = state_path(state_dir, file_name)
+    path_state.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path_state.with_suffix(".tmp")
+    with open(path_tmp, "wb") as fp:
+        pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    path_tmp.replace(path_state)
+
+def state_delta_offset(path_data: Path, state: dict, conf_hash: str) -> int:
+    """
+    Compares a file with its saved state and returns where the rows to be processed start.
+
+    Parameters:
+        path_data (Path): The path of the CSV file.
+        state (dict): The saved state (None if the file has no saved state).
+        conf_hash (str): The hash of the current configuration.
+
+    Returns:
+        int: None if the file is unchanged (the saved state is up to date), the byte offset of the first new row if rows have been appended, 0 if the file must be processed from the start.
+    """
+    if state is None or state.get('conf_hash') != conf_hash:
+        return 0
+    fingerprint = state['fingerprint']
+    size_old = fingerprint['size']
+    size_new = path_data.stat().st_size
+    if size_new < size_old:
+        return 0
+    if file_fingerprint(path_data, size_old) | {'mtime_ns': fingerprint['mtime_ns']} != fingerprint:
+        return 0
+    if size_new == size_old:
+        return None
+    if not file_ends_with_newline(path_data, size_old):
+        return 0
+    return size_old
@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+
+from utility_manager.duplicates import dup_counter_init, dup_counter_update, dup_counter_flush, dup_counter_duplicates, df_row_hashes
+
+STATS_BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False} # raw strings read_csv parses as booleans
+
+def stats_state_init(file_name: str, include_cols: list, list_col_type: dict, dup_rows: dict = None, list_col_pk: list = None, dup_pk: dict = None) -> dict:
+    """
+    Creates an empty state to accumulate, chunk by chunk, the statistics of a file (rows, missing values, duplicated rows and distinct values).
+
+    Parameters:
+        file_name (str): The name of the file associated with the statistics.
+        include_cols (list): A list of column names to be included in the distinct values analysis.
+        list_col_type (dict): columns type (columns with a configured type are not inferred again at the end).
+        dup_rows (dict, optional): the counter of duplicated rows (if None, an exact counter in memory).
+        list_col_pk (list, optional): the primary key columns, whose duplicated values are counted with 'dup_pk'.
+        dup_pk (dict, optional): the counter of duplicated primary keys (if None, an exact counter in memory).
+
+    Returns:
+        dict: the empty state.
+    """
+    state = {
+        'file_name': file_name,
+        'rows_num': 0,
+        'columns': [],
+        'col_type': list_col_type,
+        'missing_values': {},
+        'dup_rows': dup_rows if dup_rows is not None else dup_counter_init(),
+        'pk_cols': list_col_pk or [],
+        'dup_pk': (dup_pk if dup_pk is not None else dup_counter_init()) if list_col_pk else None,
+        'include_cols': include_cols,
+        'value_counts': {col: {} for col in include_cols}
+    }
+    return state
+
+def stats_state_update(state: dict, df_chunk: pd.DataFrame) -> None:
+    """
+    Updates the state with the rows of a chunk: row count, missing values for each column, row fingerprints for duplicates and value counts of the included columns.
+
+    Parameters:
+        state (dict): The state created with stats_state_init.
+        df_chunk (pd.DataFrame): The chunk to be added.
+
+    Returns:
+        None
+    """
+    if len(state['columns']) == 0:
+        state['columns'] = list(df_chunk.columns)
+        state['missing_values'] = {col: 0 for col in df_chunk.columns}
+
+    state['rows_num'] += len(df_chunk)
+
+    # Count the number of missing values in each column of the chunk
+    for col, value in df_chunk.isnull().sum().items():
+        state['missing_values'][col] += int(value)
+
+    # Keep a 64-bit fingerprint of each row (and of each primary key), duplicates are counted on the fingerprints at the end
+    dup_counter_update(state['dup_rows'], df_row_hashes(df_chunk))
+    if state['dup_pk'] is not None:
+        dup_counter_update(state['dup_pk'], df_row_hashes(df_chunk, state['pk_cols']))
+
+    # Update the value counts (in order of first appearance, as value_counts does)
+    for col in state['include_cols']:
+        dic_counts = state['value_counts'][col]
+        values, counts = series_value_counts_arrays(df_chunk[col])
+        for value, count in zip(values.tolist(), counts.tolist()):
+            dic_counts[value] = dic_counts.get(value, 0) + count
+
+def stats_values_typed(values: list, has_nan: bool) -> list:
+    """
+    Converts the raw strings read from a column to the type that pandas would infer reading the whole column (int, float or bool); if the conversion is not possible, the strings are returned unchanged.
+
+    Parameters:
+        values (list): The distinct raw values of the column.
+        has_nan (bool): True if the column has missing values (integers become floats, as in read_csv).
+
+    Returns:
+        list: The values converted.
+    """
+    if len(values) == 0 or not all(isinstance(value, str) for value in values):
+        return values
+    if all(value in STATS_BOOL_VALUES for value in values):
+        return [STATS_BOOL_VALUES[value] for value in values]
+    try:
+        series_num = pd.to_numeric(pd.Series(values, dtype=object))
+    except (ValueError, TypeError):
+        return values
+    if has_nan:
+        series_num = series_num.astype('float64')
+    return series_num.tolist()
+
+def series_kind(series: pd.Series) -> str:
+    """
+    Finds the kind of values that pandas would infer on a column read as raw strings (see stats_values_typed).
+
+    Parameters:
+        series (pd.Series): The column (raw strings and missing values).
+
+    Returns:
+        str: 'bool', 'int', 'float' or 'object' (None if the column has only missing values).
+    """
+    values = pd.unique(series.dropna())
+    if len(values) == 0:
+        return None
+    if all(value in STATS_BOOL_VALUES for value in values):
+        return 'bool'
+    try:
+        series_num = pd.to_numeric(pd.Series(values, dtype=object))
+    except (ValueError, TypeError):
+        return 'object'
+    if series_num.dtype == 'int64':
+        return 'int'
+    return 'float' if series_num.dtype == 'float64' else 'object'
+
+def stats_kinds_update(dic_kinds: dict, df_chunk: pd.DataFrame) -> None:
+    """
+    Updates the kind of values of each column with the raw strings of a chunk: the kind of the whole column is the one shared by all the chunks (integers and decimals give decimals, any other mix gives text).
+
+    Parameters:
+        dic_kinds (dict): The kind and the missing values of each column, updated in place ({} for a new file).
+        df_chunk (pd.DataFrame): The chunk, read as raw strings.
+
+    Returns:
+        None
+    """
+    for col in df_chunk.columns:
+        kind_old, has_nan = dic_kinds.get(col, (None, False))
+        kind_new = series_kind(df_chunk[col])
+        if kind_old is None or kind_new is None or kind_old == kind_new:
+            kind = kind_old or kind_new
+        else:
+            kind = 'float' if {kind_old, kind_new} == {'int', 'float'} else 'object'
+        dic_kinds[col] = (kind, has_nan or bool(df_chunk[col].isna().any()))
+
+def stats_kinds_dtypes(dic_kinds: dict) -> dict:
+    """
+    Returns the types to read the columns with, as read_csv infers them on the whole file (integers with missing values become decimals); text columns are not listed.
+
+    Parameters:
+        dic_kinds (dict): The kind and the missing values of each column (see stats_kinds_update).
+
+    Returns:
+        dict: the type of each column.
+    """
+    dic_dtypes = {}
+    for col, (kind, has_nan) in dic_kinds.items():
+        if kind == 'int':
+            dic_dtypes[col] = 'float64' if has_nan else 'int64'
+        elif kind == 'float':
+            dic_dtypes[col] = 'float64'
+        elif kind == 'bool':
+            dic_dtypes[col] = 'boolean' if has_nan else 'bool'
+    return dic_dtypes
+
+def value_counts_merge(values: list, counts: list) -> tuple:
+    """
+    Merges the counts of the values that are equal once typed (e.g. the raw strings '1' and '01' both become 1), keeping the order of first appearance.
+
+    Parameters:
+        values (list): The distinct values (typed).
+        counts (list): Their counts.
+
+    Returns:
+        tuple: the distinct values (object array) and their counts (int64 array).
+    """
+    dic_typed = {}
+    for value, count in zip(values, counts):
+        dic_typed[value] = dic_typed.get(value, 0) + count
+    values_typed = np.empty(len(dic_typed), dtype=object)
+    values_typed[:] = list(dic_typed.keys())
+    return values_typed, np.array(list(dic_typed.values()), dtype='int64')
+
+def series_value_counts_arrays(series: pd.Series) -> tuple:
+    """
+    Counts the distinct values of a column on its factorised codes (bincount), without Python objects for each row; missing values are not counted.
+
+    Parameters:
+        series (pd.Series): The column.
+
+    Returns:
+        tuple: the distinct values (object array, in order of first appearance or in the categories order for categorical columns) and their counts (int64 array).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # As value_counts on categorical columns, every category is counted (also with zero rows)
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques)).astype('int64')
+    return np.asarray(uniques, dtype=object), counts
+
+def frequencies_long_df(list_cols: list, list_values: list, list_counts: list, top_k: int = 0) -> pd.DataFrame:
+    """
+    Builds the distinct values dataframe (long format) from the distinct values and counts of each column: values sorted by count (descending, ties in the order given) and frequencies in percentage rounded to two decimals, as value_counts(normalize=True).
+
+    Parameters:
+        list_cols (list): The column names.
+        list_values (list): For each column, the array of distinct values.
+        list_counts (list): For each column, the array of counts.
+        top_k (int): If greater than 0, only the first top_k values of each column are kept (frequencies are computed on all the values).
+
+    Returns:
+        pd.DataFrame: A dataframe with columns 'Column', 'Value' and 'Frequency (%)'.
+    """
+    list_col_parts = []
+    list_value_parts = []
+    list_freq_parts = []
+    for col, values, counts in zip(list_cols, list_values, list_counts):
+        order = pd.Series(counts).sort_values(ascending=False, kind="stable").index.to_numpy()
+        counts_sorted = counts[order]
+        total = counts_sorted.sum()
+        freqs = counts_sorted / total * 100 if total > 0 else counts_sorted.astype('float64')
+        if top_k > 0:
+            order = order[:top_k]
+            freqs = freqs[:top_k]
+        list_col_parts.append(np.full(len(order), col, dtype=object))
+        list_value_parts.append(values[order])
+        list_freq_parts.append(np.round(freqs, 2))
+
+    if len(list_col_parts) == 0:
+        return pd.DataFrame(columns=['Column', 'Value', 'Frequency (%)'])
+    result_df = pd.DataFrame({
+        'Column': np.concatenate(list_col_parts),
+        'Value': np.concatenate(list_value_parts),
+        'Frequency (%)': np.concatenate(list_freq_parts).astype('float64')
+    })
+    return result_df
+
+def stats_state_compact(state: dict) -> None:
+    """
+    Empties the buffers of the duplicates counters (the fingerprints are merged with the distinct ones or written to disk), e.g. before saving the state.
+
+    Parameters:
+        state (dict): The state updated with the chunks.
+
+    Returns:
+        None
+    """
+    dup_counter_flush(state['dup_rows'])
+    if state['dup_pk'] is not None:
+        dup_counter_flush(state['dup_pk'])
+
+def stats_state_to_summary_dict(state: dict) -> dict:
+    """
+    Creates, from the state, the same dictionary produced by summarize_dataframe_to_dict on the whole file.
+
+    Parameters:
+        state (dict): The state updated with all the chunks of the file.
+
+    Returns:
+        dict: a dictionary containing the file name and missing value counts for each column.
+    """
+    num_rows = state['rows_num']
+    num_columns = len(state['columns'])
+    # Count the number of duplicate rows, considering all columns
+    duplicate_rows_count = dup_counter_duplicates(state['dup_rows'])
+    # Calculate the ratio of duplicate rows to total rows
+    ratio_dup = duplicate_rows_count / num_rows if num_rows > 0 else 0  # Avoid division by zero
+
+    summary_dict = {
+        'file_name': state['file_name'],
+        'rows_num': num_rows,
+        'cols_num': num_columns,
+        'missing_values': dict(state['missing_values']),
+        'duplicated_rows': duplicate_rows_count,
+        'duplicated_rows_perc': round(ratio_dup,2)
+    }
+    if state['dup_pk'] is not None:
+        # Count the number of rows with a primary key already found
+        duplicate_pk_count = dup_counter_duplicates(state['dup_pk'])
+        summary_dict['duplicated_pk'] = duplicate_pk_count
+        summary_dict['duplicated_pk_perc'] = round(duplicate_pk_count / num_rows if num_rows > 0 else 0, 2)
+    return summary_dict
+
+def stats_state_to_distinct_df(state: dict, top_k: int = 0) -> pd.DataFrame:
+    """
+    Creates, from the state, the same dataframe produced by distinct_values_frequencies on the whole file.
+
+    Parameters:
+        state (dict): The state updated with all the chunks of the file.
+        top_k (int): If greater than 0, only the first top_k values of each column are kept.
+
+    Returns:
+        pd.DataFrame: A dataframe containing the distinct values and their frequencies in percentage for each included column.
+    """
+    list_values = []
+    list_counts = []
+    for col in state['include_cols']:
+        dic_counts = state['value_counts'][col]
+        values = list(dic_counts.keys())
+        counts = list(dic_counts.values())
+        # Columns without a configured type get the type inferred on the whole column
+        if col not in state['col_type']:
+            values = stats_values_typed(values, state['missing_values'][col] > 0)
+        values_typed, counts_typed = value_counts_merge(values, counts)
+        list_values.append(values_typed)
+        list_counts.append(counts_typed)
+    return frequencies_long_df(state['include_cols'], list_values, list_counts, top_k)
@@ -0,0 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+import pandas as pd
+
+STATS_FORMATS = ["csv", "parquet", "xlsx", "xlsx_run"]
+STATS_RUN_XLSX = "_stats_run.xlsx" # consolidated workbook of the run (xlsx_run format)
+XLSX_MAX_ROWS = 1_048_576 # rows of an Excel sheet (header included)
+XLSX_SHEET_NAME_LEN = 31 # characters of an Excel sheet name
+XLSX_WRITE_ROWS = 10_000 # rows converted at a time when a sheet is written
+
+def df_to_xlsx_sheet(worksheet, df: pd.DataFrame) -> None:
+    """
+    Appends a dataframe (header and rows) to a sheet of a write-only workbook, converting a block of rows at a time; missing values become empty cells, as in DataFrame.to_excel.
+
+    Parameters:
+        worksheet: The sheet of a write-only openpyxl workbook.
+        df (pd.DataFrame): The dataframe.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: if the dataframe does not fit in a sheet.
+    """
+    if len(df) + 1 > XLSX_MAX_ROWS:
+        raise ValueError(f"This sheet is too large! Your sheet size is: {len(df)}, {len(df.columns)} Max sheet size is: {XLSX_MAX_ROWS - 1}, 16384")
+    worksheet.append([str(col) for col in df.columns])
+    for start in range(0, len(df), XLSX_WRITE_ROWS):
+        df_block = df.iloc[start:start + XLSX_WRITE_ROWS].astype(object)
+        df_block = df_block.where(df_block.notna(), None)
+        for row in df_block.itertuples(index=False, name=None):
+            worksheet.append(row)
+
+def xlsx_sheet_name_unique(sheet_name: str, list_used: list) -> str:
+    """
+    Cuts a sheet name to the Excel limit and makes it unique among the names already used in the workbook.
+
+    Parameters:
+        sheet_name (str): The sheet name.
+        list_used (list): The sheet names already used.
+
+    Returns:
+        str: the sheet name to be used.
+    """
+    name = sheet_name[:XLSX_SHEET_NAME_LEN]
+    num = 1
+    while name in list_used:
+        num += 1
+        suffix = f"~{num}"
+        name = sheet_name[:XLSX_SHEET_NAME_LEN - len(suffix)] + suffix
+    return name
+
+def df_parquet_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts to strings the text columns with values of different types (e.g. the values of the distinct values stats), as a Parquet column has a single type.
+
+    Parameters:
+        df (pd.DataFrame): The dataframe.
+
+    Returns:
+        pd.DataFrame: the dataframe to be written (the same dataframe if no column is converted).
+    """
+    list_cols_mixed = [col for col in df.columns if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed")]
+    if len(list_cols_mixed) == 0:
+        return df
+    df = df.copy()
+    for col in list_cols_mixed:
+        df[col] = df[col].map(lambda value: str(value) if pd.notna(value) else None)
+    return df
+
+def stats_writer_init(stats_dir: str, list_formats: list, csv_sep: str = ";", background: bool = True, max_pending: int = 0) -> dict:
+    """
+    Creates the writer of the stats files: each stats dataframe is written in the configured formats, in a background thread (so that the writing of a file overlaps with the analysis of the next one) or immediately.
+
+    Parameters:
+        stats_dir (str): The output directory.
+        list_formats (list): The formats (see STATS_FORMATS): 'csv', 'parquet', 'xlsx' (a workbook for each stats file), 'xlsx_run' (a single workbook for the run, with a sheet for each stats file).
+        csv_sep (str): The CSV separator.
+        background (bool): If True, the files are written by a background thread (one file at a time, in the order of submission).
+        max_pending (int): With the background thread, the stats dataframes waiting to be written: a submission waits while they are more, so the dataframes kept alive by the queue are bounded (0 = no limit).
+
+    Returns:
+        dict: the writer.
+
+    Raises:
+        ValueError: if a format is unknown.
+    """
+    list_unknown = [stats_format for stats_format in list_formats if stats_format not in STATS_FORMATS]
+    if len(list_unknown) > 0:
+        raise ValueError(f"Unknown stats formats {list_unknown} (allowed: {', '.join(STATS_FORMATS)})")
+    writer = {
+        'stats_dir': stats_dir,
+        'formats': list(list_formats),
+        'csv_sep': csv_sep,
+        'executor': ThreadPoolExecutor(max_workers=1) if background else None,
+        'futures': [],
+        'max_pending': max_pending,
+        'workbook': None,
+        'run_sheets': [],
+        'timings': {}
+    }
+    if "xlsx_run" in list_formats:
+        from openpyxl import Workbook # optional dependency, needed only by the Excel formats
+        writer['workbook'] = Workbook(write_only=True)
+    return writer
+
+def stats_write(writer: dict, df_stats: pd.DataFrame, file_name: str, stats_suffix: str, sheet_name: str, list_formats: list) -> None:
+    """
+    Writes a stats dataframe in the given formats.
+
+    Parameters:
+        writer (dict): The writer.
+        df_stats (pd.DataFrame): The stats dataframe.
+        file_name (str): The base name of the output files.
+        stats_suffix (str): The suffix of the stats type.
+        sheet_name (str): The sheet name of the 'xlsx' workbook.
+        list_formats (list): The formats to be written.
+
+    Returns:
+        None
+    """
+    path_base = Path(writer['stats_dir']) / f"{file_name}{stats_suffix}"
+    dic_timings = writer['timings'].setdefault(file_name, {})
+    for stats_format in STATS_FORMATS:
+        if stats_format not in list_formats or (stats_format == "xlsx_run" and writer['workbook'] is None):
+            continue
+        time_start = perf_counter()
+        if stats_format == "csv":
+            df_stats.to_csv(path_base.with_suffix(".csv"), sep=writer['csv_sep'], index=False)
+        elif stats_format == "parquet":
+            df_parquet_ready(df_stats).to_parquet(path_base.with_suffix(".parquet"), index=False)
+        elif stats_format == "xlsx":
+            from openpyxl import Workbook # optional dependency, needed only by the Excel formats
+            workbook = Workbook(write_only=True)
+            df_to_xlsx_sheet(workbook.create_sheet(sheet_name), df_stats)
+            workbook.save(path_base.with_suffix(".xlsx"))
+        else:
+            run_sheet_name = xlsx_sheet_name_unique(f"{file_name.removesuffix('_csv')}{stats_suffix.removeprefix('_stats')}", [sheet for sheet, _, _ in writer['run_sheets']])
+            df_to_xlsx_sheet(writer['workbook'].create_sheet(run_sheet_name), df_stats)
+            writer['run_sheets'].append((run_sheet_name, file_name, stats_suffix))
+        stage = f"{stats_format}_write"
+        dic_timings[stage] = round(dic_timings.get(stage, 0.0) + perf_counter() - time_start, 4)
+
+def stats_writer_submit(writer: dict, df_stats: pd.DataFrame, file_name: str, stats_suffix: str, sheet_name: str, list_formats: list = None) -> None:
+    """
+    Writes a stats dataframe in the formats of the writer (in the background thread, if any, waiting while the dataframes not yet written are max_pending). The dataframe must not be changed after the submission.
+
+    Parameters:
+        writer (dict): The writer.
+        df_stats (pd.DataFrame): The stats dataframe.
+        file_name (str): The base name of the output files.
+        stats_suffix (str): The suffix of the stats type.
+        sheet_name (str): The sheet name of the 'xlsx' workbook.
+        list_formats (list, optional): The formats to be written (if None, all the formats of the writer).
+
+    Returns:
+        None
+    """
+    list_formats = writer['formats'] if list_formats is None else list_formats
+    if writer['executor'] is None:
+        stats_write(writer, df_stats, file_name, stats_suffix, sheet_name, list_formats)
+    else:
+        if writer['max_pending'] > 0:
+            # Backpressure: the oldest submissions are waited for until there is room in the queue
+            list_pending = [future for future in writer['futures'] if not future.done()]
+            for future in list_pending[:len(list_pending) - writer['max_pending'] + 1]:
+                future.result()
+        writer['futures'].append(writer['executor'].submit(stats_write, writer, df_stats, file_name, stats_suffix, sheet_name, list_formats))
+
+def stats_writer_wait(writer: dict) -> None:
+    """
+    Waits until the stats submitted are written.
+
+    Parameters:
+        writer (dict): The writer.
+
+    Returns:
+        None
+
+    Raises:
+        Exception: the first error raised while writing.
+    """
+    list_futures = writer['futures']
+    writer['futures'] = []
+    for future in list_futures:
+        future.result()
+
+def stats_writer_timings(writer: dict, file_name: str) -> dict:
+    """
+    Returns (and removes) the seconds spent writing the stats files of a file, for each format. To be called when the files are written (see stats_writer_wait).
+
+    Parameters:
+        writer (dict): The writer.
+        file_name (str): The base name of the output files.
+
+    Returns:
+        dict: the seconds of each format (e.g. 'csv_write', 'xlsx_write').
+    """
+    return writer['timings'].pop(file_name, {})
+
+def stats_writer_close(writer: dict) -> Path:
+    """
+    Waits until the stats submitted are written, stops the background thread and saves the consolidated workbook of the run (with an index sheet of the stats files).
+
+    Parameters:
+        writer (dict): The writer.
+
+    Returns:
+        Path: the path of the consolidated workbook (None if the 'xlsx_run' format is not used or no stats were written).
+    """
+    try:
+        stats_writer_wait(writer)
+    finally:
+        if writer['executor'] is not None:
+            writer['executor'].shutdown()
+    if writer['workbook'] is None or len(writer['run_sheets']) == 0:
+        return None
+    df_index = pd.DataFrame(writer['run_sheets'], columns=['sheet_name', 'file_name', 'stats'])
+    df_to_xlsx_sheet(writer['workbook'].create_sheet(xlsx_sheet_name_unique("index", df_index['sheet_name'].tolist())), df_index)
+    path_run = Path(writer['stats_dir']) / STATS_RUN_XLSX
+    writer['workbook'].save(path_run)
+    return path_run
@@ -0,0 +1,307 @@
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utility_manager.db_loader import foreign_key_edges, foreign_key_levels
+from utility_manager.schema_inference import dtype_kind
+from utility_manager.stats_incremental import stats_conf_hash
+
+SYNTH_KINDS = ["key", "category", "int", "float", "date", "text"]
+SYNTH_KEY_FORMATS = ["cig", "cf", "id", "code"]
+# Kind of a column from its name (first matching rule), when it is not measured on a sample
+SYNTH_NAME_RULES = [
+    (r"^cig($|_)", "key", "cig"),
+    (r"(^|_)(cf|codice_fiscale|partita_iva|piva)($|_)", "key", "cf"),
+    (r"(^|_)id($|_)", "key", "id"),
+    (r"^(data_|scadenza)", "date", None),
+    (r"^(importo|valore)", "float", None),
+    (r"^(anno_|n_|num_|giorni_|durata)", "int", None),
+    (r"(^|_)(cod|codice)($|_)", "category", None),
+    (r"^(flag_|esito|stato|settore|tipo|ruolo|criterio)", "category", None),
+    (r"(oggetto|descrizione|denominazione|motivo)", "text", None)
+]
+SYNTH_TABLE_ROWS_RATIO = {'bando_cig_2016_2023': 1.0, 'bando_cig_2007_2023_clean': 1.0, 'aggiudicazioni': 0.8, 'aggiudicatari': 1.0, 'stazioni_appaltanti': 0.01, 'centri_di_costo': 0.03, 'bandi_cig_modalita_realizzazione': 0.0, 'bandi_cig_tipo_scelta_contraente': 0.0} # rows of each table for a row of the main table (other tables: SYNTH_ROWS_RATIO_DEFAULT)
+SYNTH_ROWS_RATIO_DEFAULT = 0.5
+SYNTH_MIN_ROWS = 20 # rows of the smallest tables (e.g. the lookup tables of the codes)
+SYNTH_CATEGORY_CARDINALITY = 20 # distinct values of a category column not measured on a sample
+SYNTH_TEXT_CARDINALITY_RATIO = 0.5 # distinct values / rows of a text column
+SYNTH_KEY_NULL_RATE = 0.02 # share of empty foreign keys
+SYNTH_SAMPLE_ROWS = 10_000 # rows of a real file read to measure the null rates and the cardinalities
+SYNTH_DATE_START = np.datetime64("2007-01-01")
+SYNTH_DATE_DAYS = 17 * 365
+
+def table_name_from_file(file_name: str) -> str:
+    """
+    Returns the table name of a file of the catalogue (as 02_data_sql.py creates it).
+
+    Parameters:
+        file_name (str): The file name.
+
+    Returns:
+        str: the table name.
+    """
+    return Path(file_name).stem.removesuffix("_csv").replace("-", "_")
+
+def col_spec_from_name(col: str, null_rate: float, dtype_name: str = None) -> dict:
+    """
+    Creates the spec of a column from its name (see SYNTH_NAME_RULES) and its configured type: columns that match no rule are categories, numbers and dates configured as text are codes (categories).
+
+    Parameters:
+        col (str): The column name.
+        null_rate (float): The share of empty values.
+        dtype_name (str, optional): The configured type of the column.
+
+    Returns:
+        dict: the spec (kind, key format, share of empty values, distinct values).
+    """
+    # A key column that is not a primary or foreign key is a code with some repeated values
+    kind, key_format = next(((kind, key_format) for pattern, kind, key_format in SYNTH_NAME_RULES if re.search(pattern, col.lower())), ("category", None))
+    dtype = dtype_kind(dtype_name)
+    if dtype == "text" and kind in ("int", "float", "date"):
+        kind = "category"
+    elif dtype in ("int", "float") and kind in ("category", "text"):
+        kind = dtype
+    return {'kind': kind, 'key_format': key_format, 'null_rate': null_rate, 'cardinality': SYNTH_CATEGORY_CARDINALITY}
+
+def col_spec_from_sample(spec: dict, values: pd.Series, dtype_name: str = None) -> dict:
+    """
+    Refines the spec of a column with the values of a sample of a real file: the share of empty values, the number of distinct values and, for a category or text column, whether it is numeric. A numeric column configured as text (e.g. '031005') is a code and keeps the width of its values.
+
+    Parameters:
+        spec (dict): The spec created from the name.
+        values (pd.Series): The values of the sample (strings, empty for missing values).
+        dtype_name (str, optional): The configured type of the column.
+
+    Returns:
+        dict: the spec.
+    """
+    spec = dict(spec)
+    non_empty = values[values != ""]
+    spec['null_rate'] = round(1 - len(non_empty) / len(values), 4) if len(values) > 0 else spec['null_rate']
+    spec['cardinality'] = max(1, int(non_empty.nunique()))
+    is_numeric = len(non_empty) > 0 and pd.to_numeric(non_empty, errors="coerce").notna().all()
+    if spec['kind'] in ("category", "text") and is_numeric and dtype_kind(dtype_name) == "text":
+        # Codes with digits only, zero-padded as in the real file
+        spec.update({'kind': "category", 'key_format': "code", 'code_width': int(non_empty.str.len().max())})
+    elif spec['kind'] in ("category", "text") and len(non_empty) > 0 and spec['cardinality'] > len(non_empty) * SYNTH_TEXT_CARDINALITY_RATIO:
+        # Mostly distinct values: free text or measures
+        spec['kind'] = "float" if is_numeric else "text"
+    return spec
+
+def synth_schemas(list_files: list, dic_file_cols: dict, dic_col_types: dict, list_primary_key_dic: list, dic_foreign_keys: dict, null_rate: float, sample_dir: str = None, csv_sep: str = ";") -> dict:
+    """
+    Creates the schemas of the synthetic files: the columns of each file (the header of the real file, if there is one in sample_dir, otherwise the columns of the configuration files), the primary keys, the foreign keys to the other files and the spec of each column (measured on a sample of the real file, if any).
+
+    Parameters:
+        list_files (list): The file names.
+        dic_file_cols (dict): The columns of each file found in the configuration files (excluded and stats columns).
+        dic_col_types (dict): The configured column types.
+        list_primary_key_dic (list): List of dictionaries with primary key columns for each file.
+        dic_foreign_keys (dict): The foreign keys of each table.
+        null_rate (float): The share of empty values of the columns not measured on a sample.
+        sample_dir (str, optional): The directory of the real files (None = the configuration only).
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        dict: the schema of each file (table name, columns with their spec, primary keys, foreign keys).
+    """
+    dic_tables = {table_name_from_file(file_name): file_name for file_name in list_files}
+    list_edges = foreign_key_edges(dic_foreign_keys, list(dic_tables))
+    dic_schemas = {}
+    for file_name in list_files:
+        table_name = table_name_from_file(file_name)
+        list_pk = []
+        for dic_pk in list_primary_key_dic:
+            list_pk = dic_pk.get(file_name, list_pk)
+        list_fk = [(column, foreign_table, foreign_column) for table, column, foreign_table, foreign_column in list_edges if table == table_name]
+        list_cols = list(dict.fromkeys(list_pk + [column for column, _, _ in list_fk] + dic_file_cols.get(file_name, [])))
+        df_sample = None
+        if sample_dir is not None and (Path(sample_dir) / file_name).exists():
+            df_sample = pd.read_csv(Path(sample_dir) / file_name, sep=csv_sep, dtype=str, keep_default_na=False, nrows=SYNTH_SAMPLE_ROWS)
+            # The header of the real file, with the key and stats columns of the configuration it lacks (e.g. an older extract)
+            list_conf = list_pk + [column for column, _, _ in list_fk] + dic_file_cols.get(file_name, [])
+            list_cols = list(df_sample.columns) + [col for col in dict.fromkeys(list_conf) if col not in df_sample.columns and col.replace("_", "-") not in df_sample.columns]
+        dic_cols = {}
+        for col in list_cols:
+            spec = col_spec_from_name(col, null_rate, dic_col_types.get(col))
+            if df_sample is not None and col in df_sample.columns:
+                spec = col_spec_from_sample(spec, df_sample[col], dic_col_types.get(col))
+            dic_cols[col] = spec
+        # The primary keys are unique values of the row number, the foreign keys values of the referenced table
+        for col in list_pk:
+            dic_cols[col].update({'kind': "key", 'key_format': dic_cols[col]['key_format'] or "code", 'null_rate': 0.0})
+        for column, foreign_table, foreign_column in list_fk:
+            col = next((col for col in list_cols if col.replace("-", "_") == column), column)
+            dic_cols[col].update({'kind': "key", 'null_rate': min(dic_cols[col]['null_rate'], SYNTH_KEY_NULL_RATE), 'foreign_table': foreign_table, 'foreign_column': foreign_column})
+        dic_schemas[file_name] = {'table_name': table_name, 'columns': dic_cols, 'primary_keys': list_pk}
+    # The format (and the width of the codes) of a foreign key is the one of the referenced column
+    for dic_schema in dic_schemas.values():
+        for spec in dic_schema['columns'].values():
+            if 'foreign_table' in spec:
+                dic_parent = dic_schemas[dic_tables[spec['foreign_table']]]['columns']
+                parent_col = next((col for col in dic_parent if col.replace("-", "_") == spec['foreign_column']), None)
+                spec['key_format'] = dic_parent[parent_col]['key_format'] if parent_col is not None else (spec['key_format'] or "code")
+                spec.pop('code_width', None)
+                if parent_col is not None and 'code_width' in dic_parent[parent_col]:
+                    spec['code_width'] = dic_parent[parent_col]['code_width']
+    return dic_schemas
+
+def synth_table_rows(table_name: str, scale: int) -> int:
+    """
+    Returns the rows of a synthetic table for a scale (rows of the main table).
+
+    Parameters:
+        table_name (str): The table name.
+        scale (int): The rows of the main table.
+
+    Returns:
+        int: the rows of the table.
+    """
+    return max(SYNTH_MIN_ROWS, int(scale * SYNTH_TABLE_ROWS_RATIO.get(table_name, SYNTH_ROWS_RATIO_DEFAULT)))
+
+def key_values(key_format: str, positions: np.ndarray, width: int = 3) -> np.ndarray:
+    """
+    Formats row numbers as key values: the same row number gives the same key, so a foreign key refers to a row of the referenced table by its number.
+
+    Parameters:
+        key_format (str): The format (see SYNTH_KEY_FORMATS): 'cig' (10 hexadecimal characters), 'cf' (11 digits), 'id' (integer from 1) or 'code' (zero-padded digits).
+        positions (np.ndarray): The row numbers.
+        width (int, optional): The digits of a 'code'. Defaults to 3.
+
+    Returns:
+        np.ndarray: the keys (strings).
+    """
+    values = pd.Series(positions, dtype="int64")
+    if key_format == "cig":
+        return ("Z" + values.map("{:09X}".format)).to_numpy(dtype=object)
+    if key_format == "cf":
+        return values.astype(str).str.zfill(11).to_numpy(dtype=object)
+    if key_format == "id":
+        return (values + 1).astype(str).to_numpy(dtype=object)
+    return values.astype(str).str.zfill(width).to_numpy(dtype=object)
+
+def skewed_choice(rng: np.random.Generator, cardinality: int, size: int) -> np.ndarray:
+    """
+    Draws indexes of distinct values with a skewed (Zipf-like) frequency, as the codes of the real files: the first values are the most frequent.
+
+    Parameters:
+        rng (np.random.Generator): The random generator.
+        cardinality (int): The number of distinct values.
+        size (int): The number of values drawn.
+
+    Returns:
+        np.ndarray: the indexes.
+    """
+    weights = 1.0 / np.arange(1, cardinality + 1)
+    return rng.choice(cardinality, size=size, p=weights / weights.sum())
+
+def col_values(rng: np.random.Generator, col: str, spec: dict, positions: np.ndarray, dic_rows: dict) -> np.ndarray:
+    """
+    Generates the values of a column for a block of rows.
+
+    Parameters:
+        rng (np.random.Generator): The random generator.
+        col (str): The column name.
+        spec (dict): The spec of the column.
+        positions (np.ndarray): The row numbers of the block.
+        dic_rows (dict): The rows of each table (foreign keys refer to a random row of the referenced table).
+
+    Returns:
+        np.ndarray: the values ('' or NaN for missing values).
+    """
+    size = len(positions)
+    kind = spec['kind']
+    if kind == "key":
+        if 'foreign_table' in spec:
+            values = key_values(spec['key_format'], rng.integers(0, dic_rows[spec['foreign_table']], size), spec.get('code_width', 3))
+        elif spec['null_rate'] == 0.0:
+            values = key_values(spec['key_format'], positions, spec.get('code_width', 3))
+        else:
+            values = key_values(spec['key_format'], skewed_choice(rng, spec['cardinality'], size), spec.get('code_width', 3))
+    elif kind == "category":
+        values = key_values("code", skewed_choice(rng, spec['cardinality'], size), spec.get('code_width', 3)) if spec['key_format'] == "code" or re.search(r"(^|_)(cod|codice)($|_)", col.lower()) else np.array([f"{col.upper()} {num}" for num in range(spec['cardinality'])], dtype=object)[skewed_choice(rng, spec['cardinality'], size)]
+    elif kind == "int":
+        values = rng.integers(2007, 2024, size) if col.lower().startswith("anno_") else rng.integers(0, 1000, size)
+        values = values.astype(float)
+    elif kind == "float":
+        values = np.round(rng.lognormal(10, 2, size), 2)
+    elif kind == "date":
+        values = np.datetime_as_string(SYNTH_DATE_START + rng.integers(0, SYNTH_DATE_DAYS, size).astype("timedelta64[D]"), unit="D").astype(object)
+    else:
+        values = np.char.add(f"{col} ", rng.integers(0, max(1, int(spec['cardinality'])), size).astype(str)).astype(object)
+    if spec['null_rate'] > 0:
+        is_null = rng.random(size) < spec['null_rate']
+        values = values.copy()
+        values[is_null] = np.nan if values.dtype.kind == "f" else ""
+    return values
+
+def synth_file_write(path_out: Path, dic_schema: dict, num_rows: int, dic_rows: dict, seed: int, table_num: int, chunk_rows: int = 1_000_000, csv_sep: str = ";") -> int:
+    """
+    Writes a synthetic file in blocks of rows (the memory used depends on the block size, not on the rows). Each block has its own random generator (seed, table, block), so the file is the same whatever the block order.
+
+    Parameters:
+        path_out (Path): The CSV file.
+        dic_schema (dict): The schema of the file (see synth_schemas).
+        num_rows (int): The rows of the file.
+        dic_rows (dict): The rows of each table.
+        seed (int): The seed.
+        table_num (int): The number of the table (part of the seed of its blocks).
+        chunk_rows (int): Rows generated and written at a time.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        int: the rows written.
+    """
+    path_tmp = path_out.with_suffix(".tmp")
+    with open(path_tmp, "w", newline="") as fp:
+        for chunk_num, start in enumerate(range(0, max(num_rows, 1), chunk_rows)):
+            rng = np.random.default_rng([seed, table_num, chunk_num])
+            positions = np.arange(start, min(start + chunk_rows, num_rows))
+            df_chunk = pd.DataFrame({col: col_values(rng, col, spec, positions, dic_rows) for col, spec in dic_schema['columns'].items()})
+            for col, spec in dic_schema['columns'].items():
+                if spec['kind'] == "int":
+                    df_chunk[col] = df_chunk[col].astype("Int64")
+            df_chunk.to_csv(fp, sep=csv_sep, index=False, header=chunk_num == 0)
+    path_tmp.replace(path_out)
+    return num_rows
+
+def synth_catalogue_write(out_dir: str, dic_schemas: dict, scale: int, seed: int = 0, chunk_rows: int = 1_000_000, csv_sep: str = ";") -> dict:
+    """
+    Writes the synthetic catalogue of a scale, unless the directory already has the same catalogue (same schemas, scale, seed and block size, see the manifest '_synthetic.json'). The files are written in the order of the foreign keys.
+
+    Parameters:
+        out_dir (str): The output directory.
+        dic_schemas (dict): The schemas of the files (see synth_schemas).
+        scale (int): The rows of the main table.
+        seed (int): The seed. Defaults to 0.
+        chunk_rows (int): Rows generated and written at a time.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        dict: the manifest (rows of each file and True in 'generated' if the files have been written).
+    """
+    path_manifest = Path(out_dir) / "_synthetic.json"
+    spec_hash = stats_conf_hash({'schemas': dic_schemas, 'scale': scale, 'seed': seed, 'chunk_rows': chunk_rows, 'csv_sep': csv_sep})
+    if path_manifest.exists():
+        with open(path_manifest, "r") as fp:
+            dic_manifest = json.load(fp)
+        if dic_manifest['spec_hash'] == spec_hash and all((Path(out_dir) / file_name).exists() for file_name in dic_manifest['rows']):
+            dic_manifest['generated'] = False
+            return dic_manifest
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    dic_files = {dic_schema['table_name']: file_name for file_name, dic_schema in dic_schemas.items()}
+    dic_rows = {table_name: synth_table_rows(table_name, scale) for table_name in dic_files}
+    list_edges = [(dic_schema['table_name'], None, spec['foreign_table'], None) for dic_schema in dic_schemas.values() for spec in dic_schema['columns'].values() if 'foreign_table' in spec]
+    dic_manifest = {'scale': scale, 'seed': seed, 'spec_hash': spec_hash, 'rows': {}}
+    for level in foreign_key_levels(list(dic_files), list_edges):
+        for table_name in level:
+            file_name = dic_files[table_name]
+            table_num = list(dic_files).index(table_name)
+            dic_manifest['rows'][file_name] = synth_file_write(Path(out_dir) / file_name, dic_schemas[file_name], dic_rows[table_name], dic_rows, seed, table_num, chunk_rows, csv_sep)
+    with open(path_manifest, "w") as fp:
+        json.dump(dic_manifest, fp, indent=4)
+    dic_manifest['generated'] = True
+    return dic_manifest
@@ -0,0 +1,162 @@
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from utility_manager.db_loader import table_schemas_read
+
+STORE_FILE_TYPE = "arrow" # Arrow IPC file (Feather v2), uncompressed so that it can be memory mapped
+STORE_CATALOGUE_FILE = "_catalogue.json"
+STORE_BLOCK_SIZE = 16 * 1024 * 1024 # bytes of the cleaned CSV parsed for each record batch
+STORE_SQL_TYPES = [(r"^(VARCHAR|CHAR|TEXT)", pa.string()), (r"^(BIGINT|INT)", pa.int64()), (r"^(DOUBLE|FLOAT|DECIMAL)", pa.float64()), (r"^DATETIME", pa.timestamp("us")), (r"^DATE", pa.date32())] # first match wins
+
+def sql_type_arrow(sql_type: str) -> pa.DataType:
+    """
+    Maps a MySQL column type of a table schema to the Arrow type of the table store.
+
+    Parameters:
+        sql_type (str): The MySQL type (e.g. 'VARCHAR(16)', 'INT', 'DATE').
+
+    Returns:
+        pa.DataType: the Arrow type (string for the types not mapped).
+    """
+    for regex_type, arrow_type in STORE_SQL_TYPES:
+        if re.match(regex_type, sql_type.upper()):
+            return arrow_type
+    return pa.string()
+
+def store_path(store_dir: str, table_name_eng: str) -> Path:
+    """
+    Returns the path of a table in the table store.
+
+    Parameters:
+        store_dir (str): The directory of the table store.
+        table_name_eng (str): The table name in ENG.
+
+    Returns:
+        Path: the path of the Arrow file.
+    """
+    return Path(store_dir) / f"{table_name_eng.upper()}.{STORE_FILE_TYPE}"
+
+def store_table_write(path_csv: Path, dic_schema: dict, path_table: Path, csv_sep: str = ";") -> int:
+    """
+    Writes a cleaned CSV (see 02_data_sql.py) as an uncompressed Arrow IPC file, one record batch at a time (the memory used does not depend on the file size). The columns get the Arrow types of their MySQL types and the empty values are null, as in the import. If a value does not match its type (types inferred on a sample), all the columns are written as text.
+
+    Parameters:
+        path_csv (Path): The cleaned CSV.
+        dic_schema (dict): The table schema (columns and MySQL types).
+        path_table (Path): The Arrow file.
+        csv_sep (str): The CSV separator. Defaults to ';'.
+
+    Returns:
+        int: the number of rows written.
+    """
+    dic_types = {col: sql_type_arrow(sql_type) for col, sql_type in dic_schema['columns'].items()}
+    path_table.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path_table.with_suffix(".tmp")
+    for dic_column_types in [dic_types, {col: pa.string() for col in dic_types}]:
+        read_options = pa_csv.ReadOptions(block_size=STORE_BLOCK_SIZE)
+        parse_options = pa_csv.ParseOptions(delimiter=csv_sep, newlines_in_values=True)
+        convert_options = pa_csv.ConvertOptions(column_types=dic_column_types, null_values=[""], strings_can_be_null=True, quoted_strings_can_be_null=True)
+        rows_num = 0
+        try:
+            with pa_csv.open_csv(path_csv, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+                with pa.ipc.new_file(path_tmp, reader.schema) as writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+                        rows_num += batch.num_rows
+        except pa.ArrowInvalid as exc:
+            print("Arrow types not matched, table written as text:", str(exc).splitlines()[0])
+            continue
+        path_tmp.replace(path_table)
+        return rows_num
+    path_tmp.unlink(missing_ok=True)
+    raise pa.ArrowInvalid(f"Cleaned CSV '{path_csv}' cannot be parsed")
+
+def store_catalogue_write(store_dir: str, sql_dir_tables: str) -> dict:
+    """
+    Writes the catalogue index of the table store: for each table its name (ITA and ENG), file, columns (MySQL and Arrow types), rows and primary key. The rows and the Arrow types are read from the files (metadata only).
+
+    Parameters:
+        store_dir (str): The directory of the table store.
+        sql_dir_tables (str): The directory of the table schemas (see table_schemas_read).
+
+    Returns:
+        dict: the catalogue, by table name in ENG.
+    """
+    dic_catalogue = {}
+    for table_name, dic_schema in table_schemas_read(sql_dir_tables).items():
+        path_table = store_path(store_dir, dic_schema['table_name_eng'])
+        if not path_table.exists():
+            continue
+        with pa.memory_map(str(path_table), "r") as source:
+            reader = pa.ipc.open_file(source)
+            arrow_schema = reader.schema
+            rows_num = sum(reader.get_batch(batch_num).num_rows for batch_num in range(reader.num_record_batches))
+        dic_catalogue[dic_schema['table_name_eng']] = {
+            'table_name': table_name,
+            'table_name_eng': dic_schema['table_name_eng'],
+            'file': path_table.name,
+            'columns': {field.name: {'sql_type': dic_schema['columns'].get(field.name), 'arrow_type': str(field.type)} for field in arrow_schema},
+            'rows': rows_num,
+            'primary_keys': dic_schema['primary_keys']
+        }
+    path_catalogue = Path(store_dir) / STORE_CATALOGUE_FILE
+    with open(path_catalogue, "w") as fp:
+        json.dump(dic_catalogue, fp, indent=4)
+    return dic_catalogue
+
+def store_catalogue(store_dir: str) -> dict:
+    """
+    Reads the catalogue index of the table store (see store_catalogue_write).
+
+    Parameters:
+        store_dir (str): The directory of the table store.
+
+    Returns:
+        dict: the catalogue, by table name in ENG.
+    """
+    with open(Path(store_dir) / STORE_CATALOGUE_FILE, "r") as fp:
+        return json.load(fp)
+
+def store_table_open(store_dir: str, table_name: str, columns: list = None) -> pa.Table:
+    """
+    Opens a table of the store memory mapped: the Arrow buffers point to the pages of the file, so the processes reading the same table on a host share them (page cache) and nothing is read until it is used.
+
+    Parameters:
+        store_dir (str): The directory of the table store.
+        table_name (str): The table name in ENG or ITA (see the catalogue).
+        columns (list, optional): The columns to be returned (if None, all).
+
+    Returns:
+        pa.Table: the table (zero-copy).
+
+    Raises:
+        KeyError: if the table is not in the catalogue.
+    """
+    dic_catalogue = store_catalogue(store_dir)
+    dic_names = {entry['table_name']: table_name_eng for table_name_eng, entry in dic_catalogue.items()}
+    table_name_eng = table_name.upper() if table_name.upper() in dic_catalogue else dic_names.get(table_name)
+    if table_name_eng is None:
+        raise KeyError(f"Table '{table_name}' not in the catalogue of '{store_dir}'")
+    source = pa.memory_map(str(Path(store_dir) / dic_catalogue[table_name_eng]['file']), "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+def store_table_df(store_dir: str, table_name: str, columns: list = None) -> pd.DataFrame:
+    """
+    Opens a table of the store memory mapped as a pandas DataFrame with Arrow-backed columns (pd.ArrowDtype), views on the file (zero-copy).
+
+    Parameters:
+        store_dir (str): The directory of the table store.
+        table_name (str): The table name in ENG or ITA (see the catalogue).
+        columns (list, optional): The columns to be returned (if None, all).
+
+    Returns:
+        pd.DataFrame: the table.
+    """
+    table = store_table_open(store_dir, table_name, columns)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
@@ -1,7 +1,15 @@
 import json
+import io
+import contextlib
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import pandas as pd 
 
+from utility_manager.cache_manager import cache_key, cache_path, cache_load, cache_save, cache_evict
+from utility_manager.csv_reader import csv_encoding, csv_encoding_error, df_read_csv_engine
+
 def json_to_list_dict(json_file: str) -> list:
     """
     Extracts and sorts key-value pairs from a JSON file alphabetically by the keys.
@@ -128,7 +136,34 @@ def sql_create_database(db_name: str, drop_db: bool) -> str:
     # Join the list of commands into a single string separated by newlines
     return "\n".join(sql_commands)
 
-def df_to_sql_create_table_query(df: pd.DataFrame, drop_table: bool, primary_keys: list, table_name: str) -> str:
+def df_to_sql_column_types(df: pd.DataFrame, dic_col_sql_types: dict = None) -> dict:
+    """
+    Maps the columns of a pandas DataFrame to MySQL types (hyphens in the column names are replaced with underscores).
+
+    Parameters:
+        df (pd.DataFrame): The pandas DataFrame.
+        dic_col_sql_types (dict, optional): MySQL types of some columns, used instead of the types mapped from the DataFrame.
+
+    Returns:
+        dict: the MySQL type of each column, in the order of the DataFrame.
+    """
+    dic_col_sql_types = {col.replace('-', '_'): sql_type for col, sql_type in (dic_col_sql_types or {}).items()}
+
+    # Map pandas dtypes to MySQL types
+    type_mapping = {
+        'object': 'VARCHAR(255)',
+        'int64': 'BIGINT',
+        'float64': 'DOUBLE',
+        'datetime64[ns]': 'DATETIME'
+    }
+
+    dic_types = {}
+    for column, dtype in df.dtypes.items():
+        column = column.replace('-', '_')
+        dic_types[column] = dic_col_sql_types.get(column) or type_mapping.get(str(dtype), 'VARCHAR(255)')  # Default to VARCHAR(255) if type is unknown
+    return dic_types
+
+def df_to_sql_create_table_query(df: pd.DataFrame, drop_table: bool, primary_keys: list, table_name: str, dic_col_sql_types: dict = None) -> str:
     """
     Generate a MySQL CREATE TABLE query from a pandas DataFrame and save it to a specified folder.
     
@@ -137,6 +172,7 @@ def df_to_sql_create_table_query(df: pd.DataFrame, drop_table: bool, primary_key
         drop_table (bool): If True, add the DROP TABLE statement.
         primary_keys (list): List of primary keys.
         table_name (str): The name of the table to be created.
+        dic_col_sql_types (dict, optional): MySQL types of some columns, used instead of the types mapped from the DataFrame.
 
     Returns:
         str: A SQL query string for creating a table.
@@ -155,18 +191,9 @@ def df_to_sql_create_table_query(df: pd.DataFrame, drop_table: bool, primary_key
     else:
         query = f"CREATE TABLE {table_name} (\n"
     
-    # Map pandas dtypes to MySQL types
-    type_mapping = {
-        'object': 'VARCHAR(255)',
-        'int64': 'BIGINT',
-        'float64': 'DOUBLE',
-        'datetime64[ns]': 'DATETIME'
-    }
-    
     # Iterate through columns and their data types
     column_definitions = []
-    for column, dtype in df.dtypes.items():
-        mysql_dtype = type_mapping.get(str(dtype), 'VARCHAR(255)')  # Default to VARCHAR(255) if type is unknown
+    for column, mysql_dtype in df_to_sql_column_types(df, dic_col_sql_types).items():
         # Add column and type to the definition list
         # column_definitions.append(f"  `{column}` {mysql_dtype}")
         if column in primary_keys:
@@ -192,9 +219,41 @@ def df_to_sql_create_table_query(df: pd.DataFrame, drop_table: bool, primary_key
     
     return query
 
-def df_read_csv(dir_name: str, file_name: str, list_col_exc: list, list_col_type:dict, nrows:int, csv_sep: str = ";") -> pd.DataFrame:
+def csv_read_header(path_data: Path, csv_sep: str = ";") -> list:
     """
-    Reads data from a CSV file into a pandas DataFrame excluding columns (if needed)
+    Reads only the header of a CSV file.
+
+    Parameters:
+        path_data (Path): the path to the CSV file.
+        csv_sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+
+    Returns:
+        list: the column names, in the order of the file.
+    """
+    return list(pd.read_csv(path_data, sep=csv_sep, nrows=0, encoding=csv_encoding(path_data)).columns)
+
+def csv_columns_kept(list_header: list, list_col_exc: list, list_col_inc: list = None) -> list:
+    """
+    Computes the columns to be parsed from the header of a CSV file: the columns excluded are removed and, if a list of included columns is given, only those are kept.
+
+    Parameters:
+        list_header (list): the column names of the file.
+        list_col_exc (list): columns to be excluded.
+        list_col_inc (list, optional): columns to be included (if None, all).
+
+    Returns:
+        list: the columns to be parsed, in the order of the file.
+    """
+    set_col_exc = set(list_col_exc)
+    list_col_kept = [col_name for col_name in list_header if col_name not in set_col_exc]
+    if list_col_inc is not None:
+        set_col_inc = set(list_col_inc)
+        list_col_kept = [col_name for col_name in list_col_kept if col_name in set_col_inc]
+    return list_col_kept
+
+def df_read_csv(dir_name: str, file_name: str, list_col_exc: list, list_col_type:dict, nrows:int, csv_sep: str = ";", cache_dir: str = None, cache_max_size_mb: int = 0, list_col_inc: list = None, engine: str = "auto") -> pd.DataFrame:
+    """
+    Reads data from a CSV file into a pandas DataFrame excluding columns (if needed); only the columns kept are parsed, in the encoding of the file, by the Arrow parser when the column types allow it (see df_read_csv_engine).
 
     Parameters:
         dir_name (str): the directory to the CSV file to be read.
@@ -203,22 +262,95 @@ def df_read_csv(dir_name: str, file_name: str, list_col_exc: list, list_col_type
         list_col_type (dict): columns type.
         nrows (int): rows to be read (if None, all).
         sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+        cache_dir (str, optional): directory of the cache of parsed files (Feather, memory mapped); if None, the cache is not used. Only full reads are cached.
+        cache_max_size_mb (int, optional): maximum size of the cache in MB, least recently used entries are removed first (0 = no limit).
+        list_col_inc (list, optional): columns to be included, the others are not parsed (if None, all the columns not excluded).
+        engine (str, optional): the parser: 'auto' (Arrow if the column types allow it, otherwise C), 'pyarrow' or 'c'. Defaults to 'auto'.
 
     Returns:
         pd.DataFrame: a pandas DataFrame containing the data read from the CSV file.
     """
     path_data = Path(dir_name) / file_name
-    if nrows is not None:
-        df = pd.read_csv(path_data, sep=csv_sep, dtype=list_col_type, nrows=nrows, low_memory=False)
-    else:
-        df = pd.read_csv(path_data, sep=csv_sep, dtype=list_col_type, low_memory=False)
-    if len(list_col_exc) > 0:
-        for col_name in list_col_exc:
-                if col_name in df.columns:
-                    del df[col_name]
+    path_cache = None
+    if cache_dir is not None and nrows is None:
+        path_cache = cache_path(cache_dir, file_name, cache_key(path_data, list_col_exc, list_col_type, csv_sep, list_col_inc, cache_dir))
+        df = cache_load(path_cache)
+        if df is not None:
+            print("Read from cache:", path_cache)
+            return df
+    # Parse only the columns kept (the excluded ones are skipped by the parser)
+    list_col_kept = csv_columns_kept(csv_read_header(path_data, csv_sep), list_col_exc, list_col_inc)
+    df = df_read_csv_engine(path_data, list_col_kept, list_col_type, nrows, csv_sep, engine)
     # df = df.drop_duplicates()
+    if path_cache is not None and cache_save(path_cache, df):
+        print("Saved in cache:", path_cache)
+        cache_evict(cache_dir, cache_max_size_mb)
     return df
 
+def df_read_csv_chunks(dir_name: str, file_name: str, list_col_exc: list, list_col_type:dict, chunk_size:int, csv_sep: str = ";", list_col_inc: list = None, offset: int = 0):
+    """
+    Reads data from a CSV file in chunks of fixed size excluding columns (if needed); columns without a configured type are kept as raw strings, so every chunk has the same dtypes. If the encoding detected on the first bytes does not decode a chunk, the reading goes on from that chunk with the encoding of the whole file (see csv_encoding_error).
+
+    Parameters:
+        dir_name (str): the directory to the CSV file to be read.
+        file_name (str): the filename to the CSV file to be read.
+        list_col_exc (list): columns to be excluded.
+        list_col_type (dict): columns type.
+        chunk_size (int): rows to be read for each chunk.
+        sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+        list_col_inc (list, optional): columns to be included, the others are not parsed (if None, all the columns not excluded).
+        offset (int, optional): byte offset of the first row to be read, at the start of a line (e.g. the end of the file at the previous reading); if 0, the file is read from the header.
+
+    Returns:
+        generator: a generator of pandas DataFrame, one for each chunk read from the CSV file.
+    """
+    path_data = Path(dir_name) / file_name
+    dic_col_type = defaultdict(lambda: object, list_col_type)
+    list_header = csv_read_header(path_data, csv_sep)
+    list_col_kept = csv_columns_kept(list_header, list_col_exc, list_col_inc)
+    rows_read = 0
+    while True:
+        try:
+            if offset == 0:
+                # After a decode error, the rows already returned are skipped
+                skip_rows = (lambda row_num: 0 < row_num <= rows_read) if rows_read > 0 else None
+                with pd.read_csv(path_data, sep=csv_sep, dtype=dic_col_type, usecols=list_col_kept, chunksize=chunk_size, skiprows=skip_rows, encoding=csv_encoding(path_data)) as reader:
+                    for df in reader:
+                        rows_read += len(df)
+                        yield df
+            else:
+                # Only the rows after the offset are read, with the column names of the header
+                with open(path_data, "rb") as fp:
+                    fp.seek(offset)
+                    with pd.read_csv(fp, sep=csv_sep, header=None, names=list_header, dtype=dic_col_type, usecols=list_col_kept, chunksize=chunk_size, skiprows=rows_read, encoding=csv_encoding(path_data)) as reader:
+                        for df in reader:
+                            rows_read += len(df)
+                            yield df
+            return
+        except UnicodeDecodeError as exc:
+            if not csv_encoding_error(path_data, exc):
+                raise
+
+
+def df_read_csv_schema(dir_name: str, file_name: str, list_col_exc: list, list_col_type:dict, sample_rows:int, csv_sep: str = ";") -> pd.DataFrame:
+    """
+    Infers the column types of a CSV file from its first rows (only the sample is read); columns without a configured type get the type read_csv infers on the sample.
+
+    Parameters:
+        dir_name (str): the directory to the CSV file to be read.
+        file_name (str): the filename to the CSV file to be read.
+        list_col_exc (list): columns to be excluded.
+        list_col_type (dict): columns type.
+        sample_rows (int): rows to be read.
+        sep (str, optional): the delimiter string used in the CSV file. Defaults to ';'.
+
+    Returns:
+        pd.DataFrame: an empty DataFrame with the columns kept and their types.
+    """
+    path_data = Path(dir_name) / file_name
+    list_col_kept = csv_columns_kept(csv_read_header(path_data, csv_sep), list_col_exc)
+    df_sample = df_read_csv_engine(path_data, list_col_kept, list_col_type, sample_rows, csv_sep)
+    return df_sample.head(0)
 
 def df_print_details(df: pd.DataFrame, title: str) -> None:
     """
@@ -241,6 +373,7 @@ def df_print_details(df: pd.DataFrame, title: str) -> None:
 def sql_generate_foreign_keys(table_name: str, column_foreign_keys: list) -> str:
     """
     Generates SQL statements to set FOREIGN KEY constraints on the specified table.
+    A column referencing more tables is listed in more dictionaries (a JSON object cannot repeat a key); its constraints after the first one are named with the referenced table too.
 
     Parameters:
         table_name (str): The name of the table on which to set the FOREIGN KEY constraints.
@@ -249,13 +382,18 @@ def sql_generate_foreign_keys(table_name: str, column_foreign_keys: list) -> str
         str: A string containing the SQL statements to set the FOREIGN KEY constraints.
     """
     sql_statements = []
+    set_names = set()
     
     for columns in column_foreign_keys:
         for column, foreign_key in columns.items():
             # Obtain the name of the table and the column of the foreign key
             foreign_table, foreign_column = foreign_key.split(".")
+            constraint_name = f"fk_{table_name}_{column}"
+            if constraint_name in set_names:
+                constraint_name = f"fk_{table_name}_{column}_{foreign_table}"
+            set_names.add(constraint_name)
             # Create the SQL statement for the FOREIGN KEY constraint
-            sql_statement = f"ALTER TABLE {table_name} ADD CONSTRAINT fk_{table_name}_{column} FOREIGN KEY ({column}) REFERENCES {foreign_table}({foreign_column});"
+            sql_statement = f"ALTER TABLE {table_name} ADD CONSTRAINT {constraint_name} FOREIGN KEY ({column}) REFERENCES {foreign_table}({foreign_column});"
             sql_statements.append(sql_statement)
     
     sql_statement = "\n".join(sql_statements)
@@ -276,4 +414,66 @@ def script_info(file: str) -> tuple:
     script_path = Path(file).resolve()  # Converts the path to an absolute path
     script_name = script_path.name      # Gets the file name including extension
 
-    return script_path, script_name
\ No newline at end of file
+    return script_path, script_name
+
+def list_files_by_size(directory:str, list_files:list) -> list:
+    """
+    Sorts a list of file names by file size, largest first.
+
+    Parameters:
+        directory (str): The directory containing the files.
+        list_files (list): The file names to be sorted.
+
+    Returns:
+        list: The file names sorted by size in descending order.
+    """
+    return sorted(list_files, key=lambda file_name: (Path(directory) / file_name).stat().st_size, reverse=True)
+
+def run_task_captured(func, args: tuple) -> tuple:
+    """
+    Runs a function capturing everything it prints, so that the console output of a task can be shown as a single block.
+
+    Parameters:
+        func (callable): The function to be run.
+        args (tuple): The arguments of the function.
+
+    Returns:
+        tuple: the captured output, the result of the function and the exception raised (None if the function ended without errors).
+    """
+    buffer = io.StringIO()
+    result = None
+    error = None
+    with contextlib.redirect_stdout(buffer):
+        try:
+            result = func(*args)
+        except Exception as exc:
+            traceback.print_exc(file=buffer)
+            error = exc
+    return buffer.getvalue(), result, error
+
+def run_tasks_in_pool(func, list_tasks: list, workers: int = 1) -> list:
+    """
+    Runs a function over a list of independent tasks (one for each file), using a process pool if workers is greater than 1. The console output is printed grouped for each task, as soon as the task ends.
+
+    Parameters:
+        func (callable): The function to be run (must be defined at module level).
+        list_tasks (list): List of tuples with the arguments of each task, in the order they are scheduled.
+        workers (int): Number of worker processes (1 = tasks run one after another in the current process).
+
+    Returns:
+        list: The results of the function, in the same order as the tasks.
+    """
+    if workers <= 1 or len(list_tasks) <= 1:
+        return [func(*args) for args in list_tasks]
+
+    results = [None] * len(list_tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_task_captured, func, args): i for i, args in enumerate(list_tasks)}
+        for future in as_completed(futures):
+            output, result, error = future.result()
+            print(output, end="")
+            if error is not None:
+                executor.shutdown(cancel_futures=True)
+                raise error
+            results[futures[future]] = result
+    return results